@@ -1,3 +1,5 @@
+# Imported first so the startup report includes the time spent importing
+from proconq.utils.startup_timer import StartupTimer
 from proconq.setup_logging import setup_logging
 from proconq.src.frontend.frontend import launch_default_ui
 
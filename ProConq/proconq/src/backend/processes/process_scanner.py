@@ -0,0 +1,265 @@
+import os
+import pwd
+import time
+from typing import NamedTuple
+
+from proconq.utils.constants import Paths
+
+
+class ProcessInfo(NamedTuple):
+    """
+    A snapshot of a single running process, never changed once created.
+    The scanner's thread replaces a process' snapshot when its stats
+        change, the UI thread can read the ones it got without locking.
+    """
+    pid: int
+    # Start time distinguishes a reused PID from the original process
+    start_time: int
+    name: str
+    cmdline: str
+    user: str
+    # Lowercased once so searching doesn't pay for it per keystroke
+    search_fields: tuple[str, str, str]
+    cpu_percent: float = 0.0
+    syscall_rate: float | None = None
+
+    @classmethod
+    def create(cls, pid: int, start_time: int, name: str, cmdline: str,
+               user: str) -> 'ProcessInfo':
+        return cls(pid, start_time, name, cmdline, user,
+                   (name.lower(), user.lower(), cmdline.lower()))
+
+
+class ProcessDiff:
+    """
+    The changes between two consecutive polls of /proc.
+    """
+    def __init__(self, added: list[ProcessInfo], removed: list[int],
+                 updated: list[ProcessInfo]):
+        self.added = added
+        self.removed = removed
+        self.updated = updated
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.updated)
+
+
+class ProcessScanner:
+    """
+    Keeps a live view of the processes in /proc.
+
+    Every poll only lists /proc and reads the stat file of each process.
+    Name, user and commandline are read once, when a process first appears.
+    The counters the rates are calculated from stay with the scanner,
+        only snapshots leave it.
+    """
+    clock_ticks = os.sysconf('SC_CLK_TCK')
+
+    def __init__(self, proc_path=Paths.PROC):
+        self.proc_path = proc_path
+        self.processes: dict[int, ProcessInfo] = {}
+        # pid -> (CPU ticks, syscalls) at the last poll
+        self.counters: dict[int, tuple[int, int | None]] = {}
+        self.last_poll: float | None = None
+        self.users: dict[int, str] = {}
+
+    def poll(self) -> ProcessDiff:
+        """
+        Rescans /proc and returns what changed since the previous poll.
+        """
+        now = time.monotonic()
+        elapsed = now - self.last_poll if self.last_poll else 0.0
+        self.last_poll = now
+
+        added: list[ProcessInfo] = []
+        updated: list[ProcessInfo] = []
+        removed: list[int] = []
+        seen: set[int] = set()
+
+        for entry in os.scandir(self.proc_path):
+            if not entry.name.isdigit():
+                continue
+            pid = int(entry.name)
+
+            stat = self.read_stat(pid)
+            if stat is None:
+                continue
+            name, start_time, cpu_ticks = stat
+
+            process = self.processes.get(pid)
+            if process is not None and process.start_time != start_time:
+                # The PID was reused, report it as removed and added
+                removed.append(pid)
+                del self.processes[pid]
+                process = None
+
+            if process is None:
+                process = self.create_process(pid, entry, name, start_time)
+                if process is None:
+                    continue
+                self.counters[pid] = (cpu_ticks, self.read_syscalls(pid))
+                self.processes[pid] = process
+                added.append(process)
+            else:
+                process = self.update_rates(process, cpu_ticks, elapsed)
+                if process is not None:
+                    self.processes[pid] = process
+                    updated.append(process)
+
+            seen.add(pid)
+
+        vanished = [pid for pid in self.processes if pid not in seen]
+        for pid in vanished:
+            del self.processes[pid]
+            del self.counters[pid]
+        removed += vanished
+
+        return ProcessDiff(added, removed, updated)
+
+    def create_process(self, pid: int, entry: os.DirEntry, name: str,
+                       start_time: int) -> ProcessInfo | None:
+        try:
+            uid = entry.stat().st_uid
+            with open(f'{entry.path}/cmdline', 'rb') as file:
+                cmdline = file.read()
+        except OSError:
+            return None
+
+        cmdline = cmdline.replace(b'\0', b' ').decode(errors='replace')
+        return ProcessInfo.create(pid, start_time, name, cmdline.strip(),
+                                  self.get_user(uid))
+
+    def update_rates(self, process: ProcessInfo, cpu_ticks: int,
+                     elapsed: float) -> ProcessInfo | None:
+        """
+        Recalculates CPU usage and syscall rate of a known process.
+        Returns its new snapshot, None if none of the displayed values
+            changed.
+        """
+        syscalls = self.read_syscalls(process.pid)
+        last_cpu_ticks, last_syscalls = self.counters[process.pid]
+        self.counters[process.pid] = (cpu_ticks, syscalls)
+
+        cpu_percent = 0.0
+        syscall_rate = None
+        if elapsed > 0:
+            cpu_seconds = (cpu_ticks - last_cpu_ticks) / self.clock_ticks
+            cpu_percent = 100 * cpu_seconds / elapsed
+            if syscalls is not None and last_syscalls is not None:
+                syscall_rate = (syscalls - last_syscalls) / elapsed
+
+        if (round(cpu_percent, 1) == round(process.cpu_percent, 1)
+                and syscall_rate == process.syscall_rate):
+            return None
+        return process._replace(cpu_percent=cpu_percent,
+                                syscall_rate=syscall_rate)
+
+    def read_stat(self, pid: int) -> tuple[str, int, int] | None:
+        """
+        Reads /proc/<pid>/stat.
+        Returns the name, start time and total CPU ticks of the process.
+        """
+        try:
+            with open(f'{self.proc_path}/{pid}/stat', 'rb') as file:
+                stat = file.read().decode(errors='replace')
+        except OSError:
+            return None
+
+        # The name may contain spaces and parentheses, it ends at the last )
+        name_end = stat.rfind(')')
+        name = stat[stat.find('(') + 1:name_end]
+        fields = stat[name_end + 2:].split()
+
+        # Fields are numbered from 3 (state) in proc(5)
+        utime, stime = int(fields[11]), int(fields[12])
+        start_time = int(fields[19])
+        return name, start_time, utime + stime
+
+    def read_syscalls(self, pid: int) -> int | None:
+        """
+        Reads the read and write syscall counters of /proc/<pid>/io.
+        Returns None when the process isn't accessible to us.
+        """
+        syscalls = 0
+        try:
+            with open(f'{self.proc_path}/{pid}/io', 'rb') as file:
+                for line in file:
+                    if line.startswith((b'syscr', b'syscw')):
+                        syscalls += int(line.split()[1])
+        except OSError:
+            return None
+        return syscalls
+
+    def get_user(self, uid: int) -> str:
+        if uid not in self.users:
+            try:
+                self.users[uid] = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                self.users[uid] = str(uid)
+        return self.users[uid]
+
+
+class FuzzyMatcher:
+    """
+    Ranks processes against a search query.
+    Characters of the query must appear in order, not necessarily adjacent.
+    """
+    # Matches in the name weigh more than in the user or commandline
+    field_weights = (3, 2, 1)
+
+    @staticmethod
+    def score_text(query: str, text: str) -> int:
+        """
+        Scores a lowercased text against a lowercased query.
+        Returns 0 if the text doesn't contain the query as a subsequence.
+        """
+        if not query:
+            return 1
+
+        # Cheap rejection, runs in C
+        position = -1
+        for char in query:
+            position = text.find(char, position + 1)
+            if position == -1:
+                return 0
+
+        # A plain substring is the best kind of match
+        substring = text.find(query)
+        if substring != -1:
+            score = 100 + 10 * len(query)
+            if substring == 0:
+                score += 50
+            elif not text[substring - 1].isalnum():
+                score += 25
+            return score
+
+        # Reward consecutive characters and word starts
+        score = 0
+        previous = -2
+        position = -1
+        for char in query:
+            position = text.find(char, position + 1)
+            if position == previous + 1:
+                score += 5
+            if position == 0 or not text[position - 1].isalnum():
+                score += 3
+            score += 1
+            previous = position
+        return score
+
+    @staticmethod
+    def score(query: str, process: ProcessInfo) -> int:
+        """
+        Scores a process by its name, user and commandline.
+        query must already be lowercased.
+        """
+        if not query:
+            return 1
+        if query.isdigit() and str(process.pid).startswith(query):
+            return 1000
+
+        best = 0
+        for weight, text in zip(FuzzyMatcher.field_weights,
+                                process.search_fields):
+            best = max(best, weight * FuzzyMatcher.score_text(query, text))
+        return best
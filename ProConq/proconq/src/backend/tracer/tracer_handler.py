@@ -1,13 +1,10 @@
 import threading
 import subprocess
+import time
 import fcntl
 import os
 import logging
-
-from PyQt6.QtCore import (
-    QObject,
-    pyqtSignal
-)
+from typing import Callable
 
 from proconq.utils.constants import Paths
 from proconq.utils.exceptions import TracerError
@@ -19,7 +16,7 @@ class Syscall:
     Contains information about the currently
         intercepted system call.
     """
-    def __init__(self, logger: logging.Logger):
+    def __init__(self, logger: logging.Logger | logging.LoggerAdapter):
         self.logger = logger
 
         self.is_entry: bool = False
@@ -49,8 +46,7 @@ class Syscall:
 
         # Syscall name
         self.name = first_item[2:]
-        self.logger.debug(f'Set name {self.name}')
-        
+
         # Check if Entry (E) or Exit (R)
         if first_item[0] == 'E':
             self.is_entry = True
@@ -60,20 +56,15 @@ class Syscall:
             self.extract_exit(lines[1].decode().strip())
 
     def extract_entry(self, first_item: str, args: list[bytes]) -> None:
-        self.logger.debug(f'Set Entry')
         # Args amount
         self.args_amount = int(first_item[1])
-        self.logger.debug(f'Set args amount: {self.args_amount}')
         # Ret value
         self.ret = ''
-        self.logger.debug('Reset ret')
 
         for arg in args:
             arg = arg.decode()
-            self.logger.debug(f'Handling {arg}')
             # Get arg position
             pos = int(arg[3])
-            self.logger.debug(f'Arg Pos: {pos}')
 
             # Get arg type
             match arg[4]:
@@ -84,38 +75,40 @@ class Syscall:
                 case _:
                     arg_type = 'unknown'
 
-            self.logger.debug(f'Setting arg {pos} type: {arg_type}')
             self.args_types[pos] = arg_type
 
             # Get arg
             self.arg_size = arg[5:9]
-            self.logger.debug(f'Arg {pos} size: {self.arg_size}')
             self.args[pos] = arg[9:]
-            self.logger.debug(f'Set arg {pos}: {arg[9:]}')
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('Entry %s args amount %d args %r types %r',
+                              self.name, self.args_amount,
+                              self.args[:self.args_amount],
+                              self.args_types[:self.args_amount])
 
     def extract_exit(self, second_item: str) -> None:
-        self.logger.debug(f'Set Exit')
         # Args amount
         self.args_amount = 0
-        self.logger.debug(f'Set args amount: 0')
         # Ret value
         self.ret = second_item[3:]
-        self.logger.debug(f'Set ret: {self.ret}')
+        self.logger.debug('Exit %s ret %s', self.name, self.ret)
     
 
-class TracerHandler(QObject):
+class TracerHandler:
     """
     Creates and handles an interceptor tracer subprocess.
-    """
-    paused = pyqtSignal(bool)
 
+    Doesn't depend on Qt. Pause changes are reported to the listeners
+        added by add_pause_listener, from the interact thread.
+    """
     def __init__(self, is_pid: bool, command: str):
-        super().__init__()
-
-        self.logger = setup_logging(__name__)
+        # Each tracee logs to its own file
+        session = f'pid-{command}' if is_pid else f'exec-{time.time_ns()}'
+        self.logger = setup_logging(__name__, session)
 
         if is_pid:
-            self.logger.debug(f'Setting PID to {command}')
+            self.logger.debug('Setting PID to %s', command)
             self.pid = command
             option = '-p'
         else:
@@ -123,7 +116,7 @@ class TracerHandler(QObject):
 
         interceptor_command = \
         f'./{Paths.INTERCEPTOR} {option} {command}\n'
-        self.logger.debug(f'Running subprocess: {interceptor_command}')
+        self.logger.debug('Running subprocess: %s', interceptor_command)
         self.proc = subprocess.Popen(['/bin/bash'],
                                      stdout=subprocess.PIPE,
                                      stdin=subprocess.PIPE,
@@ -140,6 +133,7 @@ class TracerHandler(QObject):
 
         self.input_event: bytes = b''
 
+        self.pause_listeners: list[Callable[[bool], None]] = []
         self.pause_event = threading.Event()
         self.is_paused = False
         self.interact_thread = \
@@ -149,45 +143,56 @@ class TracerHandler(QObject):
     def write_input(self, data: str) -> None:
         if not data.endswith('\n'):
             data += '\n'
-        self.logger.debug(f'Writing input {data.encode()}')
-        self.proc.stdin.write(data.encode())
+        encoded_data = data.encode()
+        self.logger.debug('Writing input %r', encoded_data)
+        self.proc.stdin.write(encoded_data)
         self.proc.stdin.flush()
 
     def interact(self):
         while True:
             try:
                 # Read until input
-                self.logger.debug(f'{self.pid} Reading until input')
                 lines = self.read_until_input()
-                self.logger.debug(f'{self.pid} {lines}')
 
                 self.input_event = lines[-1]
-                self.logger.debug(f'{self.pid} input event {self.input_event}')
+                self.logger.debug('%s input event %r',
+                                  self.pid, self.input_event)
 
                 if self.input_event == b'SKIP\n':
                     self.syscall.extract_syscall(lines[:-1])
 
                     # Continue if syscall is to be skipped
                     if self.syscall.name in self.syscalls_to_skip:
-                        self.logger.debug(f'{self.pid} Syscall {self.syscall.name} is filtered. Skipping')
+                        self.logger.debug('%s Syscall %s is filtered. Skipping',
+                                          self.pid, self.syscall.name)
                         self.write_input('1\n')
                         continue
                     
-                    self.logger.debug(f'{self.pid} Intercepting {self.syscall.name}')
+                    self.logger.debug('%s Intercepting %s',
+                                      self.pid, self.syscall.name)
                     self.write_input('0\n')
                 
-                self.logger.debug(f'{self.pid} wait signal')
-                self.is_paused = True
-                self.paused.emit(True)
+                self.logger.debug('%s wait signal', self.pid)
+                self.set_paused(True)
                 self.pause_event.wait()
-                self.is_paused = False
-                self.paused.emit(False)
-                self.logger.debug(f'{self.pid} continue signal')
+                self.set_paused(False)
+                self.logger.debug('%s continue signal', self.pid)
                 self.pause_event.clear()
             except TracerError:
                 self.input_event = b'FINISH'
-                self.is_paused = True
-                self.paused.emit(True)
+                self.set_paused(True)
+
+    def add_pause_listener(self, listener: Callable[[bool], None]) -> None:
+        """
+        Adds a callable that is called with the new paused state
+            whenever the tracer pauses or continues.
+        """
+        self.pause_listeners.append(listener)
+
+    def set_paused(self, paused: bool) -> None:
+        self.is_paused = paused
+        for listener in self.pause_listeners:
+            listener(paused)
 
     def continue_execution(self):
         """
@@ -214,18 +219,18 @@ class TracerHandler(QObject):
             except IOError:
                 pass
             if errors:
-                self.logger.warning(f'TracerError {self.pid} {errors}')
+                self.logger.warning('TracerError %s %r', self.pid, errors)
                 raise TracerError
             
-            self.logger.debug(f'{self.pid} Reading line')
             line = self.proc.stdout.readline()
             lines.append(line)
-            self.logger.debug(f'{self.pid} Readline {line}')
 
             if any(line.startswith(event) \
                    for event in input_events):
-                self.logger.debug(f'{self.pid} Input found')
                 break
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('%s Read until input: %r', self.pid, lines)
         
         return lines
     
@@ -234,11 +239,11 @@ class TracerHandler(QObject):
         Adds a syscall name to the syscalls to skip filter
         """
         self.syscalls_to_skip.add(name)
-        self.logger.debug(f'{self.pid} added AutoSkip {name}')
+        self.logger.debug('%s added AutoSkip %s', self.pid, name)
 
     def remove_autoskip_filter(self, name: str) -> None:
         """
         Removes a syscall name from the syscalls to skip filter
         """
         self.syscalls_to_skip.remove(name)
-        self.logger.debug(f'{self.pid} removed AutoSkip {name}')
+        self.logger.debug('%s removed AutoSkip %s', self.pid, name)
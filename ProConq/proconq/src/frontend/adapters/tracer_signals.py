@@ -0,0 +1,21 @@
+from PyQt6.QtCore import (
+    QObject,
+    pyqtSignal
+)
+
+from proconq.src.backend.tracer.tracer_handler import TracerHandler
+
+
+class TracerSignals(QObject):
+    """
+    Exposes the events of a TracerHandler as Qt signals.
+
+    The TracerHandler reports from its own thread,
+        so connected slots are queued to the receiver's thread.
+    """
+    paused = pyqtSignal(bool)
+
+    def __init__(self, tracer_handler: TracerHandler):
+        super().__init__()
+        self.tracer_handler = tracer_handler
+        self.tracer_handler.add_pause_listener(self.paused.emit)
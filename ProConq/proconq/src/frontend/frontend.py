@@ -2,6 +2,7 @@ from __future__ import annotations
 import sys
 import importlib
 import inspect
+from typing import Callable
 
 from PyQt6.QtWidgets import (
     QApplication,
@@ -14,6 +15,9 @@ from PyQt6.QtGui import (
 )
 
 from PyQt6.QtCore import (
+    QObject,
+    QEvent,
+    QTimer,
     QRect,
     Qt
 )
@@ -21,10 +25,12 @@ from PyQt6.QtCore import (
 from proconq.utils.constants import (
     Colors,
     Paths,
-    TypeAliases,
     Literals
 )
 from proconq.utils.gui.stylesheets import Stylesheets
+from proconq.utils.gui.type_aliases import TypeAliases
+from proconq.utils.startup_timer import StartupTimer
+from proconq.setup_logging import setup_logging
 from proconq.src.backend.tracer.tracer_handler import TracerHandler
 
 
@@ -67,18 +73,16 @@ class FrontendUtils:
         return toolbar
     
     @staticmethod
-    def create_toolbar_pages(
+    def register_toolbar_pages(
         module_name: str,
-        main_window: QMainWindow,
-        toolbar_pages_order: list[str],
-        frontend: Frontend
-    ) -> dict[str, TypeAliases.WidgetSubclass]:
+        toolbar_pages_order: list[str]
+    ) -> dict[str, type[TypeAliases.WidgetSubclass]]:
         """
-        This function instantiates all the page objects
+        This function collects all the page classes
             in the purpose of adding to the toolbar buttons that show them.
 
-        The toolbar only has buttons with the purpose
-            of switching between pages.
+        The pages themselves aren't created here.
+        A page is instantiated by the Frontend the first time it is shown.
 
         Pages exist inside pages modules.
         module_name is the name of the desired pages module.
@@ -86,11 +90,11 @@ class FrontendUtils:
         toolbar_pages_order is the order in which to sort
             the buttons that are added to the toolbar.
         """
-        # Create a dictionary to contain pages in the format of
-        # PageName: PageInstance
-        pages: dict[str, TypeAliases.WidgetSubclass] = {}
-        for pos, page_name in enumerate(toolbar_pages_order):
-            pages[f'{page_name}Page'] = None
+        # Create a dictionary to contain page factories in the format of
+        # PageName: PageClass
+        factories: dict[str, type[TypeAliases.WidgetSubclass]] = {}
+        for page_name in toolbar_pages_order:
+            factories[f'{page_name}Page'] = None
 
         # Import the module which contains all the Page classes
         module_path = f'{Paths.PAGES_PATH}.{module_name}'
@@ -102,13 +106,24 @@ class FrontendUtils:
         for cls_name, cls in classes:
             # Confirm that the class originates in the module
             if cls.__module__ == module_path:
-                # Instantiate the page instance
-                page_instance: TypeAliases.WidgetSubclass
-                page_instance = cls(parent=main_window, frontend=frontend)
-                # Add the page to the dictionary
-                pages[cls_name] = page_instance
+                factories[cls_name] = cls
 
-        return pages
+        return factories
+
+
+class FirstPaintFilter(QObject):
+    """
+    Calls back once, when the watched widget is first painted.
+    """
+    def __init__(self, callback: Callable[[], None]):
+        super().__init__()
+        self.callback = callback
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            watched.removeEventFilter(self)
+            self.callback()
+        return False
 
 
 class Frontend:
@@ -120,17 +135,24 @@ class Frontend:
 
     The window will have a toolbar.
     Handles switching between pages.
+    Pages are created the first time they are shown,
+        or in idle time after the window is shown if prewarm is set.
     """
+    logger = setup_logging(__name__)
 
     def __init__(self, title: str = 'ProConq',
                  pages_module_name: str = 'base_window',
                  default_page_name: str = 'Home',
                  toolbar_pages_order: list[str] = ['Home', 'Tracer', 'About'],
-                 tracer_handler: TracerHandler = None):
+                 tracer_handler: TracerHandler = None,
+                 prewarm: bool = False,
+                 startup_timer: StartupTimer = None):
         self.tracer_handler = tracer_handler
 
         self.title = title
 
+        self.startup_timer = startup_timer or StartupTimer()
+
         # Create the window
         self.main_window = QMainWindow()
         self.main_window.setWindowTitle(title)
@@ -143,20 +165,39 @@ class Frontend:
         # Set the design and obtain the toolbar object
         self.toolbar = FrontendUtils.set_window_design(self.main_window)
 
-        # Instantiate all the pages
-        self.pages: dict[str, TypeAliases.WidgetSubclass]
-        self.pages = FrontendUtils.create_toolbar_pages(
+        # Register the pages, each is created when first shown
+        self.page_factories: dict[str, type[TypeAliases.WidgetSubclass]]
+        self.page_factories = FrontendUtils.register_toolbar_pages(
             module_name=pages_module_name,
-            main_window=self.main_window,
-            toolbar_pages_order=toolbar_pages_order,
-            frontend=self)
+            toolbar_pages_order=toolbar_pages_order)
+        self.pages: dict[str, TypeAliases.WidgetSubclass] = {}
+        self.current_page: TypeAliases.WidgetSubclass = None
         
         # Load the pages buttons into the toolbar
         self.load_toolbar_buttons()
 
+        # Report the startup timings once the window is on screen
+        self.first_paint_filter = FirstPaintFilter(self.first_paint)
+        self.main_window.installEventFilter(self.first_paint_filter)
+
         # Show the main window and load its default page
         self.main_window.show()
         self.show_page(default_page_name)
+        self.startup_timer.mark('window')
+
+        if prewarm:
+            QTimer.singleShot(0, self.prewarm_pages)
+
+    def get_page(self, page_name: str) -> TypeAliases.WidgetSubclass:
+        """
+        Returns a page instance, creating it if it wasn't created yet.
+        page_name is in the class recognition name format.
+        """
+        if page_name not in self.pages:
+            page_class = self.page_factories[page_name]
+            self.pages[page_name] = page_class(parent=self.main_window,
+                                               frontend=self)
+        return self.pages[page_name]
 
     def show_page(self, page_name: str):
         """
@@ -164,12 +205,31 @@ class Frontend:
         """
         # Modify the name to match the class recognition name
         page_name += 'Page'
-        self.pages[page_name].setVisible(True)
+        page_instance = self.get_page(page_name)
+
+        # Remove the visiblity of the previous page.
+        if self.current_page is not None \
+                and self.current_page is not page_instance:
+            self.current_page.setVisible(False)
 
-        # Remove the visiblity of all other pages.
-        for page, page_instance in self.pages.items():
-            if page != page_name:
-                page_instance.setVisible(False)
+        page_instance.setVisible(True)
+        self.current_page = page_instance
+
+    def prewarm_pages(self):
+        """
+        Creates the pages that weren't shown yet, one per event loop
+            iteration so the window stays responsive meanwhile.
+        """
+        for page_name in self.page_factories:
+            if page_name not in self.pages:
+                self.get_page(page_name)
+                QTimer.singleShot(0, self.prewarm_pages)
+                return
+
+    def first_paint(self):
+        self.startup_timer.mark('first_paint')
+        self.logger.info('Startup %s: %s',
+                         self.title, self.startup_timer.report())
 
     def load_toolbar_buttons(self):
         """
@@ -178,7 +238,7 @@ class Frontend:
             and applies a show_page click action to them.
         """
         # Iterate all pages
-        for action_name, page_instance in self.pages.items():
+        for action_name in self.page_factories:
             # Set visual button's name
             action_name = action_name.replace('Page', '')
             qaction = QAction(action_name, self.main_window)
@@ -189,11 +249,31 @@ class Frontend:
             self.toolbar.addAction(qaction)
 
 
+def launch_tracer(is_pid: bool, command: str) -> Frontend:
+    """
+    Starts tracing a process and opens its interceptor window.
+    """
+    tracer_handler = TracerHandler(is_pid, command)
+
+    return Frontend(
+        title=f'Tracer PID {tracer_handler.pid}',
+        pages_module_name='interceptor_window',
+        default_page_name='Interceptor',
+        toolbar_pages_order=['Interceptor', 'Help'],
+        tracer_handler=tracer_handler
+    )
+
+
 def launch_default_ui():
     """
     Instantiates the PyQt Application, including the default frontend.
     Enters the PyQt Application execution loop.
     """
+    startup_timer = StartupTimer(StartupTimer.process_start)
+    startup_timer.mark('import')
+
     app = QApplication(sys.argv)
-    def_ui = Frontend()
+    startup_timer.mark('qapplication')
+
+    def_ui = Frontend(prewarm=True, startup_timer=startup_timer)
     sys.exit(app.exec())
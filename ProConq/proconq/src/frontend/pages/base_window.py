@@ -72,7 +72,7 @@ class TracerPage(QWidget):
         self.textboxes['file_execution'] = self.add_file_execution_textbox(
             file_execution_button)
         
-        self.name_scroll_area = self.create_name_scroll_area()
+        self.process_picker = self.create_process_picker()
 
     @property
     def selected_pid(self):
@@ -110,6 +110,7 @@ class TracerPage(QWidget):
         PagesUtils.place_widget(self, textbox, Stylesheets.textbox,
                                  780, 380)
         textbox.returnPressed.connect(button.click)
+        textbox.textChanged.connect(self.search_by_name)
         return textbox
     
     def add_selected_pid_prompt_label(self) -> None:
@@ -165,47 +166,15 @@ class TracerPage(QWidget):
         textbox.returnPressed.connect(button.click)
         return textbox
 
-    def create_name_scroll_area(self) -> QScrollArea:
-        scroll_area = QScrollArea(self)
-        scroll_area.setStyleSheet(Stylesheets.name_scroll_area)
-
-        scroll_area.setWidgetResizable(True)
-
-        scroll_area.setHorizontalScrollBarPolicy(
-            Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        scroll_area.setVerticalScrollBarPolicy(
-            Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
-        
-        scroll_area.setMaximumSize(150, 200)
-
-        scroll_area.setGeometry(QRect(1020, 340,
-                                      self.width(),
-                                      self.height()))
-
-        widget = QWidget(scroll_area)
-        widget.setMinimumSize(50, 10)
-        widget.setStyleSheet('background-color: transparent;')
-
-        scroll_area.setWidget(widget)
-
-        return scroll_area
-    
-    def add_button_to_scroll_area(self, button_text: str) -> None:
-        buttons_widget = self.name_scroll_area.widget()
-        button = QPushButton(button_text, buttons_widget)
-        button.setStyleSheet(Stylesheets.scroll_area_button)
-        
-        buttons_amount = buttons_widget.minimumHeight() // 40
-        button_y = 10 + 40 * buttons_amount
-
-        button.setGeometry(10, button_y, 107, 35)
-        button.show()
-
-        button.clicked.connect(lambda: \
-                               self.scroll_button_select_pid(button_text))
-
-        new_height = 10 + (buttons_amount + 1) * 40
-        buttons_widget.setMinimumHeight(new_height)
+    def create_process_picker(self) -> ProcessPicker:
+        """
+        Creates the live process list that the name textbox searches.
+        """
+        picker = ProcessPicker(self)
+        picker.setStyleSheet(Stylesheets.process_list)
+        picker.setGeometry(QRect(1000, 300, 190, 300))
+        picker.process_selected.connect(self.picker_select_pid)
+        return picker
 
     def create_multiple_pids_label(self) -> QLabel:
         label = QLabel('Multiple PIDs Detected ►', self)
@@ -214,21 +183,11 @@ class TracerPage(QWidget):
         label.hide()
         return label
 
-    def scroll_button_select_pid(self, pid: str):
+    def picker_select_pid(self, pid: str):
         self.reset_inputs()
         self.textboxes['pid'].setText(pid)
         self.select_by_pid()
 
-    def clear_scroll_area(self) -> None:
-        buttons = self.name_scroll_area.findChildren(QPushButton)
-        buttons_widget = self.name_scroll_area.widget()
-
-        for button in buttons:
-            button.deleteLater()
-            
-            new_height = max(0, buttons_widget.minimumHeight() - 40)
-            buttons_widget.setMinimumHeight(new_height)
-            
     def select_by_pid(self) -> None:
         pid = self.textboxes['pid'].text()
         self.reset_inputs()
@@ -240,9 +199,28 @@ class TracerPage(QWidget):
                 self.invalid_pid_label, 5)
 
     def select_by_name(self) -> None:
-        name = self.textboxes['name'].text()
-        self.reset_inputs()
-        pids = TracerUtils.get_valid_pids_by_name(name)
+        """
+        Selects the process the name search points to.
+        Processes named exactly like the search come first, like pidof,
+            the attachable ones are candidates. Without any, the
+            highlighted row of the picker is selected, or its best match.
+        The search itself is live, see search_by_name.
+        """
+        name = self.textboxes['name'].text().strip()
+        self.reset_inputs(keep_name=True)
+
+        pids = []
+        if name:
+            highlighted = self.process_picker.highlighted_pid()
+            exact_pids = self.process_picker.exact_pids(name)
+            if exact_pids:
+                pids = [pid for pid in exact_pids
+                        if TracerUtils.is_pid_valid(pid)]
+                if len(pids) > 1 and highlighted in pids:
+                    pids = [highlighted]
+            else:
+                pid = highlighted or self.process_picker.top_pid()
+                pids = [pid] if pid is not None else []
 
         if not pids:
             self.invalid_name_timer = PagesUtils.show_label_for_seconds(
@@ -258,14 +236,14 @@ class TracerPage(QWidget):
             self.multiple_pids_timer = PagesUtils.show_label_for_seconds(
                 self.multiple_pids_label, 5)
 
-            for pid in pids:
-                self.add_button_to_scroll_area(pid)
+    def search_by_name(self, query: str) -> None:
+        self.process_picker.set_query(query)
 
-    def reset_inputs(self) -> None:
+    def reset_inputs(self, keep_name: bool = False) -> None:
         self.selected_pid = 'None'
         self.textboxes['pid'].setText('')
-        self.textboxes['name'].setText('')
-        self.clear_scroll_area()
+        if not keep_name:
+            self.textboxes['name'].setText('')
         self.clear_timeouts()
 
     def clear_timeouts(self) -> None:
@@ -282,7 +260,7 @@ class TracerPage(QWidget):
         try:
             if not TracerUtils.is_pid_valid(self.selected_pid):
                 raise TracerError
-            TracerUtils.launch_tracer(True, self.selected_pid)
+            launch_tracer(True, self.selected_pid)
         except TracerError:
             self.attachment_fail_timer = PagesUtils.show_label_for_seconds(
                 self.attachment_fail_label, 5
@@ -3,7 +3,6 @@ from PyQt6.QtWidgets import (
     QLabel,
     QLineEdit,
     QPushButton,
-    QScrollArea,
     QMainWindow
 )
 from PyQt6.QtCore import (
@@ -17,4 +16,8 @@ from proconq.utils.gui.stylesheets import Stylesheets
 from proconq.utils.tracer_utils import TracerUtils
 from proconq.utils.exceptions import TracerError
 from proconq.src.frontend.pages.pages_utils import PagesUtils
-from proconq.src.frontend.frontend import Frontend
+from proconq.src.frontend.widgets.process_picker import ProcessPicker
+from proconq.src.frontend.frontend import (
+    Frontend,
+    launch_tracer
+)
@@ -2,6 +2,7 @@
 from proconq.src.frontend.pages.common_imports import *
 from proconq.setup_logging import setup_logging
 from proconq.src.backend.tracer.tracer_handler import Syscall
+from proconq.src.frontend.adapters.tracer_signals import TracerSignals
 
 
 """
@@ -16,15 +17,18 @@ class InterceptorPage(QWidget):
     def __init__(self, parent: QMainWindow = None, frontend: Frontend = None):
         super().__init__(parent)
 
-        self.logger = setup_logging(__name__)
-
         self.frontend = frontend
         self.tracer_handler = self.frontend.tracer_handler
 
+        self.logger = setup_logging(__name__,
+                                    f'pid-{self.tracer_handler.pid}')
+
         # Used for skipping. Saves the arrival state before changes
         self.syscall_arrival_backup: Syscall = None
 
-        self.tracer_handler.paused.connect(self.handle_tracer_paused)
+        # Delivers the pause changes of the tracer thread to the GUI thread
+        self.tracer_signals = TracerSignals(self.tracer_handler)
+        self.tracer_signals.paused.connect(self.handle_tracer_paused)
 
         PagesUtils.set_standard_configs(self)
 
@@ -178,12 +182,13 @@ class InterceptorPage(QWidget):
 
     def handle_tracer_paused(self, paused: bool):
         if paused:
-            self.logger.debug(f'Paused {self.tracer_handler.pid}')
+            self.logger.debug('Paused %s', self.tracer_handler.pid)
 
             event_name = self.tracer_handler.input_event.decode().strip()
             
             if event_name.startswith('FINISH'):
-                self.logger.debug(f'FINISH: Closing PID {self.tracer_handler.pid}')
+                self.logger.debug('FINISH: Closing PID %s',
+                                  self.tracer_handler.pid)
                 super().close()
                 self.frontend.main_window.close()
                 return
@@ -202,7 +207,7 @@ class InterceptorPage(QWidget):
 
             self.update_ui()
         else:
-            self.logger.debug(f'Unpaused {self.tracer_handler.pid}')
+            self.logger.debug('Unpaused %s', self.tracer_handler.pid)
             self.reset_ui()
 
     def set_ui_args(self, args_amount: int, args: list[str],
@@ -239,11 +244,11 @@ class InterceptorPage(QWidget):
         pid = self.tracer_handler.pid
 
         # Update name
-        self.logger.debug(f'PID {pid} updating name to {syscall.name}')
+        self.logger.debug('PID %s updating name to %s', pid, syscall.name)
         self.name_textbox.setText(syscall.name)
 
         # Update args
-        self.logger.debug(f'PID {pid} updating args to {syscall.args}')
+        self.logger.debug('PID %s updating args to %s', pid, syscall.args)
         if syscall.is_entry:
             self.set_ui_args(syscall.args_amount,
                              syscall.args, syscall.args_types)
@@ -9,11 +9,9 @@ from PyQt6.QtCore import (
     QTimer
 )
 
-from proconq.utils.constants import (
-    TypeAliases,
-    Literals
-)
+from proconq.utils.constants import Literals
 from proconq.utils.gui.stylesheets import Stylesheets
+from proconq.utils.gui.type_aliases import TypeAliases
 
 
 class PagesUtils:
@@ -0,0 +1,293 @@
+from PyQt6.QtWidgets import (
+    QWidget,
+    QListView,
+    QAbstractItemView
+)
+from PyQt6.QtCore import (
+    QObject,
+    QThread,
+    QTimer,
+    QModelIndex,
+    QAbstractListModel,
+    QSortFilterProxyModel,
+    QCoreApplication,
+    Qt,
+    pyqtSignal
+)
+
+from proconq.utils.constants import Literals
+from proconq.src.backend.processes.process_scanner import (
+    ProcessInfo,
+    ProcessDiff,
+    ProcessScanner,
+    FuzzyMatcher
+)
+
+
+class ProcessPollWorker(QObject):
+    """
+    Polls /proc on a background thread.
+    Only the differences between polls are sent to the UI thread,
+        as snapshots the thread never touches again.
+    """
+    diff_ready = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.scanner = ProcessScanner()
+        self.timer: QTimer = None
+
+    def start(self) -> None:
+        # The timer has to be created inside the worker thread
+        if self.timer is None:
+            self.timer = QTimer()
+            self.timer.timeout.connect(self.poll)
+        self.poll()
+        self.timer.start(Literals.PROCESS_POLL_MS)
+
+    def stop(self) -> None:
+        if self.timer is not None:
+            self.timer.stop()
+
+    def poll(self) -> None:
+        diff = self.scanner.poll()
+        if diff:
+            self.diff_ready.emit(diff)
+
+
+class ProcessListModel(QAbstractListModel):
+    """
+    Holds every running process, one per row.
+    Rows are inserted, removed and updated incrementally.
+    """
+    def __init__(self, parent: QObject = None):
+        super().__init__(parent)
+        self.processes: list[ProcessInfo] = []
+        self.rows: dict[int, int] = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.processes)
+
+    def data(self, index: QModelIndex,
+             role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        process = self.processes[index.row()]
+
+        match role:
+            case Qt.ItemDataRole.DisplayRole:
+                return ProcessListModel.format_process(process)
+            case Qt.ItemDataRole.ToolTipRole:
+                return f'{process.user}: {process.cmdline or process.name}'
+            case Qt.ItemDataRole.UserRole:
+                return str(process.pid)
+        return None
+
+    @staticmethod
+    def format_process(process: ProcessInfo) -> str:
+        if process.syscall_rate is None:
+            syscall_rate = '?'
+        else:
+            syscall_rate = f'{process.syscall_rate:.0f}'
+        return (f'{process.pid}  {process.name}\n'
+                f'{process.cpu_percent:.1f}% cpu  {syscall_rate} sc/s')
+
+    def apply_diff(self, diff: ProcessDiff) -> None:
+        """
+        Applies the changes of a single poll to the model.
+        """
+        if diff.removed:
+            self.remove_processes(diff.removed)
+
+        if diff.added:
+            first = len(self.processes)
+            self.beginInsertRows(QModelIndex(), first,
+                                 first + len(diff.added) - 1)
+            for row, process in enumerate(diff.added, first):
+                self.processes.append(process)
+                self.rows[process.pid] = row
+            self.endInsertRows()
+
+        updated_rows = []
+        for process in diff.updated:
+            row = self.rows.get(process.pid)
+            if row is not None:
+                self.processes[row] = process
+                updated_rows.append(row)
+        if updated_rows:
+            self.dataChanged.emit(self.index(min(updated_rows)),
+                                  self.index(max(updated_rows)))
+
+    def remove_processes(self, pids: list[int]) -> None:
+        rows = sorted((self.rows.pop(pid) for pid in pids
+                       if pid in self.rows), reverse=True)
+
+        # Remove consecutive rows together, from the bottom up
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.processes[first:last + 1]
+            self.endRemoveRows()
+
+        for row, process in enumerate(self.processes):
+            self.rows[process.pid] = row
+
+
+class ProcessSearchModel(QSortFilterProxyModel):
+    """
+    Filters and ranks the processes by a fuzzy search query.
+    Without a query the busiest processes come first.
+    Scores are cached by PID with the process' start time, a snapshot
+        with new stats keeps its score and a reused PID gets a new one.
+    """
+    def __init__(self, parent: QObject = None):
+        super().__init__(parent)
+        self.query = ''
+        # pid -> (start time, score)
+        self.scores: dict[int, tuple[int, int]] = {}
+
+        self.setDynamicSortFilter(True)
+        self.sort(0, Qt.SortOrder.DescendingOrder)
+
+    def set_query(self, query: str) -> None:
+        query = query.strip().lower()
+        if query == self.query:
+            return
+        self.query = query
+        self.scores = {}
+        self.invalidate()
+
+    def score(self, process: ProcessInfo) -> int:
+        cached = self.scores.get(process.pid)
+        if cached is None or cached[0] != process.start_time:
+            cached = (process.start_time,
+                      FuzzyMatcher.score(self.query, process))
+            self.scores[process.pid] = cached
+        return cached[1]
+
+    def forget(self, pids: list[int]) -> None:
+        """
+        Drops the scores of processes that are gone.
+        """
+        rows = self.sourceModel().rows
+        for pid in pids:
+            if pid not in rows:
+                self.scores.pop(pid, None)
+
+    def filterAcceptsRow(self, source_row: int,
+                         source_parent: QModelIndex) -> bool:
+        process = self.sourceModel().processes[source_row]
+        return self.score(process) > 0
+
+    def lessThan(self, left: QModelIndex, right: QModelIndex) -> bool:
+        processes = self.sourceModel().processes
+        left_process = processes[left.row()]
+        right_process = processes[right.row()]
+
+        if self.query:
+            left_key = self.score(left_process)
+            right_key = self.score(right_process)
+        else:
+            left_key = left_process.cpu_percent
+            right_key = right_process.cpu_percent
+
+        if left_key == right_key:
+            # Sorted descending, so lower PIDs come first on ties
+            return left_process.pid > right_process.pid
+        return left_key < right_key
+
+
+class ProcessPicker(QListView):
+    """
+    A live, searchable list of the running processes.
+    Only the visible rows are ever drawn.
+    The polling thread only runs while the picker is shown, it's stopped
+        and waited for when the picker is hidden, closed with its window,
+        or the application quits.
+    """
+    process_selected = pyqtSignal(str)
+
+    start_polling = pyqtSignal()
+    stop_polling = pyqtSignal()
+
+    def __init__(self, parent: QWidget = None):
+        super().__init__(parent)
+
+        self.process_model = ProcessListModel(self)
+        self.search_model = ProcessSearchModel(self)
+        self.search_model.setSourceModel(self.process_model)
+        self.setModel(self.search_model)
+
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setHorizontalScrollBarPolicy(
+            Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.activated.connect(self.select_index)
+        self.clicked.connect(self.select_index)
+
+        self.worker_thread = QThread(self)
+        self.worker = ProcessPollWorker()
+        self.worker.moveToThread(self.worker_thread)
+        self.worker.diff_ready.connect(self.apply_diff)
+        self.start_polling.connect(self.worker.start)
+        # Stopped before the thread's event loop quits
+        self.stop_polling.connect(
+            self.worker.stop, Qt.ConnectionType.BlockingQueuedConnection)
+
+        QCoreApplication.instance().aboutToQuit.connect(self.shutdown)
+
+    def apply_diff(self, diff: ProcessDiff) -> None:
+        self.process_model.apply_diff(diff)
+        self.search_model.forget(diff.removed)
+
+    def set_query(self, query: str) -> None:
+        self.search_model.set_query(query)
+        self.scrollToTop()
+
+    def exact_pids(self, name: str) -> list[str]:
+        """
+        Returns the PIDs of the processes named exactly name.
+        """
+        return [str(process.pid) for process in self.process_model.processes
+                if process.name == name]
+
+    def highlighted_pid(self) -> str | None:
+        index = self.currentIndex()
+        if not index.isValid():
+            return None
+        return index.data(Qt.ItemDataRole.UserRole)
+
+    def top_pid(self) -> str | None:
+        """
+        Returns the PID of the best match, None if nothing matches.
+        """
+        if not self.search_model.rowCount():
+            return None
+        return self.search_model.index(0, 0).data(Qt.ItemDataRole.UserRole)
+
+    def select_index(self, index: QModelIndex) -> None:
+        self.process_selected.emit(index.data(Qt.ItemDataRole.UserRole))
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        if not self.worker_thread.isRunning():
+            self.worker_thread.start()
+        self.start_polling.emit()
+
+    def hideEvent(self, event) -> None:
+        super().hideEvent(event)
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        """
+        Stops polling and waits for the thread to finish.
+        """
+        if not self.worker_thread.isRunning():
+            return
+        self.stop_polling.emit()
+        self.worker_thread.quit()
+        self.worker_thread.wait()
@@ -1,7 +1,5 @@
+import os
 from pathlib import Path
-from typing import TypeVar
-
-from PyQt6.QtWidgets import QWidget
 
 
 class Colors:
@@ -24,19 +22,30 @@ class Paths:
 
     SYSTEM_CHECKS: Path = PROJECT_DIR / 'bin' / 'system_checks'
     CHECK_ATTACHABILITY: Path = SYSTEM_CHECKS / 'check_ptrace_attachability'
-    PIDOF: Path = SYSTEM_CHECKS / 'pidof'
     
     PAGES_PATH: str = 'proconq.src.frontend.pages'
 
+    PROC: Path = Path('/proc')
+
     INTERCEPTOR: str = 'proconq/bin/interceptor/interceptor'
 
 
-class TypeAliases:
-    WidgetSubclass = TypeVar('WidgetSubclass', bound=QWidget)
+class Logging:
+    LEVEL: str = os.environ.get('PROCONQ_LOG_LEVEL', 'INFO').upper()
+    FORMAT: str = \
+        '%(levelname)s %(asctime)s %(name)s %(funcName)s # %(message)s'
+
+    # Files are rotated when reaching either limit, then compressed
+    MAX_FILE_BYTES: int = 10 * 1024 * 1024
+    MAX_FILE_AGE: int = 24 * 60 * 60
+    # The oldest logs are deleted once the directory exceeds this
+    QUOTA_BYTES: int = 512 * 1024 * 1024
+    MAX_OPEN_FILES: int = 64
 
 
 class Literals:
     WIDTH = 1200
     HEIGHT = 800
     TOOLBAR_HEIGHT = 40
+    PROCESS_POLL_MS = 1000
     
\ No newline at end of file
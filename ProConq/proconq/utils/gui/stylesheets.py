@@ -114,31 +114,26 @@ class Stylesheets:
             width: 900px;
         }}
     '''
-    name_scroll_area = f'''
-        QScrollArea {{
+    process_list = f'''
+        QListView {{
             background-color: {Colors.DARKSLATEGRAY};
+            color: white;
+            font-size: 14px;
+            font-weight: bold;
             border: 5px solid {Colors.TEAL};
             border-radius: 10px;
         }}
-    '''
-    scroll_area_button = f'''
-        QPushButton {{
-            background-color: {Colors.TEAL};
-            color: white;
-            font-size: 20px;
-            font-weight: bold;
-            padding: 10px 20px;
-            border-radius: 5px;
+
+        QListView::item {{
+            padding: 4px;
         }}
 
-        QPushButton:hover {{
-            background-color: {Colors.MEDIUMAQUAMARINE};
-            color: {Colors.CADETBLUE}
+        QListView::item:hover {{
+            background-color: {Colors.CADETBLUE};
         }}
 
-        QPushButton:pressed {{
-            background-color: {Colors.DARKSLATEGRAY};
-            color: {Colors.CADETBLUE}
+        QListView::item:selected {{
+            background-color: {Colors.TEAL};
         }}
     '''
     multiple_pids_label = f'''
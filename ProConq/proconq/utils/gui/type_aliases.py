@@ -0,0 +1,7 @@
+from typing import TypeVar
+
+from PyQt6.QtWidgets import QWidget
+
+
+class TypeAliases:
+    WidgetSubclass = TypeVar('WidgetSubclass', bound=QWidget)
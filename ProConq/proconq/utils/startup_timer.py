@@ -0,0 +1,31 @@
+import time
+
+
+class StartupTimer:
+    """
+    Measures the stages of opening a window.
+
+    Every mark records the time since the previous mark,
+        so the report shows how long each stage took on its own.
+    """
+    # The earliest moment we know of, the first import of this module
+    process_start = time.perf_counter()
+
+    def __init__(self, start: float = None):
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.stages: list[tuple[str, float]] = []
+
+    def mark(self, stage: str) -> None:
+        """
+        Ends a stage that began at the previous mark.
+        """
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def report(self) -> str:
+        stages = ', '.join(f'{stage} {duration * 1000:.1f}ms'
+                           for stage, duration in self.stages)
+        total = (self.last - self.start) * 1000
+        return f'{stages}, total {total:.1f}ms'
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The package is imported the way python -m runs it, from this project
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
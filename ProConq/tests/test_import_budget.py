@@ -0,0 +1,65 @@
+"""
+Checks that the non-GUI modules import without loading Qt.
+Each module is imported in a fresh interpreter with -X importtime.
+
+Import times depend on the machine and its disk cache, a module over
+    its budget is only reported as a warning.
+"""
+import re
+import subprocess
+import sys
+import warnings
+
+import pytest
+
+from proconq.utils.constants import Paths
+
+# Modules that must be importable without a GUI, and the cumulative
+# import time each is expected to take, in microseconds
+BUDGETS: dict[str, int] = {
+    'proconq.utils.constants': 40_000,
+    'proconq.setup_logging': 80_000,
+    'proconq.utils.tracer_utils': 100_000,
+    'proconq.src.backend.tracer.tracer_handler': 100_000,
+    'proconq.src.backend.processes.process_scanner': 80_000,
+}
+
+# Packages that may only be imported by the frontend
+GUI_PACKAGES = ('PyQt6',)
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+\d+ \|\s+(\d+) \| +(\S+)')
+
+
+def measure(module_name: str) -> dict[str, int]:
+    """
+    Imports a module in a new interpreter.
+    Returns the cumulative import time of every module it loaded.
+    """
+    import_proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=Paths.PROJECT_DIR.parent,
+        stderr=subprocess.PIPE)
+    stderr = import_proc.stderr.decode()
+    assert import_proc.returncode == 0, \
+        f'{module_name} failed to import: {stderr.strip()}'
+
+    timings: dict[str, int] = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            timings[match.group(2)] = int(match.group(1))
+    return timings
+
+
+@pytest.mark.parametrize('module_name, budget', BUDGETS.items())
+def test_import_budget(module_name: str, budget: int):
+    timings = measure(module_name)
+
+    gui_modules = [name for name in timings
+                   if name.split('.')[0] in GUI_PACKAGES]
+    assert not gui_modules, f'{module_name} imports {", ".join(gui_modules)}'
+
+    cumulative = timings.get(module_name, 0)
+    if cumulative > budget:
+        warnings.warn(f'{module_name} took {cumulative}us, '
+                      f'budget is {budget}us')
@@ -1,24 +1,35 @@
 import logging
 
-from ccui.utils.constants import Paths
+from ccui.utils.constants import (
+    Paths,
+    Logging
+)
+from proconq_common.logging_pipeline import (
+    LoggingPipeline,
+    session_logger
+)
 
 
-def setup_logging(logger_name: str) -> logging.Logger:
-    # Create logger
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
+# The handlers shared by all the loggers of the package, only files,
+# the console belongs to the prompt
+pipeline = LoggingPipeline(Paths, Logging, console=False)
 
-    # Create file handler
-    file_path = Paths.LOGGING / f'{logger_name}.log'
-    file_handler = logging.FileHandler(file_path)
-    file_handler.setLevel(logging.DEBUG)
 
-    # Create formatter and apply to file handler
-    logging_format = '%(levelname)s %(asctime)s %(name)s %(funcName)s # %(message)s'
-    formatter = logging.Formatter(logging_format)
-    file_handler.setFormatter(formatter)
+def setup_logging(logger_name: str,
+                  session: str = None) -> logging.Logger:
+    """
+    Returns a logger that logs through the package's pipeline.
+    Calling it again for the same name returns the same logger,
+        without adding handlers.
 
-    # Apply file handler to logger
-    logger.addHandler(file_handler)
+    If a session is given, the records are written to a separate file,
+        logs/<logger_name>.<session>.log
+    """
+    return pipeline.setup_logging(logger_name, session)
 
-    return logger
+
+def set_level(level: int | str) -> None:
+    """
+    Changes the level of every logger of the package at runtime.
+    """
+    pipeline.set_level(level)
@@ -10,7 +10,10 @@ from ccui.utils.errors import (
     BreakTry,
     InvalidUsername
 )
-from ccui.utils.constants import Paths
+from ccui.utils.constants import (
+    ClientIDs,
+    Paths
+)
 from ccui.tools.chat.chat_client import ChatClient
 from ccui.setup_logging import setup_logging
 
@@ -151,6 +154,82 @@ class ChatPrompt(Cmd, metaclass=ccui.utils.util.Singleton):
         rprint("[#16C60C]Getting active users list...[/#16C60C]")
         self.chat_client.get_users()
 
+    def do_subscribe(self, args: str) -> None:
+        """
+        subscribe
+
+        Description:
+            Get the list of online users, then get told
+                whenever a user joins, leaves or logs in.
+        """
+        if args.strip():
+            return self.no_args('subscribe')
+        rprint("[#16C60C]Subscribing to active users...[/#16C60C]")
+        self.chat_client.subscribe()
+
+    def do_rooms(self, args: str) -> None:
+        """
+        rooms
+
+        Description:
+            Get the list of rooms, with their members and message counts.
+        """
+        if args.strip():
+            return self.no_args('rooms')
+        rprint("[#16C60C]Requesting rooms...[/#16C60C]")
+        self.chat_client.get_rooms()
+
+    def do_join(self, room: str) -> None:
+        """
+        join [room]
+
+        Description:
+            Join a room, it's created if nobody is in it.
+            Rooms are joined again after reconnecting.
+
+        Parameter List:
+            ROOM -- name of the room, letters and digits only.
+        """
+        room = room.strip()
+        if not room:
+            return print('  Usage: join [room]')
+        if not room.isalnum():
+            return rprint(f"[#E74856]ERROR: Invalid room name: {room}[/#E74856]")
+        rprint("[#16C60C]Joining room...[/#16C60C]")
+        self.chat_client.join(room)
+
+    def do_leave(self, room: str) -> None:
+        """
+        leave [room]
+
+        Description:
+            Leave a room.
+        """
+        room = room.strip()
+        if not room:
+            return print('  Usage: leave [room]')
+        rprint("[#16C60C]Leaving room...[/#16C60C]")
+        self.chat_client.leave(room)
+
+    def do_publish(self, args: str) -> None:
+        """
+        publish [room] [message]
+
+        Description:
+            Send a message to everyone in a room you joined.
+            Members that are offline don't get it later.
+
+        Parameter List:
+            ROOM -- name of the room.
+            MESSAGE -- message to send.
+        """
+        if len(args.split()) < 2:
+            return print('  Usage: publish [room] [message]')
+        room = args.split()[0]
+        message = args.strip()[len(room) + 1:]
+        rprint("[#16C60C]Sending message...[/#16C60C]")
+        self.chat_client.publish(room, message)
+
     def do_login(self, args: str) -> None:
         """
         login [name] [password]
@@ -223,30 +302,37 @@ class ChatPrompt(Cmd, metaclass=ccui.utils.util.Singleton):
 
     def do_message(self, args: str) -> None:
         """
-        message [id] [message]
+        message [id | name] [message]
 
         Description:
             Send a message to a user.
+            Sent by name, it reaches every session of the user,
+                or waits for it to log in.
 
         Parameter List:
             ID -- id of the desired user.
+            NAME -- name of the desired registered user.
             MESSAGE -- message to send.
         """
         if not args.split():
-            return print('  Usage: connect [id] [message]')
+            return print('  Usage: message [id | name] [message]')
         try:
-            receiver_id = args.split()[0]
-            message = args[len(receiver_id) + 1:]
+            receiver = args.split()[0]
+            message = args[len(receiver) + 1:]
 
-            receiver_id = int(receiver_id)
-            if not (1000 <= receiver_id <= 9999):
+            if receiver.isalpha():
+                rprint(f"[#16C60C]Sending message...[/#16C60C]")
+                return self.chat_client.send_message_to(receiver, message)
+
+            receiver_id = int(receiver)
+            if not (ClientIDs.MIN_ID <= receiver_id <= ClientIDs.MAX_ID):
                 raise ValueError
             rprint(f"[#16C60C]Sending message...[/#16C60C]")
             self.chat_client.send_message(receiver_id, message)
         except ValueError:
-            return rprint(f"[#E74856]ERROR: Invalid ID: {receiver_id}[/#E74856]")
+            return rprint(f"[#E74856]ERROR: Invalid ID or name: {receiver}[/#E74856]")
         except IndexError:
-            return print('  Usage: message [id] [message]')
+            return print('  Usage: message [id | name] [message]')
     
     def do_mail(self, args: str) -> None:
         """
@@ -283,6 +369,18 @@ class ChatPrompt(Cmd, metaclass=ccui.utils.util.Singleton):
         rprint(f"[#16C060C]Getting database...")
         self.chat_client.database()
 
+    def do_stats(self, args: str) -> None:
+        """
+        stats
+
+        Description:
+            Get the server's metrics (admins only).
+        """
+        if args.strip():
+            return self.no_args('stats')
+        rprint(f"[#16C060C]Getting server metrics...")
+        self.chat_client.stats()
+
     def do_deluser(self, name: str) -> None:
         """
         deluser [name]
@@ -312,6 +410,7 @@ class ChatPrompt(Cmd, metaclass=ccui.utils.util.Singleton):
     do_return = do_back
     do_id = do_getid
     do_msg = do_message
+    do_pub = do_publish
 
 
 def launch(mode: str = 'Chat'):
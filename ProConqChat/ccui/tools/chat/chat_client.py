@@ -1,201 +1,126 @@
-import socket
 import threading
-import ast
 
 from rich import print as rprint
 
 import ccui.utils.util
-from ccui.setup_logging import setup_logging
-from ccui.utils.cryptography import (
-    AESCipher,
-    RSACipher
+from ccui.tools.chat.connection import ChatConnection
+from ccui.utils.protocol import (
+    Opcode,
+    Presence,
+    handles
 )
 
 
-class ChatClient(metaclass=ccui.utils.util.Singleton):
+class ChatClient(ChatConnection, metaclass=ccui.utils.util.Singleton):
     def __init__(self):
-        self.logger = setup_logging(__name__)
-        
-        self.is_connected: bool = False
-
-        self.ip: str = None
-        self.port: int = None
-        
-        self.sock: socket.socket = None
-        self.receive_thread: threading.Thread = None
+        super().__init__()
         self.lock = threading.Lock()
 
-        self.aescipher = AESCipher()
-        self.rsacipher = RSACipher()
+        # Resumes the session after reconnecting to the server that issued it
+        self.session_ticket: bytes = None
+        self.ticket_server: bytes = None
+        # Online users, kept up to date by the server once subscribed
+        self.subscribed: bool = False
+        self.roster: dict[int, str] = {}
+        # Rooms joined, joined again after reconnecting
+        self.rooms: set[str] = set()
 
         self.mail: list[str] = []
 
     def add_mail(self, mail: str) -> None:
         with self.lock:
             self.mail.append(mail)
-            self.logger.debug(f'Added mail: {mail}')
-    
-    def pubkey(self, rsakey: bytes) -> None:
+            self.logger.debug('Added mail: %s', mail)
+
+    def notify(self, text: str) -> None:
+        self.logger.debug(text)
+        rprint(text)
+
+    def handshake_requests(self) -> list[bytes]:
         """
-        Receives the public RSA key of the server.
-        Proceeds the hybrid encryption to inform the server about AES.
+        Resumes the session, the subscription and the rooms
+            of the connection before.
         """
-        message = f'{self.aescipher.key}###{self.aescipher.iv}'
-        self.logger.debug(f'PUBKEY message: {message}')
-        
-        rsakey = ast.literal_eval(rsakey.decode())
-
-        self.logger.debug(f'Setting RSA key: {rsakey}')
-        self.rsacipher.set_public_key(rsakey)
+        requests = []
+        if (self.session_ticket is not None
+                and self.ticket_server == self.server_identity):
+            requests.append(self.build_request(Opcode.RESUME,
+                                               self.session_ticket))
+        if self.subscribed:
+            requests.append(self.build_request(Opcode.SUBSCRIBE))
+        for room in self.rooms:
+            requests.append(self.build_request(Opcode.JOIN, room))
+        return requests
 
-        self.logger.debug('Attempting to build AESKEY request...')
-        request = self.build_request('AESKEY', message)
-        self.send_request(request, False)
+    def send_message(self, receiver_id: int, message: str) -> None:
+        """
+        Sends a message to a user.
+        """
+        self.send_request(self.build_request(Opcode.SNDMSG,
+                                             receiver_id, message))
 
-    def aesconf(self, data: bytes = None) -> None:
+    def send_message_to(self, receiver_name: str, message: str) -> None:
         """
-        Receives the server's confirmation for AES.
+        Sends a message to every session of a user, or to its mailbox.
         """
-        self.logger.debug('Received AES confirmation.')
+        self.send_request(self.build_request(Opcode.SNDNAME,
+                                             receiver_name, message))
 
-    def decrypt_message(self, message: bytes) -> bytes:
-        if message.startswith(b'#PUBKEY'):
-            self.logger.debug('RSA Key Received.')
-            return message
-        dec_message = self.aescipher.decrypt(message)
-        self.logger.debug(f'Decrypted data: {dec_message}')
-        return dec_message
+    def get_users(self) -> None:
+        """
+        Requests users list from server.
+        """
+        self.send_request(self.build_request(Opcode.USERS))
 
-    def encrypt_message(self, message: bytes, use_rsa: bool) -> bytes:
-        if use_rsa:
-            return self.rsacipher.encrypt(message)  
-        return self.aescipher.encrypt(message)
+    def subscribe(self) -> None:
+        """
+        Requests the users list, and every change to it from now on.
+        """
+        self.subscribed = True
+        self.send_request(self.build_request(Opcode.SUBSCRIBE))
 
-    def build_request(self, message_code: str, data: str = None) -> bytes:
+    def join(self, room: str) -> None:
         """
-        Combines message code and data, separates by #
-        Encrypts with the AES or RSA
-        Attaches its size to it
+        Requests to join a room, it's created if nobody is in it.
         """
-        if data:
-            message = f'#{message_code}#{data}'.encode()
-        else:
-            message = f'#{message_code}'.encode()
+        self.send_request(self.build_request(Opcode.JOIN, room))
 
-        if message_code == 'AESKEY':
-            use_rsa = True
-        else:
-            use_rsa = False
-
-        self.logger.debug(f'Encrypting message: {message}')
-        message = self.encrypt_message(message, use_rsa)
-
-        size = str(len(message)).zfill(4).encode()
-        self.logger.debug(f'Built request: {size + message}')
-        return size + message
-
-    def send_request(self, request: bytes, verbose: bool = True) -> None:
-        """
-        Send a request to the server.
-        """
-        self.logger.debug(f'Sending request: {request}')
-        if not self.is_connected:
-            if verbose:
-                output = "[#E74856]ERROR: Client is not connected to any server."
-                self.logger.debug(output)
-                rprint(output)
-            return
-        try:
-            self.sock.sendall(request)
-        except (ConnectionResetError, ConnectionAbortedError):
-            if verbose:
-                output = "[#E74856]ERROR: Client is not connected to any server (server probably crashed)."
-                self.logger.debug(output)
-                rprint(output)
-            self.is_connected = False
-            return
-        if verbose:
-            output = "[#16C60C]Request sent.[/#16C60C]"
-            self.logger.debug(output)
-            rprint(output)
-
-    def receive_loop(self):
-        while self.is_connected:
-            try:
-                data = self.sock.recv(4).decode()
-                size = int(data)
-                self.logger.debug(f'Received size: {size}')
-                data = self.sock.recv(size)
-                self.logger.debug(f'Received data: {data}')
-                data = self.decrypt_message(data)
-                message_code = data.split(b'#')[1].decode()
-                self.logger.debug(f'Message Code: {message_code}')
-                data = data[len(message_code) + 2:]
-                self.logger.debug(f'Data: {data}')
-                getattr(self, message_code.lower())(data)
-            except OSError:
-                break
-            except ValueError:
-                break
-
-    def connect(self, ip: str, port: int) -> None:
-        if self.is_connected:
-            return rprint(f"[#E74856]ERROR: Client is connected already, to ('{ip}', {port})'[/#E74856]")
-        
-        self.ip = ip
-        self.port = port
-
-        try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect((ip, port))
-            self.is_connected = True
-            rprint(f"[#16C60C]Connected to ('{ip}', {port})[/#16C60C]")
-
-            self.receive_thread = threading.Thread(target=self.receive_loop)
-            self.receive_thread.setDaemon(True)
-            self.receive_thread.start()
-        except ConnectionRefusedError:
-            rprint(f"[#E74856]ERROR: Failed to connect to ('{ip}', {port})'[/#E74856]")
-    
-    def disconnect(self) -> None:
-        if self.is_connected:
-            self.is_connected = False
-            self.sock.close()
-            return rprint("[#16C60C]Disconnected.[/#16C60C]")
-        rprint("[#E74856]ERROR: Client is not connected to any server.")
+    def leave(self, room: str) -> None:
+        """
+        Requests to leave a room.
+        """
+        self.rooms.discard(room)
+        self.send_request(self.build_request(Opcode.LEAVE, room))
 
-    def send_message(self, receiver_id: int, message: str) -> None:
+    def publish(self, room: str, message: str) -> None:
         """
-        Sends a message to a user.
+        Sends a message to everyone in a room.
         """
-        self.send_request(self.build_request('SNDMSG',
-                                             f'{receiver_id}#{message}'))
+        self.send_request(self.build_request(Opcode.PUBLISH, room, message))
 
-    def get_users(self) -> None:
+    def get_rooms(self) -> None:
         """
-        Requests users list from server.
+        Requests the rooms list from server.
         """
-        self.send_request(self.build_request('USERS'))
+        self.send_request(self.build_request(Opcode.ROOMS))
 
     def login(self, name: str, password: str) -> None:
         """
         Requests login as user to server.
         """
-        self.send_request(self.build_request('LOGIN',
-                                             f'{name}#{password}'))
+        self.send_request(self.build_request(Opcode.LOGIN, name, password))
         
     def register(self, name: str, password: str) -> None:
         """
         Requests to register as user.
         """
-        self.send_request(self.build_request('REGSTR',
-                                             f'{name}#{password}'))
+        self.send_request(self.build_request(Opcode.REGSTR, name, password))
 
     def get_id(self) -> None:
         """
         Requests user id applied by server.
         """
-        self.send_request(self.build_request('GETID'))
+        self.send_request(self.build_request(Opcode.GETID))
 
     def output_mail(self) -> None:
         """
@@ -211,70 +136,79 @@ class ChatClient(metaclass=ccui.utils.util.Singleton):
         """
         Requests the database.
         """
-        request = self.build_request('DATABASE')
+        request = self.build_request(Opcode.DATABASE)
+        self.send_request(request)
+
+    def stats(self) -> None:
+        """
+        Requests the server's metrics.
+        """
+        request = self.build_request(Opcode.STATS)
         self.send_request(request)
 
     def deluser(self, name: str) -> None:
         """
         Requests to delete a user from the databse.
         """
-        request = self.build_request('DELUSER', name)
+        request = self.build_request(Opcode.DELUSER, name)
         self.send_request(request)
 
     def buffer(self) -> None:
         """
         Requests buffered messages to resend.
         """
-        request = self.build_request('BUFFER')
+        request = self.build_request(Opcode.BUFFER)
         self.send_request(request)
 
-    def bufferconf(self, data: bytes) -> None:
+    @handles(Opcode.BUFFERCONF)
+    def bufferconf(self, messages: list[tuple[int, str]]) -> None:
         """
         Adds to mail list of buffered messages.
         """
-        data = data.decode()
-
-        while data:
-            msgsize = int(data[:4])
-            target_id = data[5:9]
-            message = data[10:10 + msgsize]
+        if not messages:
+            return self.add_mail('Buffer is empty')
 
+        for target_id, message in messages:
             self.add_mail(message)
 
-            data = data[11 + msgsize:]
-
-    def databaseconf(self, data: bytes) -> None:
+    @handles(Opcode.DATABASECONF)
+    def databaseconf(self, status: int,
+                     credentials: list[tuple[str, str]]) -> None:
         """
         Gets the database from the server.
         """
-        data = data.decode()
-
-        if data == 'FAILURE':
+        if not status:
             return self.add_mail('[#E74856]ERROR: No access.[/#E74856]')
-        elif data == 'EMPTY':
+        elif not credentials:
             return self.add_mail('Database is empty.')
         
         mail = ''
 
-        while data:
-            passsize = int(data[:4])
-            name = data.split('#')[1]
-            namelen = len(name)
-            password = data[6 + namelen:6 + namelen + passsize]
+        for name, password in credentials:
             mail += f'NAME: {name}\n\tENCRYPTED PASSWORD: {password}\n'
-            data = data[6 + namelen + passsize:]
 
         self.add_mail(mail)
 
-    def deluserconf(self, data: bytes) -> None:
+    @handles(Opcode.STATSCONF)
+    def statsconf(self, status: int, metrics: list[tuple[str, str]]) -> None:
         """
-        Gets confirmation of user deletion.
+        Gets the server's metrics.
         """
-        data = data.decode().split('#')
-        status = data[0]
-        name = data[1]
+        if not status:
+            return self.add_mail('[#E74856]ERROR: No access.[/#E74856]')
+
+        mail = 'SERVER METRICS:\n'
+        for name, value in metrics:
+            mail += f'\t{name}: [#B4009E]{value}[/#B4009E]\n'
+
+        self.add_mail(mail)
 
-        if status == '0':
+    @handles(Opcode.DELUSERCONF)
+    def deluserconf(self, status: int, name: str) -> None:
+        """
+        Gets confirmation of user deletion.
+        """
+        if not status:
             status = '[#E74856]FAILED[/#E74856]'
         else:
             status = '[#16C60C]SUCCESS[/#16C60C]'
@@ -283,66 +217,170 @@ class ChatClient(metaclass=ccui.utils.util.Singleton):
 
         self.add_mail(mail)
 
-    def usersconf(self, users: bytes) -> None:
+    @handles(Opcode.USERSCONF)
+    def usersconf(self, users: list[tuple[str, int]]) -> None:
         """
         Adds to mail list of online users available received by server.
         """
-        users = users.decode()
+        users = ''.join(f'{name} #{user_id}\n' for name, user_id in users)
         self.add_mail(f'[#B4009E]{users}[/#B4009E]')
 
-    def loginconf(self, status: bytes) -> None:
+    @handles(Opcode.SUBSCRIBECONF)
+    def subscribeconf(self, users: list[tuple[str, int]]) -> None:
+        """
+        Keeps the users list the server sends on subscribing.
+        """
+        self.roster = {user_id: name for name, user_id in users}
+        self.usersconf(users)
+
+    @handles(Opcode.PRESENCE)
+    def presence(self, presence: int, user_id: int, name: str) -> None:
+        """
+        Applies a change to the users list, adds it to mail.
+        """
+        if presence == Presence.JOIN:
+            self.add_mail(f'[#B4009E]{name} #{user_id} is online[/#B4009E]')
+            self.roster[user_id] = name
+        elif presence == Presence.LEAVE:
+            self.add_mail(f'[#B4009E]{name} #{user_id} is offline[/#B4009E]')
+            self.roster.pop(user_id, None)
+        elif presence == Presence.RENAME:
+            old_name = self.roster.get(user_id)
+            self.add_mail(f'[#B4009E]{old_name} #{user_id} is now {name}[/#B4009E]')
+            self.roster[user_id] = name
+
+    @handles(Opcode.JOINCONF)
+    def joinconf(self, status: int, room: str, members: int) -> None:
+        """
+        Adds to mail whether joining a room was successful or not.
+        """
+        if status:
+            self.rooms.add(room)
+            self.add_mail(f'[#16C60C]Joined {room}, {members} members.[/#16C60C]')
+        else:
+            self.add_mail(f'[#E74856]Failed to join {room}.[/#E74856]')
+
+    @handles(Opcode.LEAVECONF)
+    def leaveconf(self, status: int, room: str) -> None:
+        """
+        Adds to mail whether leaving a room was successful or not.
+        """
+        if status:
+            self.add_mail(f'[#16C60C]Left {room}.[/#16C60C]')
+        else:
+            self.add_mail(f'[#E74856]Not in {room}.[/#E74856]')
+
+    @handles(Opcode.PUBLISHCONF)
+    def publishconf(self, status: int, room: str, recipients: int) -> None:
+        """
+        Adds to mail how many members a room message was sent to.
+        """
+        if status:
+            self.add_mail(f'[#16C60C]Sent to {recipients} members of {room}.[/#16C60C]')
+        else:
+            self.add_mail(f'[#E74856]Failed to send to {room}, join it first.[/#E74856]')
+
+    @handles(Opcode.ROOMMSG)
+    def roommsg(self, room: str, sender_id: int, message: str) -> None:
+        """
+        Adds to mail a message sent to a room.
+        """
+        self.logger.debug('Received Room Message: %s #%s - %s',
+                          room, sender_id, message)
+        self.add_mail(f'[#B4009E]{room}[/#B4009E] #{sender_id}: {message}')
+
+    @handles(Opcode.ROOMSCONF)
+    def roomsconf(self, rooms: list[tuple[str, int, int, int, int]]) -> None:
+        """
+        Adds to mail the rooms with their members and message counts.
+        """
+        if not rooms:
+            return self.add_mail('No rooms.')
+
+        mail = ''
+        for name, members, published, delivered, per_second in rooms:
+            mail += (f'{name}: {members} members\n\tPUBLISHED: {published}'
+                     f' DELIVERED: {delivered} ({per_second}/s)\n')
+        self.add_mail(mail)
+
+    @handles(Opcode.LOGINCONF)
+    def loginconf(self, status: int, ticket: memoryview) -> None:
         """
         Adds to mail whether user login attempt was successful or not.
         """
-        status = status.decode()
-        if status == '1':
+        if status:
+            self.session_ticket = bytes(ticket)
+            self.ticket_server = self.server_identity
             self.add_mail('[#16C60C]Successfully logged in as user.[/#16C60C]')
         else:
             self.add_mail('[#E74856]Failed to log in as a user.[/#E74856]')
 
-    def regstrconf(self, status: bytes) -> None:
+    @handles(Opcode.REGSTRCONF)
+    def regstrconf(self, status: int) -> None:
         """
         Adds to mail whether user register attempt was successful or not.
         """
-        status = status.decode()
-        if status == '1':
+        if status:
             self.add_mail('[#16C60C]Successfully registerd a user.[/#16C60C]')
         else:
             self.add_mail('[#E74856]Failed to regsiter a user.[/#E74856]')
 
-    def getidconf(self, user_id: bytes) -> None:
+    @handles(Opcode.GETIDCONF)
+    def getidconf(self, user_id: int) -> None:
         """
         Adds to mail the ID assigned by the Server.
         """
-        user_id = user_id.decode()
         self.add_mail(f'[#16C60C]ID Assigned: {user_id}')
 
-    def sndmsgconf(self, status: bytes) -> None:
+    @handles(Opcode.SNDMSGCONF)
+    def sndmsgconf(self, status: int, target_id: int) -> None:
         """
         Adds to mail confirmation status of sending a message.
         """
-        status = status.decode()
-        target_id = status[2:]
-        if status[0] == '1':
+        if status:
             self.add_mail(f'[#16C60C]Successfully sent message to #{target_id}.[/#16C60C]')
         else:
             self.add_mail(f'[#E74856]Failed to send message to #{target_id}.[/#E74856]')
 
-    def rcvdmsg(self, content: bytes) -> None:
+    @handles(Opcode.SNDNAMECONF)
+    def sndnameconf(self, status: int, name: str) -> None:
+        """
+        Adds to mail confirmation status of sending a message by name.
+        """
+        if status:
+            self.add_mail(f'[#16C60C]Successfully sent message to {name}.[/#16C60C]')
+        else:
+            self.add_mail(f'[#E74856]Failed to send message to {name}.[/#E74856]')
+
+    @handles(Opcode.RCVDMSG)
+    def rcvdmsg(self, sender_id: int, sequence: int, message: str) -> None:
         """
         Adds to mail a message received from a user.
         """
-        self.logger.debug(f'Received Message: {content}')
-        content = content.decode()
-        sender_id = content.split('#')[0]
-        message = content[5:]
+        self.logger.debug('Received Message: #%s - %s', sender_id, message)
         self.add_mail(f'#{sender_id} sent you: {message}')
 
-        request = self.build_request('RCVDMSGCONF', f'{sender_id}#{message}')
-        self.send_request(request, False)
+        # Sent once the messages that arrived with it are handled
+        request = self.build_request(Opcode.RCVDMSGCONF, sequence)
+        self.queue_request(request)
 
-    def loggedout(self, data: bytes = None) -> None:
+    @handles(Opcode.LOGGEDOUT)
+    def loggedout(self) -> None:
         """
         Gets notified by the server of a forced logout.
         """
+        self.session_ticket = None
         self.add_mail('Forced logout. Back to GUEST')
+
+    @handles(Opcode.RESUMECONF)
+    def resumeconf(self, status: int, name: str, user_id: int,
+                   ticket: memoryview) -> None:
+        """
+        Adds to mail whether the session was resumed after reconnecting.
+        """
+        if not status:
+            self.session_ticket = None
+            return self.add_mail('[#E74856]Session expired, log in again.[/#E74856]')
+
+        self.session_ticket = bytes(ticket)
+        self.add_mail(f'[#16C60C]Resumed session as {name} #{user_id}.[/#16C60C]')
@@ -0,0 +1,338 @@
+import socket
+import threading
+import time
+
+from ccui.setup_logging import setup_logging
+from ccui.utils.compressor import (
+    Compression,
+    Compressor,
+    available
+)
+from ccui.utils.constants import (
+    Paths,
+    Pipelining,
+    Protocol
+)
+from ccui.utils.errors import (
+    FrameTooLargeError,
+    ProtocolError
+)
+from ccui.utils.framing import (
+    FrameReader,
+    encode_frame,
+    frame_buffer
+)
+from ccui.utils.protocol import (
+    Dispatcher,
+    MessageCodec,
+    Opcode,
+    handles
+)
+from ccui.utils.cryptography import (
+    KnownServers,
+    ServerIdentity
+)
+from proconq_common.session_crypto import (
+    KeyExchange,
+    SessionCipher,
+    fingerprint
+)
+
+
+class ChatConnection(Dispatcher):
+    """
+    A connection to the chat server, the protocol without the interface.
+
+    The handshake, batching and encryption of requests happen here,
+        the server's messages are dispatched to the handlers of subclasses.
+    Nothing is printed, subclasses show what they want to in notify.
+    """
+    # Shared by every connection of the process
+    known_servers = KnownServers(Paths.KNOWN_SERVERS)
+
+    def __init__(self):
+        # Logs to the file of the subclass' module
+        self.logger = setup_logging(type(self).__module__)
+        
+        self.is_connected: bool = False
+
+        self.ip: str = None
+        self.port: int = None
+        
+        self.sock: socket.socket = None
+        self.receive_thread: threading.Thread = None
+
+        # Requests waiting to be sent together, guarded by send_lock
+        self.outbox: list[bytes] = []
+        self.send_lock = threading.Lock()
+        self.last_request_id: int = 0
+        # Requests waiting for a response, with the time they were sent
+        self.pending_requests: dict[int, tuple[Opcode, float]] = {}
+
+        # Set once the server's public key arrives, the rest is encrypted
+        self.session_cipher: SessionCipher = None
+        self.server_identity: bytes = None
+        # Picked in the handshake, the server's messages are read and
+        # written with its schemas
+        self.protocol_version: int = Protocol.VERSION
+        # Compresses what's sent, once the server picks a compression
+        self.compressor = Compressor()
+
+    def notify(self, text: str) -> None:
+        """
+        Tells of the connection's state, only logged here.
+        """
+        self.logger.debug(text)
+
+    def handshake_requests(self) -> list[bytes]:
+        """
+        Returns the requests sent first, once the connection is secure.
+        """
+        return []
+
+    @handles(Opcode.PUBKEY)
+    def pubkey(self, min_version: int, max_version: int,
+               identity_key: memoryview, exchange_key: memoryview,
+               signature: memoryview) -> None:
+        """
+        Receives the server's half of the key exchange and checks its
+            signature.
+        Picks the newest protocol version both sides speak.
+        Sends the client's half, both sides then derive the session key,
+            with the compressions the client can use.
+        """
+        identity_key = bytes(identity_key)
+        exchange_key = bytes(exchange_key)
+        try:
+            ServerIdentity.verify(
+                identity_key,
+                bytes((min_version, max_version)) + exchange_key,
+                bytes(signature))
+        except ValueError as err:
+            raise ProtocolError(f'Bad server signature: {err}')
+
+        identity = fingerprint(identity_key)
+        try:
+            if self.known_servers.check(f'{self.ip}:{self.port}', identity):
+                self.notify(f"[#16C60C]Trusting the server's identity "
+                            f"{identity} from now on[/#16C60C]")
+        except ValueError as err:
+            self.notify(f"[#E74856]ERROR: The server's identity changed, "
+                        f"not connecting[/#E74856]")
+            raise ProtocolError(f'Untrusted server: {err}')
+        self.server_identity = identity_key
+        self.logger.debug('Server identity: %s', identity)
+
+        version = min(Protocol.VERSION, max_version)
+        if version < max(Protocol.MIN_VERSION, min_version):
+            raise ProtocolError(
+                f'No shared protocol version, server speaks '
+                f'{min_version}-{max_version}')
+        self.protocol_version = version
+
+        # Every connection gets new exchange keys, and a new session key
+        key_exchange = KeyExchange()
+        try:
+            session_key = key_exchange.derive(exchange_key, is_server=False)
+        except ValueError as err:
+            raise ProtocolError(f'Bad key exchange: {err}')
+        session_cipher = SessionCipher(session_key, is_server=False)
+
+        self.logger.debug('Attempting to build AESKEY request...')
+        request = self.build_request(Opcode.AESKEY, version,
+                                     key_exchange.public_key,
+                                     [(compression,)
+                                      for compression in available()])
+        # The only plain request, it can't share a frame with others
+        frame = encode_frame(request)
+        requests = self.handshake_requests()
+        # Held until the cipher is set, a flush in between would send
+        # sealed requests before the server has the key for them
+        with self.send_lock:
+            self.write_frames(frame, False)
+            self.session_cipher = session_cipher
+            # Ahead of the requests made during the handshake
+            self.outbox[:0] = requests
+        # Requests made during the handshake
+        self.flush()
+
+    @handles(Opcode.AESCONF)
+    def aesconf(self, version: int,
+                compression: int = Compression.NONE) -> None:
+        """
+        Receives the server's confirmation of the session key,
+            and the compression it picked.
+        Requests sent before it arrived weren't compressed.
+        Servers older than version 11 don't compress.
+        """
+        if compression != Compression.NONE and compression not in available():
+            raise ProtocolError(f'Server picked compression {compression}')
+        self.compressor = Compressor(Compression(compression))
+        self.logger.debug('Received key confirmation, protocol version %s, '
+                          'compression %s.', version,
+                          self.compressor.algorithm.name)
+
+    def decrypt_message(self, message: bytes) -> bytes:
+        if self.session_cipher is None:
+            self.logger.debug('Server key exchange received.')
+            return message
+        dec_message = self.session_cipher.decrypt(message)
+        self.logger.debug('Decrypted data: %s', dec_message)
+        return dec_message
+
+    def next_request_id(self) -> int:
+        with self.send_lock:
+            # IDs are 32 bit, 0 is left for messages nobody asked for
+            self.last_request_id = self.last_request_id % 0xFFFFFFFF + 1
+            return self.last_request_id
+
+    def build_request(self, opcode: Opcode, *fields) -> bytes:
+        """
+        Encodes the opcode and its fields under a new request ID
+        Remembers the request if the server is going to answer it
+        """
+        request_id = self.next_request_id()
+        if opcode in MessageCodec.responses:
+            self.pending_requests[request_id] = (opcode, time.perf_counter())
+
+        request = MessageCodec.encode(opcode, *fields, request_id=request_id,
+                                      version=self.protocol_version)
+        self.logger.debug('Built request: %s', request)
+        return request
+
+    def match_response(self, opcode: Opcode, request_id: int) -> None:
+        """
+        Pairs a response with its request, in whatever order it arrives.
+        """
+        request = self.pending_requests.pop(request_id, None)
+        if request is None:
+            return
+        request_opcode, sent_at = request
+        self.logger.debug('%s #%s answered by %s in %.1fms',
+                          request_opcode.name, request_id, opcode.name,
+                          (time.perf_counter() - sent_at) * 1000)
+
+    def send_request(self, request: bytes, verbose: bool = True) -> None:
+        """
+        Send a request to the server, with any queued before it.
+        """
+        self.queue_request(request)
+        self.flush(verbose)
+
+    def queue_request(self, request: bytes) -> None:
+        """
+        Queues a request to be sent by the next flush.
+        """
+        with self.send_lock:
+            self.outbox.append(request)
+
+    def flush(self, verbose: bool = False) -> None:
+        """
+        Sends the queued requests, batched into as few frames as possible.
+        """
+        with self.send_lock:
+            if not self.outbox:
+                return
+            if self.is_connected and self.session_cipher is None:
+                # The handshake isn't over, they're sent right after it
+                return
+            requests, self.outbox = self.outbox, []
+
+            frames = bytearray()
+            if self.is_connected:
+                self.logger.debug('Encrypting %s requests', len(requests))
+                for payload in MessageCodec.batches(requests):
+                    payload = MessageCodec.compress(payload, self.compressor)
+                    frame, frame_payload = frame_buffer(
+                        self.session_cipher.sealed_size(len(payload)))
+                    self.session_cipher.seal_into(payload, frame_payload)
+                    frames += frame
+            self.write_frames(frames, verbose)
+
+    def write_frames(self, frames: bytes, verbose: bool) -> None:
+        """
+        Writes to the server, the caller holds send_lock.
+        """
+        self.logger.debug('Sending request: %s', frames)
+        if not self.is_connected:
+            if verbose:
+                self.notify("[#E74856]ERROR: Client is not connected to any server.")
+            return
+        try:
+            self.sock.sendall(frames)
+        except (ConnectionResetError, ConnectionAbortedError):
+            if verbose:
+                self.notify("[#E74856]ERROR: Client is not connected to any server (server probably crashed).")
+            self.is_connected = False
+            return
+        if verbose:
+            self.notify("[#16C60C]Request sent.[/#16C60C]")
+
+    def receive_loop(self):
+        frame_reader = FrameReader(self.sock)
+        while self.is_connected:
+            try:
+                # Replies to a burst go out together once it's over
+                if self.outbox and not frame_reader.wait(
+                        Pipelining.FLUSH_WINDOW):
+                    self.flush()
+
+                data = frame_reader.read_frame()
+                self.logger.debug('Received data: %s', data)
+                plain = self.session_cipher is None
+                data = self.decrypt_message(data)
+                for opcode, request_id, fields in \
+                        MessageCodec.decode_batch(data,
+                                                  self.protocol_version):
+                    self.logger.debug('Opcode: %s #%s',
+                                      opcode.name, request_id)
+
+                    # The public key is the only plain message, and the first
+                    if (opcode == Opcode.PUBKEY) != plain:
+                        raise ProtocolError(
+                            f'Unexpected opcode {opcode.name}')
+                    self.match_response(opcode, request_id)
+                    self.get_handler(opcode)(self, *fields)
+            except OSError:
+                break
+            except ValueError:
+                break
+            except (FrameTooLargeError, ProtocolError) as err:
+                self.logger.error('Closing connection: %s', err)
+                break
+
+    def connect(self, ip: str, port: int) -> None:
+        if self.is_connected:
+            return self.notify(f"[#E74856]ERROR: Client is connected already, to ('{ip}', {port})'[/#E74856]")
+        
+        self.ip = ip
+        self.port = port
+        self.session_cipher = None
+        self.protocol_version = Protocol.VERSION
+        self.compressor = Compressor()
+        self.outbox = []
+        self.pending_requests = {}
+
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.connect((ip, port))
+            self.is_connected = True
+            self.notify(f"[#16C60C]Connected to ('{ip}', {port})[/#16C60C]")
+
+            self.receive_thread = threading.Thread(target=self.receive_loop,
+                                                   daemon=True)
+            self.receive_thread.start()
+        except ConnectionRefusedError:
+            self.notify(f"[#E74856]ERROR: Failed to connect to ('{ip}', {port})'[/#E74856]")
+    
+    def disconnect(self) -> None:
+        if self.is_connected:
+            self.is_connected = False
+            try:
+                # Wakes the receive thread, closing alone doesn't
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            return self.notify("[#16C60C]Disconnected.[/#16C60C]")
+        self.notify("[#E74856]ERROR: Client is not connected to any server.")
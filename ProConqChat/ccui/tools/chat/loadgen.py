@@ -0,0 +1,332 @@
+"""
+Load generator for the chat server.
+
+Opens many protocol compliant clients that handshake, log in,
+    message each other and confirm what they receive, then reports
+    the rates, delivery latencies and server memory as JSON.
+
+Usage: py -m ccui.tools.chat.loadgen [options], see --help.
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from pathlib import Path
+
+from ccui.tools.chat.connection import ChatConnection
+from ccui.utils.compressor import Compression
+from ccui.utils.protocol import (
+    Opcode,
+    handles
+)
+
+
+class LoadStats:
+    """
+    Counts of every client of a run, updated from their receive threads.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.delivered = 0
+        self.failed = 0
+        # Delivery latencies, in nanoseconds
+        self.latencies: list[int] = []
+
+    def record(self, latency: int) -> None:
+        with self.lock:
+            self.delivered += 1
+            self.latencies.append(latency)
+
+    def fail(self) -> None:
+        with self.lock:
+            self.failed += 1
+
+    def percentiles(self) -> dict[str, float]:
+        """
+        Returns the p50, p99, p999 and max latencies, in milliseconds.
+        """
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {'p50': None, 'p99': None, 'p999': None, 'max': None}
+
+        def rank(fraction: float) -> float:
+            index = max(math.ceil(fraction * len(latencies)) - 1, 0)
+            return round(latencies[index] / 1e6, 3)
+
+        return {'p50': rank(0.5), 'p99': rank(0.99), 'p999': rank(0.999),
+                'max': round(latencies[-1] / 1e6, 3)}
+
+
+class LoadClient(ChatConnection):
+    """
+    A client of the load generator, it keeps count instead of printing.
+    Messages carry the time they were sent, every client runs in this
+        process so the receiver can tell how long they took.
+    """
+    def __init__(self, stats: LoadStats):
+        super().__init__()
+        self.stats = stats
+        self.client_id: int = None
+        self.logged_in = False
+
+        # Set by the responses each phase waits for
+        self.secure = threading.Event()
+        self.registered = threading.Event()
+        self.answered = threading.Event()
+        self.identified = threading.Event()
+
+    @handles(Opcode.AESCONF)
+    def aesconf(self, version: int,
+                compression: int = Compression.NONE) -> None:
+        super().aesconf(version, compression)
+        self.secure.set()
+
+    @handles(Opcode.REGSTRCONF)
+    def regstrconf(self, status: int) -> None:
+        # Fails if the user exists from an earlier run, logging in still works
+        self.registered.set()
+
+    @handles(Opcode.LOGINCONF)
+    def loginconf(self, status: int, ticket: memoryview) -> None:
+        self.logged_in = bool(status)
+        self.answered.set()
+
+    @handles(Opcode.GETIDCONF)
+    def getidconf(self, user_id: int) -> None:
+        self.client_id = user_id
+        self.identified.set()
+
+    @handles(Opcode.SNDMSGCONF)
+    def sndmsgconf(self, status: int, target_id: int) -> None:
+        self.stats.fail()
+
+    @handles(Opcode.RCVDMSG)
+    def rcvdmsg(self, sender_id: int, sequence: int, message: str) -> None:
+        sent_at = int(message.split(' ', 1)[0])
+        self.stats.record(time.perf_counter_ns() - sent_at)
+
+        # Sent once the messages that arrived with it are handled
+        self.queue_request(self.build_request(Opcode.RCVDMSGCONF, sequence))
+
+    @handles(Opcode.LOGGEDOUT)
+    def loggedout(self) -> None:
+        self.logged_in = False
+
+
+class RSSSampler:
+    """
+    Samples the resident memory of the server's process on a thread.
+    Linux only, it's read from /proc.
+    """
+    def __init__(self, pid: int, interval: float):
+        self.path = Path(f'/proc/{pid}/status')
+        self.interval = interval
+        self.samples: list[int] = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def read(self) -> int | None:
+        try:
+            for line in self.path.read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            rss = self.read()
+            if rss is not None:
+                self.samples.append(rss)
+
+    def start(self) -> None:
+        rss = self.read()
+        if rss is not None:
+            self.samples.append(rss)
+        self.thread.start()
+
+    def stop(self) -> dict[str, int] | None:
+        self.stopped.set()
+        self.thread.join()
+        rss = self.read()
+        if rss is not None:
+            self.samples.append(rss)
+        if not self.samples:
+            return None
+        return {'start': self.samples[0], 'peak': max(self.samples),
+                'end': self.samples[-1]}
+
+
+def user_name(prefix: str, index: int) -> str:
+    """
+    Returns a name of letters only, as the server requires.
+    """
+    letters = ''
+    while True:
+        index, letter = divmod(index, 26)
+        letters = chr(ord('a') + letter) + letters
+        if not index:
+            return prefix + letters
+
+
+def wait_all(events: list[threading.Event], timeout: float) -> int:
+    """
+    Returns how many of the events were set before the timeout.
+    """
+    deadline = time.perf_counter() + timeout
+    for event in events:
+        event.wait(max(deadline - time.perf_counter(), 0))
+    return sum(event.is_set() for event in events)
+
+
+def run(args: argparse.Namespace) -> dict:
+    stats = LoadStats()
+    sampler = None
+    if args.server_pid is not None:
+        sampler = RSSSampler(args.server_pid, args.rss_interval)
+        sampler.start()
+
+    clients = [LoadClient(stats) for _ in range(args.clients)]
+    report = {'config': vars(args)}
+    try:
+        # Handshakes complete on the receive threads, all at once
+        started = time.perf_counter()
+        for client in clients:
+            client.connect(args.host, args.port)
+        secured = wait_all([client.secure for client in clients],
+                           args.timeout)
+        elapsed = time.perf_counter() - started
+        report['connected'] = secured
+        report['handshakes_per_sec'] = round(secured / elapsed, 2)
+
+        # Registered first, requests of a connection are handled at once
+        for index, client in enumerate(clients):
+            client.send_request(client.build_request(
+                Opcode.REGSTR, user_name(args.prefix, index), args.password),
+                verbose=False)
+        wait_all([client.registered for client in clients], args.timeout)
+
+        started = time.perf_counter()
+        for index, client in enumerate(clients):
+            client.queue_request(client.build_request(
+                Opcode.LOGIN, user_name(args.prefix, index), args.password))
+            client.send_request(client.build_request(Opcode.GETID),
+                                verbose=False)
+        wait_all([event for client in clients
+                  for event in (client.answered, client.identified)],
+                 args.timeout)
+        elapsed = time.perf_counter() - started
+        logged_in = [client for client in clients if client.logged_in]
+        report['logged_in'] = len(logged_in)
+        report['logins_per_sec'] = round(len(logged_in) / elapsed, 2)
+
+        report['messages'] = send_messages(args, stats, logged_in)
+        report['latency_ms'] = stats.percentiles()
+
+        # Of the clients' requests, messages of a --size over the
+        # compression threshold are compressed
+        raw_bytes = sum(client.compressor.raw_bytes for client in clients)
+        sent_bytes = sum(client.compressor.sent_bytes for client in clients)
+        report['compression_ratio'] = \
+            round(raw_bytes / sent_bytes, 2) if sent_bytes else None
+    finally:
+        for client in clients:
+            if client.is_connected:
+                client.disconnect()
+        if sampler is not None:
+            report['server_rss_bytes'] = sampler.stop()
+    return report
+
+
+def send_messages(args: argparse.Namespace, stats: LoadStats,
+                  clients: list[LoadClient]) -> dict:
+    """
+    Every client messages the next one at the configured rate,
+        paced by a single thread.
+    """
+    if len(clients) < 2:
+        return {'sent': 0, 'delivered': 0, 'failed': 0, 'lost': 0,
+                'per_sec': 0}
+
+    interval = 1 / (args.rate * len(clients))
+    padding = 'x' * args.size
+    started = time.perf_counter()
+    next_send = started
+    index = 0
+    while next_send - started < args.duration:
+        sender = clients[index % len(clients)]
+        target = clients[(index + 1) % len(clients)]
+        message = f'{time.perf_counter_ns()} {padding}'
+        sender.send_request(sender.build_request(
+            Opcode.SNDMSG, target.client_id, message), verbose=False)
+        stats.sent += 1
+        index += 1
+
+        next_send += interval
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    # Messages still on their way
+    deadline = time.perf_counter() + args.timeout
+    while (stats.delivered + stats.failed < stats.sent
+           and time.perf_counter() < deadline):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    return {'sent': stats.sent, 'delivered': stats.delivered,
+            'failed': stats.failed,
+            'lost': stats.sent - stats.delivered - stats.failed,
+            'per_sec': round(stats.delivered / elapsed, 2)}
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='py -m ccui.tools.chat.loadgen',
+        description='Load generator and latency benchmark for the chat '
+                    'server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=50000)
+    parser.add_argument('--clients', type=int, default=50,
+                        help='concurrent clients')
+    parser.add_argument('--rate', type=float, default=10,
+                        help='messages per second sent by each client')
+    parser.add_argument('--size', type=int, default=64,
+                        help='characters of padding in each message')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds of messaging')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='seconds each phase may take')
+    parser.add_argument('--prefix', default='load',
+                        help='prefix of the users names, letters only')
+    parser.add_argument('--password', default='load')
+    parser.add_argument('--server-pid', type=int,
+                        help='pid of the server, to sample its memory')
+    parser.add_argument('--rss-interval', type=float, default=0.5)
+    parser.add_argument('--output', help='JSON report file, '
+                                         'printed if not given')
+    args = parser.parse_args(argv)
+    if not args.prefix.isalpha():
+        parser.error('--prefix must be letters only')
+    if args.clients < 1 or args.rate <= 0:
+        parser.error('--clients and --rate must be positive')
+    return args
+
+
+def main(argv: list[str] = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    report = json.dumps(run(args), indent=4)
+    if args.output is None:
+        print(report)
+    else:
+        Path(args.output).write_text(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
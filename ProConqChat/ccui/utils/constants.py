@@ -2,6 +2,7 @@
 CCUI's Constants
 """
 
+import os
 from sys import platform
 from pathlib import Path
 
@@ -15,14 +16,79 @@ class OS:
     WINDOWS: bool = platform.startswith('win32')
 
 
+# Framing
+class Framing:
+    # Frames larger than this are rejected by the receiver
+    MAX_FRAME_SIZE: int = 1024 * 1024
+    # How much to read from the socket at once
+    READ_CHUNK_SIZE: int = 64 * 1024
+
+
+# Protocol
+class Protocol:
+    # The versions this client speaks, the newest shared one is used.
+    # Version 2 added request IDs to the message header,
+    # version 3 replaced AES-CBC with the session cipher,
+    # version 4 replaced the RSA handshake with X25519,
+    # version 5 added session tickets,
+    # version 6 confirms received messages by sequence number,
+    # version 7 added presence subscriptions,
+    # version 8 added messages addressed by username,
+    # version 9 added rooms,
+    # version 10 added server metrics,
+    # version 11 added payload compression.
+    VERSION: int = 11
+    # MessageCodec keeps the schemas of every version from this one on
+    MIN_VERSION: int = 10
+
+
+# Client IDs, 32 bit on the wire
+class ClientIDs:
+    MIN_ID: int = 1
+    MAX_ID: int = 0xFFFFFFFF
+
+
+# Pipelining
+class Pipelining:
+    # Seconds to wait for more messages before replying to a burst
+    FLUSH_WINDOW: float = 0.001
+    # Limits of the messages packed into a single frame
+    MAX_BATCH_MESSAGES: int = 64
+    MAX_BATCH_BYTES: int = 64 * 1024
+
+
+# Compression
+class Compressing:
+    # Payloads smaller than this are sent uncompressed
+    MIN_SIZE: int = 1024
+    # Levels trading speed for size, the libraries' defaults
+    ZLIB_LEVEL: int = 6
+    ZSTD_LEVEL: int = 3
+
+
 # Paths
 class Paths:
     PROJECT_DIR = Path(__file__).resolve().parent.parent
     LOGGING: Path = PROJECT_DIR / 'logs'
+    # Identities of the chat servers connected to, see KnownServers
+    KNOWN_SERVERS: Path = PROJECT_DIR / 'known_servers'
 
     HELP: str = 'utils/text/ccui_prompt_help.txt'
     THELP: str = 'utils/text/ccui_prompt_thelp.txt'
     CHELP: str = 'utils/text/ccui_prompt_chelp.txt'
     LOGO: str = 'utils/text/ccui_logo.txt'
     TOOLS: str = 'utils/text/ccui_tools.txt'
-    
\ No newline at end of file
+
+
+# Logging
+class Logging:
+    LEVEL: str = os.environ.get('CCUI_LOG_LEVEL', 'INFO').upper()
+    FORMAT: str = \
+        '%(levelname)s %(asctime)s %(name)s %(funcName)s # %(message)s'
+
+    # Files are rotated when reaching either limit, then compressed
+    MAX_FILE_BYTES: int = 10 * 1024 * 1024
+    MAX_FILE_AGE: int = 24 * 60 * 60
+    # The oldest logs are deleted once the directory exceeds this
+    QUOTA_BYTES: int = 64 * 1024 * 1024
+    MAX_OPEN_FILES: int = 64
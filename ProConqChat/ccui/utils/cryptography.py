@@ -1,67 +1,69 @@
-from Crypto.Cipher import AES, PKCS1_OAEP
-from Crypto.PublicKey import RSA
-from Crypto.Util.Padding import pad, unpad
-from Crypto.Random import get_random_bytes
+import threading
+from pathlib import Path
 
+from Crypto.Signature import eddsa
 
-class AESCipher:
-    def __init__(self):
-        # Generate a random 32-byte key
-        self.key = get_random_bytes(32)
-        # Generate a random 16-byte IV
-        self.iv = get_random_bytes(16)
-        # Create a cipher object with the key and IV
-        self.cipher = AES.new(key=self.key, mode=AES.MODE_CBC, iv=self.iv)
 
-    def set_key(self, aes_key, aes_iv):
-        # Set the new AES key
-        self.key = aes_key
-        # Set the new IV
-        self.iv = aes_iv
-        # Create a new cipher object with the updated key and IV
-        self.cipher = AES.new(key=self.key, mode=AES.MODE_CBC, iv=self.iv)
+class ServerIdentity:
+    """
+    Checks the signatures made with a server's long-lived Ed25519 key.
+    """
+    @staticmethod
+    def verify(public_key: bytes, data: bytes, signature: bytes) -> None:
+        """
+        Raises ValueError if the signature doesn't match.
+        """
+        verifier = eddsa.new(eddsa.import_public_key(public_key), 'rfc8032')
+        verifier.verify(data, signature)
 
-    def encrypt(self, data: bytes) -> bytes:
-        # Set the key and IV to ensure consistency
-        self.set_key(self.key, self.iv)
-        # Pad the data to be a multiple of the block size
-        data = pad(data, AES.block_size)
-        # Encrypt the padded data using the AES cipher
-        encrypted_data = self.cipher.encrypt(data)
-        return encrypted_data
 
-    def decrypt(self, data: bytes) -> bytes:
-        # Set the key and IV to ensure consistency
-        self.set_key(self.key, self.iv)
-        # Decrypt the data using the AES cipher
-        decrypted_data = self.cipher.decrypt(data)
-        # Remove padding from the decrypted data
-        unpadded_data = unpad(decrypted_data, AES.block_size)
-        return unpadded_data
+class KnownServers:
+    """
+    The identity fingerprints of the servers the client connected to,
+        trusted the first time each server is seen.
+    A server presenting another identity later is rejected, it may be
+        someone else answering on its address.
 
+    The file has a line per server, "<host>:<port> <fingerprint>".
+    A line added before the first connection pins the fingerprint
+        the server's operator published instead.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        # Read on the first check
+        self.fingerprints: dict[str, str] = None
 
-class RSACipher:
-    def __init__(self):
-        # Generate a new RSA key pair with a key size of 2048 bits
-        self.key = RSA.generate(2048)
-        # Get the public key from the RSA key pair
-        self.public_key = self.key.public_key().export_key()
+    def load(self) -> dict[str, str]:
+        fingerprints = {}
+        try:
+            lines = self.path.read_text().splitlines()
+        except FileNotFoundError:
+            return fingerprints
+        for line in lines:
+            fields = line.split()
+            if len(fields) == 2:
+                fingerprints[fields[0]] = fields[1].lower()
+        return fingerprints
 
-    def set_public_key(self, extern_key: bytes):
-        self.key = RSA.import_key(extern_key)
-        self.public_key = self.key.public_key().export_key()
+    def check(self, server: str, fingerprint: str) -> bool:
+        """
+        Returns True if the server wasn't known, its fingerprint is
+            pinned from now on.
+        Raises ValueError if the fingerprint isn't the pinned one.
+        """
+        with self.lock:
+            if self.fingerprints is None:
+                self.fingerprints = self.load()
+            pinned = self.fingerprints.get(server)
+            if pinned is None:
+                self.fingerprints[server] = fingerprint
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, 'a') as known_servers:
+                    known_servers.write(f'{server} {fingerprint}\n')
+                return True
 
-    def encrypt(self, data: bytes) -> bytes:
-        # Import the public key and create a cipher object
-        cipher_rsa = PKCS1_OAEP.new(RSA.import_key(self.public_key))
-        # Encrypt the data using the RSA public key
-        encrypted_data = cipher_rsa.encrypt(data)
-        return encrypted_data
-
-    def decrypt(self, data: bytes) -> bytes:
-        # Create a cipher object with the RSA private key
-        cipher_rsa = PKCS1_OAEP.new(self.key)
-        # Decrypt the data using the RSA private key
-        decrypted_data = cipher_rsa.decrypt(data)
-        return decrypted_data
-    
\ No newline at end of file
+        if pinned != fingerprint:
+            raise ValueError(f'{server} identity changed from {pinned} '
+                             f'to {fingerprint}')
+        return False
@@ -38,4 +38,14 @@ class BreakTry(Exception):
 # Responsible for informing of an illegal username
 class InvalidUsername(Exception):
     pass
+
+
+# Responsible for rejecting frames above the maximum size
+class FrameTooLargeError(Exception):
+    pass
+
+
+# Responsible for rejecting malformed or unexpected messages
+class ProtocolError(Exception):
+    pass
 # ----
\ No newline at end of file
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# proconq_common is shared by the packages of the repository, next to them
+COMMON_DIR = str(Path(__file__).resolve().parents[2] / 'ProConqCommon')
+if COMMON_DIR not in sys.path:
+    sys.path.append(COMMON_DIR)
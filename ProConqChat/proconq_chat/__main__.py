@@ -1,7 +1,13 @@
 import sys
 
-from proconq_chat.setup_logging import setup_logging
-from proconq_chat.src.server import launch_server
+from proconq_chat.setup_logging import (
+    handle_debug_signal,
+    setup_logging
+)
+from proconq_chat.src.server import (
+    launch_server,
+    launch_workers
+)
 from proconq_chat.utils.constants import ServerConstants
 
 
@@ -9,19 +15,29 @@ def main():
     logger = setup_logging(__name__)
 
     port = ServerConstants.PORT
+    workers = 1
 
     try:
-        if len(sys.argv) == 2:
+        if len(sys.argv) >= 2:
             port = int(sys.argv[1])
-        elif len(sys.argv) > 2:
+        if len(sys.argv) == 3:
+            workers = int(sys.argv[2])
+        if len(sys.argv) > 3 or workers < 1:
             raise ValueError
     except ValueError:
-        logger.critical('Invalid Input. Usage: py -m proconq_chat [port]')
+        logger.critical(
+            'Invalid Input. Usage: py -m proconq_chat [port] [workers]')
         return
 
+    handle_debug_signal()
+
     logger.debug('Logging Setup successfully started.')
-    logger.debug(f'Initializing Server on port {port}.')
-    launch_server(port)
+    logger.debug('Initializing Server on port %s.', port)
+    if workers > 1:
+        # Linux only, other systems can't share a port between processes
+        launch_workers(port, workers)
+    else:
+        launch_server(port)
     
 
 if __name__ == '__main__':
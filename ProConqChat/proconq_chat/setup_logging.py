@@ -1,31 +1,53 @@
 import logging
-
-from proconq_chat.utils.constants import Paths
-
-
-def setup_logging(logger_name: str) -> logging.Logger:
-    # Create logger
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
-
-    # Create file handler
-    file_path = Paths.LOGGING / f'{logger_name}.log'
-    file_handler = logging.FileHandler(file_path)
-    file_handler.setLevel(logging.DEBUG)
-
-    # Create stream handler
-    stream_handler = logging.StreamHandler()
-    stream_handler.setLevel(logging.DEBUG)
-
-    # Create formatter and apply to handlers
-    logging_format = \
-        '%(levelname)s %(asctime)s %(name)s %(funcName)s # %(message)s'
-    formatter = logging.Formatter(logging_format)
-    file_handler.setFormatter(formatter)
-    stream_handler.setFormatter(formatter)
-
-    # Apply handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(stream_handler)
-
-    return logger
+import signal
+
+from proconq_chat.utils.constants import (
+    Paths,
+    Logging
+)
+from proconq_common.logging_pipeline import (
+    LoggingPipeline,
+    session_logger
+)
+
+
+# The handlers shared by all the loggers of the package
+pipeline = LoggingPipeline(Paths, Logging, console=True)
+
+
+def setup_logging(logger_name: str,
+                  session: str = None) -> logging.Logger:
+    """
+    Returns a logger that logs through the package's pipeline.
+    Calling it again for the same name returns the same logger,
+        without adding handlers.
+
+    If a session is given, the records are written to a separate file,
+        logs/<logger_name>.<session>.log
+    """
+    return pipeline.setup_logging(logger_name, session)
+
+
+def set_level(level: int | str) -> None:
+    """
+    Changes the level of every logger of the package at runtime.
+    """
+    pipeline.set_level(level)
+
+
+def toggle_debug() -> None:
+    """
+    Switches between DEBUG and the configured level.
+    """
+    pipeline.toggle_debug()
+
+
+def handle_debug_signal() -> None:
+    """
+    Makes kill -USR1 <pid> toggle debug logging of the running process.
+    Every process of the server installs it, the signal's default
+        action is to terminate.
+    """
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1,
+                      lambda signum, frame: toggle_debug())
@@ -0,0 +1,180 @@
+import asyncio
+import atexit
+import queue
+import sqlite3
+import threading
+from typing import Any
+
+from proconq_chat.setup_logging import setup_logging
+
+
+class Mailbox:
+    """
+    Messages for registered users that couldn't be delivered to them,
+        kept until they log in again.
+
+    The database is only used by a writer thread of its own.
+    Everything queued while it commits is committed together,
+        so a burst of messages costs a single commit.
+    Reads are queued the same way, and see every write queued before them.
+    """
+    def __init__(self, db_name: str, max_batch: int):
+        self.logger = setup_logging(__name__)
+        self.db_name = db_name
+        self.max_batch = max_batch
+        self.operations: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        # Queued messages are committed before the server exits
+        atexit.register(self.stop)
+
+    def put(self, recipient: str, sender_id: int, message: str) -> None:
+        """
+        Queues a message for a user, never blocks.
+        """
+        self.operations.put((self.insert, (recipient, sender_id, message),
+                             None))
+
+    async def fetch(self, recipient: str,
+                    limit: int) -> list[tuple[int, int, str]]:
+        """
+        Returns the (mail id, sender id, message) of the user's oldest
+            messages, up to limit of them.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self.operations.put((self.select, (recipient, limit),
+                             (loop, waiter)))
+        return await waiter
+
+    def remove(self, mail_id: int) -> None:
+        """
+        Queues the removal of a message, once its recipient confirmed it.
+        Until then it stays, a server that stops loses no delivered mail.
+        """
+        self.operations.put((self.delete, (mail_id,), None))
+
+    def clear(self, recipient: str) -> None:
+        self.operations.put((self.delete_all, (recipient,), None))
+
+    def stop(self) -> None:
+        if self.thread.is_alive():
+            self.operations.put(None)
+            self.thread.join()
+
+    def run(self) -> None:
+        conn = sqlite3.connect(self.db_name)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL keeps the database consistent, a crash loses at most
+        # the last commits
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self.create_table(conn)
+
+        closing = False
+        while not closing:
+            batch = [self.operations.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.operations.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                closing = True
+                batch.remove(None)
+            self.commit(conn, batch)
+        conn.close()
+
+    def commit(self, conn: sqlite3.Connection, batch: list) -> None:
+        """
+        Runs a batch of operations in one transaction,
+            then hands the reads their results.
+        """
+        results = []
+        try:
+            with conn:
+                for operation, args, waiter in batch:
+                    result = operation(conn, *args)
+                    if waiter is not None:
+                        results.append((waiter, result))
+        except sqlite3.Error as err:
+            self.logger.error('Mailbox commit of %s operations failed: %s',
+                              len(batch), err)
+            for operation, args, waiter in batch:
+                if waiter is not None:
+                    self.resolve(waiter, None, err)
+            return
+
+        for waiter, result in results:
+            self.resolve(waiter, result)
+
+    @staticmethod
+    def resolve(waiter: tuple[asyncio.AbstractEventLoop, asyncio.Future],
+                result: Any, error: Exception = None) -> None:
+        """
+        Completes a read's future on the event loop that awaits it.
+        """
+        loop, future = waiter
+
+        def set_result() -> None:
+            if future.done():
+                return
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        try:
+            loop.call_soon_threadsafe(set_result)
+        except RuntimeError:
+            # The loop closed while the read was queued
+            pass
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection) -> None:
+        create_table_query = '''
+        CREATE TABLE IF NOT EXISTS mailbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            sender INTEGER NOT NULL,
+            message TEXT NOT NULL
+        )
+        '''
+        create_index_query = '''
+        CREATE INDEX IF NOT EXISTS mailbox_recipient
+        ON mailbox (recipient, id)
+        '''
+        with conn:
+            conn.execute(create_table_query)
+            conn.execute(create_index_query)
+
+    @staticmethod
+    def insert(conn: sqlite3.Connection, recipient: str, sender_id: int,
+               message: str) -> None:
+        insert_query = '''
+        INSERT INTO mailbox (recipient, sender, message)
+        VALUES (?, ?, ?)
+        '''
+        conn.execute(insert_query, (recipient, sender_id, message))
+
+    @staticmethod
+    def select(conn: sqlite3.Connection, recipient: str,
+               limit: int) -> list[tuple[int, int, str]]:
+        select_query = '''
+        SELECT id, sender, message FROM mailbox
+        WHERE recipient = ? ORDER BY id LIMIT ?
+        '''
+        return conn.execute(select_query, (recipient, limit)).fetchall()
+
+    @staticmethod
+    def delete(conn: sqlite3.Connection, mail_id: int) -> None:
+        delete_query = '''
+        DELETE FROM mailbox WHERE id = ?
+        '''
+        conn.execute(delete_query, (mail_id,))
+
+    @staticmethod
+    def delete_all(conn: sqlite3.Connection, recipient: str) -> None:
+        delete_query = '''
+        DELETE FROM mailbox WHERE recipient = ?
+        '''
+        conn.execute(delete_query, (recipient,))
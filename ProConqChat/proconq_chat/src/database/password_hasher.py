@@ -0,0 +1,56 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import bcrypt
+
+from proconq_chat.src.metrics import ServerMetrics
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords with bcrypt on a pool of worker threads.
+
+    bcrypt releases the GIL, so the workers hash in parallel
+        while the event loop keeps serving the other clients.
+    At most workers + max_pending passwords are queued,
+        callers beyond that wait for a place in the queue.
+    """
+    def __init__(self, workers: int, max_pending: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='bcrypt')
+        self.slots = asyncio.Semaphore(workers + max_pending)
+
+    async def run(self, function: Callable, *args: Any) -> Any:
+        queued_at = time.perf_counter()
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.timed,
+                                              queued_at, function, *args)
+
+    @staticmethod
+    def timed(queued_at: float, function: Callable, *args: Any) -> Any:
+        """
+        Runs on a worker, times the wait for it and the hashing.
+        """
+        started = time.perf_counter()
+        ServerMetrics.password_queue_seconds.observe(started - queued_at)
+        try:
+            return function(*args)
+        finally:
+            ServerMetrics.password_seconds.observe(
+                time.perf_counter() - started)
+
+    async def hash(self, password: str) -> tuple[str, str]:
+        """
+        Returns a new salt and the password hashed with it.
+        """
+        salt = bcrypt.gensalt()
+        hashed_password = await self.run(bcrypt.hashpw,
+                                         password.encode('utf-8'), salt)
+        return salt.decode('utf-8'), hashed_password.decode('utf-8')
+
+    async def check(self, password: str, hashed_password: str) -> bool:
+        return await self.run(bcrypt.checkpw, password.encode('utf-8'),
+                              hashed_password.encode('utf-8'))
@@ -1,16 +1,45 @@
+import asyncio
 import sqlite3
-import bcrypt
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from proconq_chat.setup_logging import setup_logging
+from proconq_chat.src.metrics import ServerMetrics
 
 
 class UserDatabase:
-    def __init__(self, db_name: str):
+    """
+    Every thread gets a connection of its own, so threads don't wait
+        on each other, SQLite in WAL mode lets readers and a writer
+        work side by side.
+    Each connection caches its compiled statements.
+    """
+    def __init__(self, db_name: str, cached_statements: int = 32):
         self.logger = setup_logging(__name__)
         self.db_name = db_name
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self.cached_statements = cached_statements
+        self.local = threading.local()
+
+        conn = self.connection()
+        # Stays on for the database file, not just this connection
+        conn.execute('PRAGMA journal_mode=WAL')
         self.create_table()
 
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection, opens it on first use.
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name,
+                                   cached_statements=self.cached_statements)
+            # With WAL, a crash can lose the last commits but never
+            # corrupts the database
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
     def create_table(self) -> None:
         create_table_query = '''
         CREATE TABLE IF NOT EXISTS users (
@@ -19,63 +48,55 @@ class UserDatabase:
             password TEXT
         )
         '''
-        self.conn.execute(create_table_query)
-        self.conn.commit()
+        with self.connection() as conn:
+            conn.execute(create_table_query)
 
-    def register_user(self, name: str, password: str) -> bool:
+    def add_user(self, name: str, salt: str, hashed_password: str) -> bool:
+        """
+        Inserts a user whose password was already hashed.
+        Returns False if the name was taken meanwhile.
+        """
         if name == 'GUEST':
             return False
 
-        # Check if the user already exists
-        if self.user_exists(name):
-            return False
-
-        # Generate salt and hash the password
-        salt = bcrypt.gensalt().decode('utf-8')
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt.encode('utf-8')).decode('utf-8')
-
-        # Insert the user into the database
         insert_query = '''
         INSERT INTO users (name, salt, password)
         VALUES (?, ?, ?)
         '''
-        self.conn.execute(insert_query, (name, salt, hashed_password))
-        self.conn.commit()
-        self.logger.info(f"Registered user: {name}")
+        try:
+            with self.connection() as conn:
+                conn.execute(insert_query, (name, salt, hashed_password))
+        except sqlite3.IntegrityError:
+            return False
+        self.logger.info('Registered user: %s', name)
         return True
 
     def user_exists(self, name: str) -> bool:
         select_query = '''
         SELECT name FROM users WHERE name = ?
         '''
-        result = self.conn.execute(select_query, (name,))
+        result = self.connection().execute(select_query, (name,))
         return result.fetchone() is not None
 
-    def verify_login(self, name: str, password: str) -> bool:
+    def get_password(self, name: str) -> str | None:
+        """
+        Returns the user's hashed password, None if there's no such user.
+        """
         if name == 'GUEST':
-            return False
+            return None
 
         select_query = '''
-        SELECT salt, password FROM users WHERE name = ?
+        SELECT password FROM users WHERE name = ?
         '''
-        result = self.conn.execute(select_query, (name,))
+        result = self.connection().execute(select_query, (name,))
         row = result.fetchone()
-        if row:
-            salt: str = row[0]
-            hashed_password: str = row[1]
-            encoded_password = password.encode('utf-8')
-            encoded_salt = salt.encode('utf-8')
-            if bcrypt.checkpw(encoded_password, hashed_password.encode('utf-8')):
-                self.logger.info(f"Login successful: {name}")
-                return True
-        self.logger.warning(f"Login failed: {name}")
-        return False
+        return row[0] if row else None
 
     def get_all_user_credentials(self) -> dict[str, str]:
         select_query = '''
         SELECT name, password FROM users
         '''
-        result = self.conn.execute(select_query)
+        result = self.connection().execute(select_query)
         credentials = {name: password for name, password in result}
         return credentials
 
@@ -83,8 +104,43 @@ class UserDatabase:
         delete_query = '''
         DELETE FROM users WHERE name = ?
         '''
-        self.conn.execute(delete_query, (name,))
-        self.conn.commit()
-        rows_deleted = self.conn.total_changes
-        return rows_deleted > 0
-    
\ No newline at end of file
+        with self.connection() as conn:
+            result = conn.execute(delete_query, (name,))
+        # Rows deleted by this statement, not since the connection opened
+        return result.rowcount > 0
+
+
+class AsyncUserDatabase:
+    """
+    Runs the database's queries on a pool of worker threads,
+        each with its own connection, for the server's event loop.
+    """
+    def __init__(self, db_name: str, workers: int):
+        self.db = UserDatabase(db_name)
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='database')
+
+    async def run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, function, *args)
+        finally:
+            ServerMetrics.database_seconds.observe(
+                time.perf_counter() - started)
+
+    async def add_user(self, name: str, salt: str,
+                       hashed_password: str) -> bool:
+        return await self.run(self.db.add_user, name, salt, hashed_password)
+
+    async def user_exists(self, name: str) -> bool:
+        return await self.run(self.db.user_exists, name)
+
+    async def get_password(self, name: str) -> str | None:
+        return await self.run(self.db.get_password, name)
+
+    async def get_all_user_credentials(self) -> dict[str, str]:
+        return await self.run(self.db.get_all_user_credentials)
+
+    async def delete_user(self, name: str) -> bool:
+        return await self.run(self.db.delete_user, name)
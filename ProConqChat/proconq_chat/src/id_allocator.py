@@ -0,0 +1,47 @@
+import time
+from collections import deque
+
+from Crypto.Random import random
+
+from proconq_chat.utils.exceptions import NoAvailableIDError
+
+
+class IDAllocator:
+    """
+    Hands out client IDs at random, so a client's ID doesn't tell
+        the IDs of the clients that connected before or after it.
+
+    IDs are drawn from the whole range until a free one comes up.
+        The range is far larger than the clients connected at once,
+        so that's a draw or two, however many are connected.
+    A released ID isn't reused for reuse_delay seconds, so a message
+        meant for the client that had it isn't delivered to a new one.
+    """
+    def __init__(self, min_id: int, max_id: int, reuse_delay: float):
+        self.min_id = min_id
+        self.max_id = max_id
+        self.reuse_delay = reuse_delay
+        # IDs in use, or released and not reusable yet
+        self.taken: set[int] = set()
+        # (release time, id) in the order they were released
+        self.released: deque[tuple[float, int]] = deque()
+
+    def allocate(self) -> int:
+        """
+        Raises NoAvailableIDError if every ID is in use or not reusable yet.
+        """
+        now = time.monotonic()
+        while (self.released
+               and self.released[0][0] + self.reuse_delay <= now):
+            self.taken.discard(self.released.popleft()[1])
+        if len(self.taken) > self.max_id - self.min_id:
+            raise NoAvailableIDError('No available IDs.')
+
+        while True:
+            new_id = random.randint(self.min_id, self.max_id)
+            if new_id not in self.taken:
+                self.taken.add(new_id)
+                return new_id
+
+    def release(self, client_id: int) -> None:
+        self.released.append((time.monotonic(), client_id))
@@ -0,0 +1,113 @@
+import asyncio
+import os
+from pathlib import Path
+
+from proconq_chat.utils.constants import Metrics
+from proconq_chat.utils.metrics import MetricsRegistry
+
+
+class ServerMetrics:
+    """
+    The metrics of the server, updated by its components as they work.
+    Exported to admins by STATS, and on a Unix socket in the
+        Prometheus text format.
+
+    Gauges read the server's state, the server registers them itself.
+    """
+    registry = MetricsRegistry()
+
+    connections = registry.counter(
+        'proconq_chat_connections_total', 'Connections accepted.')
+    handshakes = registry.counter(
+        'proconq_chat_handshakes_total', 'Handshakes completed.')
+    handshake_seconds = registry.histogram(
+        'proconq_chat_handshake_seconds',
+        'Time from connecting to completing the handshake.',
+        Metrics.LATENCY_BUCKETS)
+
+    frames_in = registry.counter(
+        'proconq_chat_frames_received_total', 'Frames received.')
+    frames_out = registry.counter(
+        'proconq_chat_frames_sent_total', 'Frames sent.')
+    bytes_in = registry.counter(
+        'proconq_chat_bytes_received_total', 'Frame payload bytes received.')
+    bytes_out = registry.counter(
+        'proconq_chat_bytes_sent_total', 'Frame bytes sent.')
+    open_seconds = registry.histogram(
+        'proconq_chat_decrypt_seconds', 'Time decrypting a received frame.',
+        Metrics.LATENCY_BUCKETS)
+    seal_seconds = registry.histogram(
+        'proconq_chat_encrypt_seconds',
+        'Time encrypting the frames of a write.', Metrics.LATENCY_BUCKETS)
+
+    compress_seconds = registry.histogram(
+        'proconq_chat_compress_seconds',
+        'Time compressing the payloads of a write.', Metrics.LATENCY_BUCKETS)
+    compression_raw_bytes = registry.counter(
+        'proconq_chat_compression_raw_bytes_total',
+        'Bytes of the payloads written to compressing connections.')
+    compression_sent_bytes = registry.counter(
+        'proconq_chat_compression_sent_bytes_total',
+        'Bytes sent for those payloads, compressed or not.')
+    compression_ratio = registry.histogram(
+        'proconq_chat_compression_ratio',
+        'Compression ratio of each closed connection that compressed.',
+        Metrics.RATIO_BUCKETS)
+
+    password_queue_seconds = registry.histogram(
+        'proconq_chat_password_queue_seconds',
+        'Time passwords waited for a bcrypt worker.',
+        Metrics.LATENCY_BUCKETS)
+    password_seconds = registry.histogram(
+        'proconq_chat_password_seconds', 'Time hashing a password.',
+        Metrics.LATENCY_BUCKETS)
+    database_seconds = registry.histogram(
+        'proconq_chat_database_seconds',
+        'Time user database queries took, waiting for a worker included.',
+        Metrics.LATENCY_BUCKETS)
+
+    outbound_depth = registry.histogram(
+        'proconq_chat_outbound_depth',
+        'Requests a connection\'s writer found queued at once.',
+        Metrics.DEPTH_BUCKETS)
+    outbound_dropped = registry.counter(
+        'proconq_chat_outbound_dropped_total',
+        'Requests dropped for slow clients.')
+    outbound_spilled = registry.counter(
+        'proconq_chat_outbound_spilled_total',
+        'Messages of slow clients spilled to their mailbox.')
+
+    @classmethod
+    async def serve(cls, path: Path) -> asyncio.AbstractServer:
+        """
+        Serves the metrics on a Unix socket only the server's user can use,
+            e.g. curl --unix-socket <path> http://localhost/metrics
+        """
+        # Created without access for others, a chmod after bind would
+        # leave it open to them in between
+        umask = os.umask(0o177)
+        try:
+            return await asyncio.start_unix_server(cls.scrape, path)
+        finally:
+            os.umask(umask)
+
+    @classmethod
+    async def scrape(cls, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        try:
+            # Any request gets the metrics, it's only read to be answered
+            await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'),
+                                   Metrics.SCRAPE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError):
+            pass
+
+        body = cls.registry.prometheus().encode()
+        writer.write(b'HTTP/1.0 200 OK\r\n'
+                     b'Content-Type: text/plain; version=0.0.4\r\n'
+                     b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
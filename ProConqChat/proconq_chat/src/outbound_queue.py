@@ -0,0 +1,96 @@
+import asyncio
+from collections import deque
+from enum import Enum
+
+
+class SlowConsumer(Enum):
+    """
+    What happens to requests for a client whose outbound queue is full.
+    """
+    # The requests are dropped, unconfirmed messages stay pending
+    DROP = 'drop'
+    # The connection is closed, a logged in client can resume
+    DISCONNECT = 'disconnect'
+    # Messages go to the user's mailbox, other requests are dropped
+    SPILL = 'spill'
+
+
+class OutboundQueue:
+    """
+    Requests waiting to be written to a client, drained by its writer alone.
+
+    Bounded by count and by size, a client that stops reading fills it
+        instead of the server's memory.
+    Requests are taken all at once, so the writer can batch them.
+    Keeps the counts of what happened to the requests meant for it.
+    """
+    def __init__(self, max_messages: int, max_size: int):
+        self.max_messages = max_messages
+        self.max_size = max_size
+
+        self.messages: deque[bytes] = deque()
+        # Size of the queued messages, in bytes
+        self.size = 0
+        self.closed = False
+        self.ready = asyncio.Event()
+
+        # Most messages queued at once
+        self.peak = 0
+        # Messages that didn't fit
+        self.dropped = 0
+        self.spilled = 0
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def full(self, size: int = 0) -> bool:
+        """
+        Returns whether a message of the given size wouldn't fit.
+        """
+        return (len(self.messages) >= self.max_messages
+                or self.size + size > self.max_size)
+
+    def room(self) -> int:
+        """
+        Returns how many more messages fit, by count.
+        """
+        return self.max_messages - len(self.messages)
+
+    def put(self, message: bytes) -> bool:
+        """
+        Queues a message, never blocks.
+        Returns False if it doesn't fit or the queue is closed.
+        """
+        if self.closed or self.full(len(message)):
+            return False
+        self.messages.append(message)
+        self.size += len(message)
+        self.peak = max(self.peak, len(self.messages))
+        self.ready.set()
+        return True
+
+    def close(self) -> None:
+        """
+        Stops accepting messages, the queued ones can still be taken.
+        """
+        self.closed = True
+        self.ready.set()
+
+    async def wait(self) -> bool:
+        """
+        Waits for messages.
+        Returns False once the queue is closed and empty.
+        """
+        await self.ready.wait()
+        return bool(self.messages)
+
+    def take(self) -> list[bytes]:
+        """
+        Removes and returns every queued message.
+        """
+        messages = list(self.messages)
+        self.messages.clear()
+        self.size = 0
+        if not self.closed:
+            self.ready.clear()
+        return messages
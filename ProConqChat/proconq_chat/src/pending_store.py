@@ -0,0 +1,144 @@
+import time
+from collections import OrderedDict
+from typing import Iterator
+
+
+class PendingStore:
+    """
+    Messages delivered to a client that it hasn't confirmed yet,
+        by the sequence number they were delivered with.
+
+    Sequence numbers only go up, so the oldest message is always first
+        and confirming one is a single lookup.
+    An OrderedDict rather than a dict, removing from the front of a dict
+        leaves holes that later scans have to skip.
+    The store is capped by count and by size, the oldest messages are
+        evicted to make room. Messages older than lifetime seconds expire.
+    A message delivered from the mailbox keeps its mail ID, its row is
+        only removed once the message is confirmed. Others have mail ID 0.
+    The stores of every client share an index of what each sender has
+        pending, by the (target id, sequence) of the message. It's kept up
+        to date by every change, so a sender's messages are found without
+        searching every store.
+    """
+    def __init__(self, max_messages: int, max_size: int, lifetime: float,
+                 target_id: int, index: dict[int, set[tuple[int, int]]]):
+        self.max_messages = max_messages
+        self.max_size = max_size
+        self.lifetime = lifetime
+        self.target_id = target_id
+        # sender id -> (target id, sequence) of its pending messages
+        self.index = index
+
+        # sequence -> (sender id, message, mail id, expiry time),
+        # oldest first
+        self.messages: OrderedDict[int, tuple[int, str, int, float]] = \
+            OrderedDict()
+        self.last_sequence = 0
+        # Size of the stored messages, in characters
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[tuple[int, int, str]]:
+        """
+        Yields the (sequence, sender id, message) of every stored message.
+        """
+        for sequence, (sender_id, message, _, _) in self.messages.items():
+            yield sequence, sender_id, message
+
+    def get(self, sequence: int) -> tuple[int, str] | None:
+        """
+        Returns the (sender id, message) of a stored message,
+            None if it isn't stored.
+        """
+        entry = self.messages.get(sequence)
+        return None if entry is None else entry[:2]
+
+    def add(self, sender_id: int, message: str,
+            mail_id: int = 0) -> tuple[int, list[tuple[int, str, int]]]:
+        """
+        Returns the message's sequence number, and the
+            (sender id, message, mail id) of the messages evicted to make
+            room for it.
+        """
+        evicted = self.expire()
+        while self.messages and (len(self.messages) >= self.max_messages
+                                 or self.size + len(message) > self.max_size):
+            evicted.append(self.pop_oldest()[:3])
+
+        # 32 bit on the wire, 0 is never used
+        self.last_sequence = self.last_sequence % 0xFFFFFFFF + 1
+        self.messages[self.last_sequence] = (
+            sender_id, message, mail_id, time.monotonic() + self.lifetime)
+        self.size += len(message)
+        self.index.setdefault(sender_id, set()).add(
+            (self.target_id, self.last_sequence))
+        return self.last_sequence, evicted
+
+    def ack(self, sequence: int) -> tuple[int, str, int] | None:
+        """
+        Removes a confirmed message.
+        Returns its (sender id, message, mail id), None if it isn't stored.
+        """
+        entry = self.messages.pop(sequence, None)
+        if entry is None:
+            return None
+        self.size -= len(entry[1])
+        self.unindex(entry[0], sequence)
+        return entry[:3]
+
+    def expire(self) -> list[tuple[int, str, int]]:
+        """
+        Removes the expired messages.
+        Returns their (sender id, message, mail id).
+        """
+        now = time.monotonic()
+        expired = []
+        while self.messages and \
+                self.messages[next(iter(self.messages))][3] <= now:
+            expired.append(self.pop_oldest()[:3])
+        return expired
+
+    def clear(self) -> list[tuple[int, str, int]]:
+        """
+        Removes every message.
+        Returns their (sender id, message, mail id).
+        """
+        messages = []
+        for sequence, entry in self.messages.items():
+            self.unindex(entry[0], sequence)
+            messages.append(entry[:3])
+        self.messages.clear()
+        self.size = 0
+        return messages
+
+    def mail_ids(self) -> set[int]:
+        """
+        Returns the mail ids of the stored messages from the mailbox.
+        """
+        return {entry[2] for entry in self.messages.values() if entry[2]}
+
+    def remove_mail(self) -> list[tuple[int, str, int]]:
+        """
+        Removes the messages from the mailbox, they're still in it.
+        Returns their (sender id, message, mail id).
+        """
+        sequences = [sequence for sequence, entry in self.messages.items()
+                     if entry[2]]
+        return [self.ack(sequence) for sequence in sequences]
+
+    def pop_oldest(self) -> tuple[int, str, int, float]:
+        sequence, entry = self.messages.popitem(last=False)
+        self.size -= len(entry[1])
+        self.unindex(entry[0], sequence)
+        return entry
+
+    def unindex(self, sender_id: int, sequence: int) -> None:
+        pending = self.index.get(sender_id)
+        if pending is None:
+            return
+        pending.discard((self.target_id, sequence))
+        if not pending:
+            del self.index[sender_id]
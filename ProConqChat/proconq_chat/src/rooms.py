@@ -0,0 +1,116 @@
+import time
+from typing import Any
+
+from proconq_chat.utils.protocol import (
+    MessageCodec,
+    Opcode
+)
+
+
+class Room:
+    """
+    A group of clients that get every message published to it.
+
+    A publish is encoded once and queued to every member's connection,
+        each connection's writer encrypts it with its own session.
+    Room messages aren't confirmed or kept for members that are away,
+        unlike direct messages.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        # Client handlers, anything with a send_request
+        self.members: set[Any] = set()
+
+        # Totals since the room was created
+        self.published = 0
+        self.delivered = 0
+        self.delivered_bytes = 0
+        # Deliveries in the current second, and in the last complete one
+        self.second = int(time.monotonic())
+        self.second_deliveries = 0
+        self.last_second_deliveries = 0
+
+    def publish(self, sender: Any, sender_id: int, message: str) -> int:
+        """
+        Queues a message to every member but its sender.
+        Returns the number of members it was queued to.
+        """
+        encoded = MessageCodec.encode(Opcode.ROOMMSG, self.name, sender_id,
+                                      message)
+        recipients = 0
+        for member in self.members:
+            if member is not sender:
+                member.send_request(encoded)
+                recipients += 1
+
+        self.count(recipients, len(encoded))
+        return recipients
+
+    def count(self, recipients: int, size: int) -> None:
+        self.published += 1
+        self.delivered += recipients
+        self.delivered_bytes += recipients * size
+
+        second = int(time.monotonic())
+        if second != self.second:
+            # A gap of more than a second means nothing was delivered
+            self.last_second_deliveries = \
+                self.second_deliveries if second == self.second + 1 else 0
+            self.second = second
+            self.second_deliveries = 0
+        self.second_deliveries += recipients
+
+    def deliveries_per_second(self) -> int:
+        """
+        Returns the deliveries of the last complete second.
+        """
+        second = int(time.monotonic())
+        if second == self.second:
+            return self.last_second_deliveries
+        if second == self.second + 1:
+            return self.second_deliveries
+        return 0
+
+
+class RoomDirectory:
+    """
+    The rooms that have members, a room is created by its first member
+        and removed with its last.
+    """
+    def __init__(self, max_rooms_per_client: int):
+        self.max_rooms_per_client = max_rooms_per_client
+        self.rooms: dict[str, Room] = {}
+
+    def join(self, member: Any, name: str) -> Room | None:
+        """
+        Returns the room, None if the member is in too many rooms.
+        """
+        if name not in member.rooms \
+                and len(member.rooms) >= self.max_rooms_per_client:
+            return None
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = Room(name)
+        room.members.add(member)
+        member.rooms.add(name)
+        return room
+
+    def leave(self, member: Any, name: str) -> bool:
+        """
+        Returns whether the member was in the room.
+        """
+        if name not in member.rooms:
+            return False
+        member.rooms.discard(name)
+        room = self.rooms[name]
+        room.members.discard(member)
+        if not room.members:
+            del self.rooms[name]
+        return True
+
+    def leave_all(self, member: Any) -> None:
+        for name in list(member.rooms):
+            self.leave(member, name)
+
+    def get(self, name: str) -> Room | None:
+        return self.rooms.get(name)
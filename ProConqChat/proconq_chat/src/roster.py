@@ -0,0 +1,97 @@
+from typing import Any, Callable
+
+from proconq_chat.utils.protocol import (
+    MessageCodec,
+    Opcode,
+    Presence
+)
+
+
+class Roster:
+    """
+    The online clients, kept up to date as they come and go.
+
+    Subscribers get a snapshot once, then a PRESENCE message per change.
+    Snapshots are encoded once per change however many clients ask,
+        and only get the ID of the request they answer patched in.
+    The clients of the other workers of a sharded server are included,
+        forward tells them of the changes made here.
+    """
+    def __init__(self):
+        # id -> name, in the order the clients joined
+        self.users: dict[int, str] = {}
+        # name -> ids of the clients by that name
+        self.names: dict[str, set[int]] = {}
+        # Called with every change made on this worker
+        self.forward: Callable[[Presence, int, str], None] = None
+        # Client handlers, anything with a send_request
+        self.subscribers: set[Any] = set()
+        # opcode -> encoded snapshot, dropped on every change
+        self.snapshots: dict[Opcode, bytes] = {}
+
+    def snapshot(self, opcode: Opcode, request_id: int) -> bytes:
+        """
+        Returns the list of online users as an opcode's response.
+        """
+        snapshot = self.snapshots.get(opcode)
+        if snapshot is None:
+            users = [(name, user_id) for user_id, name in self.users.items()]
+            snapshot = MessageCodec.encode(opcode, users)
+            self.snapshots[opcode] = snapshot
+        return MessageCodec.with_request_id(snapshot, request_id)
+
+    def subscribe(self, subscriber: Any, request_id: int) -> None:
+        """
+        Sends the subscriber a snapshot, changes follow it.
+        """
+        self.subscribers.add(subscriber)
+        subscriber.send_request(self.snapshot(Opcode.SUBSCRIBECONF,
+                                              request_id))
+
+    def unsubscribe(self, subscriber: Any) -> None:
+        self.subscribers.discard(subscriber)
+
+    def join(self, user_id: int, name: str) -> None:
+        self.change(Presence.JOIN, user_id, name)
+
+    def leave(self, user_id: int) -> None:
+        name = self.users.get(user_id)
+        if name is not None:
+            self.change(Presence.LEAVE, user_id, name)
+
+    def rename(self, user_id: int, name: str) -> None:
+        if user_id in self.users and self.users[user_id] != name:
+            self.change(Presence.RENAME, user_id, name)
+
+    def change(self, presence: Presence, user_id: int, name: str) -> None:
+        self.apply(presence, user_id, name)
+        if self.forward is not None:
+            self.forward(presence, user_id, name)
+
+    def apply(self, presence: Presence, user_id: int, name: str) -> None:
+        """
+        Applies a change, made on this worker or another.
+        """
+        old_name = self.users.get(user_id)
+        if old_name is not None:
+            ids = self.names[old_name]
+            ids.discard(user_id)
+            if not ids:
+                del self.names[old_name]
+
+        if presence == Presence.LEAVE:
+            self.users.pop(user_id, None)
+        else:
+            self.users[user_id] = name
+            self.names.setdefault(name, set()).add(user_id)
+        self.publish(presence, user_id, name)
+
+    def publish(self, presence: Presence, user_id: int, name: str) -> None:
+        self.snapshots.clear()
+        if not self.subscribers:
+            return
+        # Encoded once, the same message is queued to every subscriber
+        message = MessageCodec.encode(Opcode.PRESENCE, presence,
+                                      user_id, name)
+        for subscriber in self.subscribers:
+            subscriber.send_request(message)
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import struct
+from enum import IntEnum
+from pathlib import Path
+
+from proconq_chat.utils.constants import (
+    ClientIDs,
+    Sharding
+)
+from proconq_chat.utils.exceptions import (
+    FrameTooLargeError,
+    ProtocolError
+)
+from proconq_chat.utils.framing import (
+    AsyncFrameReader,
+    encode_frame
+)
+from proconq_chat.utils.protocol import (
+    Dispatcher,
+    Field,
+    MessageCodec
+)
+from proconq_chat.src.outbound_queue import OutboundQueue
+
+
+class Route(IntEnum):
+    """
+    The messages the workers of a sharded server send each other.
+    Never sent to clients, they aren't part of the chat protocol.
+    """
+    PRESENCE = 1
+    DELIVER = 2
+    DELIVER_NAME = 3
+    PUBLISH = 4
+    LOGOUT = 5
+
+
+class Router:
+    """
+    Connects the workers of a sharded server over Unix sockets.
+
+    Every worker listens on a socket of its own, and keeps a link to
+        every other worker that only it writes to.
+    A link is a queue drained by its own task, routing never blocks
+        and keeps the order messages were routed in.
+    Links are created before any client connects, so no change made on
+        a worker is missed by another that's still starting.
+    A broken link is connected again, what's routed meanwhile waits in
+        its queue. Only the messages being written when it broke are lost.
+
+    Client IDs are split between the workers in equal ranges,
+        the worker a client is connected to is known by its ID.
+    Messages are framed like the chat protocol's and encoded with
+        its fields, but in plain, they never leave the machine.
+    """
+    header = struct.Struct('!B')
+
+    schemas: dict[Route, tuple] = {
+        # presence, id, name
+        Route.PRESENCE: (Field.U8, Field.U32, Field.STR),
+        # target id, sender id, message
+        Route.DELIVER: (Field.U32, Field.U32, Field.STR),
+        # target name, sender id, message
+        Route.DELIVER_NAME: (Field.STR, Field.U32, Field.STR),
+        # room, sender id, message
+        Route.PUBLISH: (Field.STR, Field.U32, Field.STR),
+        # name of a deleted user
+        Route.LOGOUT: (Field.STR,),
+    }
+
+    def __init__(self, worker: int, workers: int, socket_dir: Path,
+                 dispatcher: Dispatcher, logger: logging.Logger):
+        self.worker = worker
+        self.workers = workers
+        self.socket_dir = socket_dir
+        # Handles the messages of the other workers
+        self.dispatcher = dispatcher
+        self.logger = logger
+
+        self.span = (ClientIDs.MAX_ID - ClientIDs.MIN_ID + 1) // workers
+        self.links: dict[int, OutboundQueue] = {
+            peer: OutboundQueue(Sharding.LINK_MAX_MESSAGES,
+                                Sharding.LINK_MAX_SIZE)
+            for peer in range(workers) if peer != worker}
+        self.tasks: set[asyncio.Task] = set()
+        self.server: asyncio.AbstractServer = None
+
+    def path(self, worker: int) -> Path:
+        return self.socket_dir / f'worker-{worker}.sock'
+
+    def id_range(self, worker: int) -> tuple[int, int]:
+        """
+        Returns the first and last client ID of a worker.
+        """
+        first = ClientIDs.MIN_ID + worker * self.span
+        if worker == self.workers - 1:
+            return first, ClientIDs.MAX_ID
+        return first, first + self.span - 1
+
+    def owner(self, client_id: int) -> int:
+        """
+        Returns the worker the client of an ID is connected to.
+        """
+        return min((client_id - ClientIDs.MIN_ID) // self.span,
+                   self.workers - 1)
+
+    async def start(self) -> None:
+        """
+        Listens for the other workers and starts linking to them.
+        """
+        self.server = await asyncio.start_unix_server(
+            self.accept, self.path(self.worker))
+        for peer in self.links:
+            task = asyncio.create_task(self.link(peer))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def send(self, peer: int, route: Route, *fields) -> None:
+        self.queue(peer, self.encode(route, *fields))
+
+    def broadcast(self, route: Route, *fields) -> None:
+        """
+        Sends a message to every other worker, encoded once.
+        """
+        message = self.encode(route, *fields)
+        for peer in self.links:
+            self.queue(peer, message)
+
+    def queue(self, peer: int, message: bytes) -> None:
+        if not self.links[peer].put(message):
+            self.links[peer].dropped += 1
+            self.logger.warning('Link to worker %s is full, dropped a '
+                                'message', peer)
+
+    async def link(self, peer: int) -> None:
+        """
+        Connects to a worker, then writes what's routed to it.
+        Connects again whenever the link breaks.
+        """
+        path = self.path(peer)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Sharding.CONNECT_TIMEOUT
+        interval = Sharding.CONNECT_INTERVAL
+        queue = self.links[peer]
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(path)
+            except OSError as err:
+                if deadline is None:
+                    # The link broke, backs off while the worker stays away
+                    self.logger.debug('Relinking to worker %s failed: %s',
+                                      peer, err)
+                    interval = min(interval * 2,
+                                   Sharding.MAX_CONNECT_INTERVAL)
+                elif loop.time() > deadline:
+                    self.logger.critical('Worker %s is unreachable', peer)
+                    return
+                # Otherwise the worker is still starting
+                await asyncio.sleep(interval)
+                continue
+            self.logger.debug('Linked to worker %s', peer)
+            # Only the first connection waits for the worker to start
+            deadline = None
+            interval = Sharding.CONNECT_INTERVAL
+
+            try:
+                while await queue.wait():
+                    writer.writelines([encode_frame(message)
+                                       for message in queue.take()])
+                    await writer.drain()
+                return
+            except ConnectionError as err:
+                self.logger.critical('Link to worker %s broke: %s',
+                                     peer, err)
+            finally:
+                writer.close()
+            await asyncio.sleep(interval)
+
+    async def accept(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        """
+        Handles the messages of a worker until it disconnects.
+        """
+        frame_reader = AsyncFrameReader(reader)
+        try:
+            while True:
+                payload = await frame_reader.read_frame()
+                # A message that can't be handled is skipped, the frames
+                # after it are still whole
+                try:
+                    route, fields = self.decode(payload)
+                    handler = self.dispatcher.get_handler(route)
+                    handler(self.dispatcher, *fields)
+                except ProtocolError as err:
+                    self.logger.error('Bad message from a worker: %s', err)
+                except Exception:
+                    self.logger.exception('Failed handling %s from a worker',
+                                          route.name)
+        except asyncio.IncompleteReadError:
+            self.logger.warning('A worker disconnected')
+        except FrameTooLargeError as err:
+            self.logger.error('Bad frame from a worker: %s', err)
+        finally:
+            writer.close()
+
+    @staticmethod
+    def encode(route: Route, *fields) -> bytes:
+        """
+        Raises ProtocolError if the fields don't match the route's schema.
+        """
+        parts = [Router.header.pack(route)]
+        try:
+            MessageCodec.encode_fields(parts, Router.schemas[route], fields)
+        except (struct.error, TypeError, AttributeError) as err:
+            raise ProtocolError(f'Bad fields for {route.name}: {err}')
+        return b''.join(parts)
+
+    @staticmethod
+    def decode(payload: bytes) -> tuple[Route, list]:
+        """
+        Raises ProtocolError if the message is malformed.
+        """
+        view = memoryview(payload)
+        try:
+            (raw_route,) = Router.header.unpack_from(view)
+            route = Route(raw_route)
+            fields, offset = MessageCodec.decode_fields(
+                view, Router.header.size, Router.schemas[route])
+        except (struct.error, ValueError) as err:
+            raise ProtocolError(f'Malformed route: {err}')
+        if offset != len(view):
+            raise ProtocolError(f'Malformed {route.name}: trailing bytes')
+        return route, fields
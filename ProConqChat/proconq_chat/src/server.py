@@ -1,428 +1,1366 @@
-import random
-import socket
-import threading
+import asyncio
 import logging
-import ast
-
-from proconq_chat.setup_logging import setup_logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from proconq_chat.setup_logging import (
+    handle_debug_signal,
+    setup_logging,
+    session_logger
+)
 from proconq_chat.utils.constants import (
+    ClientIDs,
+    Database,
+    Fanout,
+    Logging,
+    Mail,
+    Outbound,
+    Passwords,
+    Pending,
+    Polling,
     Paths,
-    ServerConstants
+    Pipelining,
+    Protocol,
+    Rooms,
+    ServerConstants,
+    Tickets
+)
+from proconq_chat.utils.compressor import (
+    Compression,
+    Compressor,
+    available
+)
+from proconq_chat.utils.exceptions import (
+    NoAvailableIDError,
+    FrameTooLargeError,
+    ProtocolError
+)
+from proconq_chat.utils.framing import (
+    AsyncFrameReader,
+    encode_frame,
+    frame_buffer
+)
+from proconq_chat.utils.protocol import (
+    Dispatcher,
+    MessageCodec,
+    Opcode,
+    Presence,
+    handles
 )
-from proconq_chat.utils.exceptions import NoAvailableIDError
 from proconq_chat.utils.cryptography import (
-    AESCipher,
-    RSACipher
+    ServerIdentity,
+    SessionTickets
 )
-from proconq_chat.src.database.user_database import UserDatabase
-
-
-class ClientHandler:
+from proconq_common.session_crypto import (
+    KeyExchange,
+    SessionCipher,
+    fingerprint
+)
+from proconq_chat.src.id_allocator import IDAllocator
+from proconq_chat.src.metrics import ServerMetrics
+from proconq_chat.src.outbound_queue import OutboundQueue, SlowConsumer
+from proconq_chat.src.pending_store import PendingStore
+from proconq_chat.src.rooms import RoomDirectory
+from proconq_chat.src.roster import Roster
+from proconq_chat.src.router import Route, Router
+from proconq_chat.src.database.mailbox import Mailbox
+from proconq_chat.src.database.password_hasher import PasswordHasher
+from proconq_chat.src.database.user_database import AsyncUserDatabase
+
+
+class ClientHandler(Dispatcher):
+    """
+    Handles a single client connection on the server's event loop.
+
+    Reading runs in the connection's own task, each request is handled
+        in a task of its own so a slow request doesn't hold up the rest.
+    Writing runs in a second task that drains the outgoing queue.
+    The outgoing queue is bounded, a client that doesn't read what it's
+        sent is handled by ChatServer.slow_consumer.
+    """
     def __init__(self, logger: logging.Logger, client_id: int,
-                 client: socket.socket, address: tuple):
-        # Messages sent that are waiting for confirmation by the client
-        self.rcvd_buffer: dict[int, list[str]] = {}
-
-        self.logger = logger
-        self.log_message_start = f'Client {client} {address}'
-
-        self.client = client
-        self.address = address
-
-        self.client.settimeout(0.1)
-
-        self.logger.debug(f'{self.log_message_start} Handler Initialized')
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        # Messages delivered to the client waiting for its confirmation
+        self.pending = PendingStore(Pending.MAX_MESSAGES, Pending.MAX_SIZE,
+                                    Pending.LIFETIME, client_id,
+                                    ChatServer.pending_by_sender)
+        # Set while the user's mailbox may hold more than was delivered
+        self.has_mail = False
+        self.delivering_mail = False
+
+        self.connected_at = time.perf_counter()
+        self.reader = reader
+        self.writer = writer
+        self.frame_reader = AsyncFrameReader(reader)
+        self.address = writer.get_extra_info('peername')
+
+        # Each connection logs to its own file
+        self.logger = session_logger(
+            logger, f'conn-{self.address[0]}-{self.address[1]}')
+        self.log_message_start = f'Client {self.address}'
+
+        # Requests waiting to be written to the client
+        self.outgoing = OutboundQueue(Outbound.MAX_MESSAGES,
+                                      Outbound.MAX_SIZE)
+        self.write_task: asyncio.Task = None
+
+        # Requests of the client being handled
+        self.request_tasks: set[asyncio.Task] = set()
+        self.request_slots = asyncio.Semaphore(
+            Pipelining.MAX_PIPELINED_REQUESTS)
+
+        self.logger.debug('%s Handler Initialized', self.log_message_start)
 
         self.client_id = client_id
         self.client_name = 'GUEST'
+        # When the client's next USERS request may be answered
+        self.next_users_poll = 0.0
+        # Nonce of the ticket the session can be resumed with, once logged in
+        self.ticket_nonce: bytes = None
+        # Ends the session if it isn't resumed after its connection dropped
+        self.park_timer: asyncio.TimerHandle = None
+        # Names of the rooms the client is in
+        self.rooms: set[str] = set()
+
+        # Used for the handshake only
+        self.key_exchange: KeyExchange = None
+        # Created once the client sends the session key
+        self.session_cipher: SessionCipher = None
+        # Agreed on in the handshake, the client's messages are read and
+        # written with its schemas
+        self.protocol_version: int = Protocol.VERSION
+        # Compresses what's sent to the client, once the handshake agrees
+        # on a compression
+        self.compressor = Compressor()
+
+    async def start(self) -> None:
+        """
+        Starts the writer and begins the secure connection handshake.
+        """
+        self.write_task = asyncio.create_task(self.write_loop())
 
-        self.rsa_cipher = RSACipher()
-        self.aes_cipher = AESCipher()
-        self.aes_key: bytes = None
-        self.aes_iv: bytes = None
-
+        self.key_exchange = KeyExchange()
         self.establish_secure_connection()
 
+    async def stop(self) -> None:
+        """
+        Stops the writer after flushing what was already queued.
+        Requests still being handled are abandoned.
+        """
+        for task in self.request_tasks:
+            task.cancel()
+
+        if self.write_task is None:
+            return
+        self.outgoing.close()
+        try:
+            await asyncio.wait_for(self.write_task,
+                                   ServerConstants.CLOSE_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            self.write_task.cancel()
+
+        if self.compressor.compressed:
+            ServerMetrics.compression_ratio.observe(self.compressor.ratio())
+            self.logger.debug('%s Compressed %s payloads, ratio %.2f',
+                              self.log_message_start,
+                              self.compressor.compressed,
+                              self.compressor.ratio())
+
     def logout_client(self) -> None:
-        self.client_name = 'GUEST'
+        self.release_mail()
+        self.set_name('GUEST')
+        self.ticket_nonce = None
 
-        request = self.build_request('LOGGEDOUT')
+        request = self.build_request(Opcode.LOGGEDOUT)
         self.send_request(request)
 
-    def build_request(self, message_code: str, 
-                      data: str = None,
-                      encrypt: bool = True) -> bytes:
+    def build_request(self, opcode: Opcode, *fields,
+                      request_id: int = 0) -> bytes:
         """
-        Combines message code and data, separates by #
-        Encrypts result with AES
-        Attaches its size to it
+        Encodes the opcode and its fields.
+        Responses carry the ID of the request they answer.
         """
-        if data:
-            message = f'#{message_code}#{data}'.encode()
-        else:
-            message = f'#{message_code}'.encode()
+        return MessageCodec.encode(opcode, *fields, request_id=request_id,
+                                   version=self.protocol_version)
 
-        if encrypt:
-            message = self.aes_cipher.encrypt(message)
+    def send_request(self, message: bytes) -> bool:
+        """
+        Queues a request to the client, never blocks.
+        It's encrypted and framed by the writer, batched with its neighbours.
+        Returns False if it wasn't queued.
+        """
+        self.logger.debug('%s Sending: %s', self.log_message_start, message)
+        if self.outgoing.put(message):
+            return True
+        if not self.outgoing.closed:
+            self.slow_consumer()
+        return False
+
+    def slow_consumer(self) -> None:
+        """
+        Handles a request that didn't fit the client's outgoing queue.
+        Messages are spilled by deliver, before they get here.
+        """
+        self.outgoing.dropped += 1
+        ServerMetrics.outbound_dropped.inc()
+        if ChatServer.slow_consumer is not SlowConsumer.DISCONNECT:
+            self.logger.debug('%s Outgoing queue full, dropped a request',
+                              self.log_message_start)
+        elif not self.writer.transport.is_closing():
+            self.logger.warning('%s Outgoing queue full at %s requests, '
+                                'disconnecting', self.log_message_start,
+                                len(self.outgoing))
+            # Its pending messages are sent again if it resumes
+            self.writer.transport.abort()
+
+    async def write_loop(self) -> None:
+        """
+        Writes the queued requests.
+        Requests queued within the flush window are batched,
+            so a burst is encrypted, framed and written together.
+        A large batch is compressed and encrypted on the server's sealer
+            threads, the event loop serves other clients meanwhile.
+        """
+        while await self.outgoing.wait():
+            await asyncio.sleep(Pipelining.FLUSH_WINDOW)
+
+            batch = self.outgoing.take()
+            ServerMetrics.outbound_depth.observe(len(batch))
+            batches = list(MessageCodec.groups(batch))
+            if sum(map(len, batch)) >= Fanout.OFFLOAD_BYTES:
+                # Only this task uses the cipher, and it waits for the thread
+                frames, rejected = await asyncio.get_running_loop(
+                    ).run_in_executor(ChatServer.sealer, self.seal, batches)
+            else:
+                frames, rejected = self.seal(batches)
+            for message in rejected:
+                self.reject(message)
+            self.writer.writelines(frames)
+            ServerMetrics.frames_out.inc(len(frames))
+            ServerMetrics.bytes_out.inc(sum(map(len, frames)))
+            await self.writer.drain()
+
+            # Messages spilled to the mailbox while the client was behind
+            if not self.outgoing:
+                self.wake_mail()
+
+    def wake_mail(self) -> None:
+        """
+        Starts delivering the user's mailbox, if it may hold more than
+            was delivered and the client is ready for it.
+        """
+        if self.has_mail and not self.pending and not self.delivering_mail:
+            task = asyncio.create_task(self.deliver_mail())
+            self.request_tasks.add(task)
+            task.add_done_callback(self.request_tasks.discard)
 
-        size = str(len(message)).zfill(4).encode()
-        self.logger.debug(f'{self.log_message_start} MSG BUILD: {size + message}')
-        return size + message
-    
-    def send_request(self, message: bytes):
-        self.logger.debug(f'{self.log_message_start} Sending: {message}')
-        self.client.sendall(message)
+    def seal(self, batches: list[list[bytes]]
+             ) -> tuple[list[bytearray], list[bytes]]:
+        """
+        Returns the batches compressed, encrypted and framed,
+            and the messages too large to be sent.
+        A batch too large for a frame is split in halves until it fits,
+            only a message that doesn't fit a frame on its own isn't sent.
+        """
+        compress_seconds = seal_seconds = 0.0
+        frames = []
+        rejected = []
+        batches = deque(batches)
+        while batches:
+            messages = batches.popleft()
+            payload = MessageCodec.encode_batch(messages)
+            if self.compressor.algorithm != Compression.NONE:
+                started = time.perf_counter()
+                raw_size = len(payload)
+                payload = MessageCodec.compress(payload, self.compressor)
+                compress_seconds += time.perf_counter() - started
+                ServerMetrics.compression_raw_bytes.inc(raw_size)
+                ServerMetrics.compression_sent_bytes.inc(len(payload))
+
+            started = time.perf_counter()
+            try:
+                frame, frame_payload = frame_buffer(
+                    self.session_cipher.sealed_size(len(payload)))
+            except FrameTooLargeError:
+                if len(messages) > 1:
+                    half = len(messages) // 2
+                    batches.extendleft((messages[half:], messages[:half]))
+                else:
+                    rejected.append(messages[0])
+                continue
+            # Encrypted in place, the frame is the only copy
+            self.session_cipher.seal_into(payload, frame_payload)
+            frames.append(frame)
+            seal_seconds += time.perf_counter() - started
+
+        if self.compressor.algorithm != Compression.NONE:
+            ServerMetrics.compress_seconds.observe(compress_seconds)
+        ServerMetrics.seal_seconds.observe(seal_seconds)
+        return frames, rejected
+
+    def reject(self, message: bytes) -> None:
+        """
+        Gives up on a message too large to be sent to the client.
+        A delivered message is no longer pending, its sender is told
+            it wasn't forwarded, like when the client isn't connected.
+        """
+        opcode, _, fields = MessageCodec.decode(message,
+                                                self.protocol_version)
+        self.logger.error('%s Dropped %s, too large to send',
+                          self.log_message_start, opcode.name)
+        ServerMetrics.outbound_dropped.inc()
+        if opcode != Opcode.RCVDMSG:
+            return
 
-    def receive_loop(self) -> None:
+        sender_id, sequence, _ = fields
+        entry = self.pending.ack(sequence)
+        if entry is not None and entry[2]:
+            ChatServer.mailbox.remove(entry[2])
+        sender = ChatServer.clients.get(sender_id)
+        if sender is not None:
+            sender.send_request(sender.build_request(
+                Opcode.SNDMSGCONF, 0, self.client_id))
+
+    async def receive_loop(self) -> None:
+        data = await self.frame_reader.read_frame()
+        self.logger.debug('%s Received data: %s', self.log_message_start, data)
+        ServerMetrics.frames_in.inc()
+        ServerMetrics.bytes_in.inc(len(data))
+
+        in_handshake = self.session_cipher is None
+        if not in_handshake:
+            data = self.decrypt_data(data)
+        for opcode, request_id, fields in MessageCodec.decode_batch(
+                data, self.protocol_version):
+            self.logger.debug('%s Opcode: %s #%s',
+                              self.log_message_start, opcode.name, request_id)
+
+            # The handshake is the only plain message, and it is sent once
+            if (opcode == Opcode.AESKEY) != in_handshake:
+                raise ProtocolError(f'Unexpected opcode {opcode.name}')
+            handler = self.get_handler(opcode)
+
+            if in_handshake:
+                # Everything after the handshake depends on it
+                await handler(self, request_id, *fields)
+                continue
+
+            # Waits when too many requests are in progress,
+            # which stops reading from a client that floods the server
+            await self.request_slots.acquire()
+            task = asyncio.create_task(
+                self.handle_request(handler, request_id, fields))
+            self.request_tasks.add(task)
+            task.add_done_callback(self.request_tasks.discard)
+
+    async def handle_request(self, handler: Callable, request_id: int,
+                             fields: list) -> None:
         try:
-            size = int(self.client.recv(4).decode())
-        except TimeoutError:
-            return
-        self.logger.debug(f'{self.log_message_start} Received size: {size}')
-        data = self.client.recv(size)
-        self.logger.debug(f'{self.log_message_start} Received data: {data}')
-
-        use_rsa = False
-        self.logger.debug(f'{self.log_message_start} Using AES to decrypt.')
-        if not self.aes_key:
-            use_rsa = True
-            self.logger.debug(f'{self.log_message_start} Using RSA to decrypt.')
-        data = self.decrypt_data(data, use_rsa).decode()
-        message_code = data.split('#')[1]
-        self.logger.debug(f'Message Code: {message_code}')
-        data = data[len(message_code) + 2:]
-        getattr(self, message_code.lower())(data)
-
-    def decrypt_data(self, data: bytes, use_rsa: bool) -> bytes:
-        if use_rsa:
-            dec_data = self.rsa_cipher.decrypt(data)
-        else:
-            dec_data = self.aes_cipher.decrypt(data)
-        self.logger.debug(f'Decrypted data: {dec_data}')
+            await handler(self, request_id, *fields)
+        except Exception as err:
+            self.logger.error('%s Request #%s failed: %s',
+                              self.log_message_start, request_id, err)
+        finally:
+            self.request_slots.release()
+
+    def decrypt_data(self, data: bytes) -> bytes:
+        started = time.perf_counter()
+        dec_data = self.session_cipher.decrypt(data)
+        ServerMetrics.open_seconds.observe(time.perf_counter() - started)
+        self.logger.debug('%s Decrypted data: %s',
+                          self.log_message_start, dec_data)
         return dec_data
 
     def establish_secure_connection(self) -> None:
-        request = self.build_request('PUBKEY',
-                                     self.rsa_cipher.public_key, False)
-        self.send_request(request)
-
-    def aeskey(self, data: str) -> None:
         """
-        Modifies the values of aes iv and aes key.
-        Confirms the secure connection with the client.
+        Sends the server's half of the key exchange, signed by its identity.
+        Written directly since nothing else can be queued before it.
         """
-        data = data.split('###')
-
-        data[0] = ast.literal_eval(data[0])
-        data[1] = ast.literal_eval(data[1])
-
-        self.aes_key = data[0]
-        self.aes_iv = data[1]
-
-        self.aes_cipher.set_key(self.aes_key, self.aes_iv)
-        self.logger.debug(f'{self.log_message_start} AES_KEY = {self.aes_key}')
-        self.logger.debug(f'{self.log_message_start} AES_IVY = {self.aes_key}')
+        # The versions are signed too, so they can't be downgraded
+        signed = (bytes((Protocol.MIN_VERSION, Protocol.VERSION))
+                  + self.key_exchange.public_key)
+        request = self.build_request(Opcode.PUBKEY,
+                                     Protocol.MIN_VERSION, Protocol.VERSION,
+                                     ChatServer.identity.public_key,
+                                     self.key_exchange.public_key,
+                                     ChatServer.identity.sign(signed))
+        self.writer.write(encode_frame(request))
+
+    @handles(Opcode.AESKEY)
+    async def aeskey(self, request_id: int, version: int,
+                     exchange_key: memoryview,
+                     compressions: list[tuple[int]] = ()) -> None:
+        """
+        Completes the key exchange and starts the session cipher.
+        Picks the first of the client's compressions the server can use.
+        Confirms the secure connection, the protocol version and the
+            compression.
+        """
+        if not Protocol.MIN_VERSION <= version <= Protocol.VERSION:
+            raise ProtocolError(f'Unsupported protocol version {version}')
+        self.protocol_version = version
 
-        request = self.build_request('AESCONF')
+        try:
+            session_key = self.key_exchange.derive(bytes(exchange_key),
+                                                   is_server=True)
+        except ValueError as err:
+            raise ProtocolError(f'Bad key exchange: {err}')
+        self.session_cipher = SessionCipher(session_key, is_server=True)
+        self.key_exchange = None
+        ServerMetrics.handshakes.inc()
+        ServerMetrics.handshake_seconds.observe(
+            time.perf_counter() - self.connected_at)
+
+        compression = next((Compression(compression)
+                            for (compression,) in compressions
+                            if compression in available()),
+                           Compression.NONE)
+        self.compressor = Compressor(compression)
+        self.logger.debug('%s Session key set, protocol version %s, '
+                          'compression %s', self.log_message_start, version,
+                          compression.name)
+
+        request = self.build_request(Opcode.AESCONF, version, compression,
+                                     request_id=request_id)
         self.send_request(request)
 
-    def users(self, data: str = None) -> None:
+    def set_name(self, name: str) -> None:
+        ChatServer.index_session(self, self.client_name, name)
+        self.client_name = name
+        ChatServer.roster.rename(self.client_id, name)
+
+    @handles(Opcode.USERS)
+    async def users(self, request_id: int) -> None:
         """
         After requested to, send the client list of online users.
+        A client polling faster than Polling.USERS_INTERVAL is answered
+            at that pace, SUBSCRIBE gets it every change instead.
         """
-        message = ''
+        now = time.monotonic()
+        answer_at = max(now, self.next_users_poll)
+        self.next_users_poll = answer_at + Polling.USERS_INTERVAL
+        if answer_at > now:
+            await asyncio.sleep(answer_at - now)
 
-        for client_handler in ChatServer.clients.values():
-            client_id = client_handler.client_id
-            client_name = client_handler.client_name
-            message += f'{client_name} #{client_id}\n'
+        self.send_request(ChatServer.roster.snapshot(Opcode.USERSCONF,
+                                                     request_id))
 
-        request = self.build_request('USERSCONF', message)
-        self.send_request(request)
+    @handles(Opcode.SUBSCRIBE)
+    async def subscribe(self, request_id: int) -> None:
+        """
+        Sends the list of online users, then every change to it as it
+            happens, for as long as the client is connected.
+        """
+        ChatServer.roster.subscribe(self, request_id)
 
-    def login(self, data: str) -> None:
+    @handles(Opcode.LOGIN)
+    async def login(self, request_id: int, name: str, password: str) -> None:
         """
         Apply login attempt by user and handle accordingly.
         """
-        name = data.split('#')[0]
-        password = data[len(name) + 1:]
-
         if name.isalpha():
-            status = ChatServer.login(name, password)
+            status = await ChatServer.login(name, password)
         else:
             status = False
 
+        ticket = b''
         if status:
-            status = '1'
-            self.client_name = name
+            self.set_name(name)
+            ticket = self.issue_ticket()
+            self.logger.info('%s Login successful: %s',
+                             self.log_message_start, name)
         else:
-            status = '0'
-        request = self.build_request('LOGINCONF', status)
+            self.logger.warning('%s Login failed: %s',
+                                self.log_message_start, name)
+        request = self.build_request(Opcode.LOGINCONF, int(status), ticket,
+                                     request_id=request_id)
         self.send_request(request)
 
-    def regstr(self, data: str) -> None:
+        if status:
+            self.has_mail = True
+            await self.deliver_mail()
+
+    @handles(Opcode.RESUME)
+    async def resume(self, request_id: int, ticket: memoryview) -> None:
         """
-        Apply login attempt by user and handle accordingly.
+        Restores the session of a logged in client that lost its connection,
+            its name, ID and messages, without logging in again.
+        Messages sent to it that it didn't confirm are delivered again.
         """
-        name = data.split('#')[0]
-        password = data[len(name) + 1:]
+        session = ChatServer.resume(self, bytes(ticket))
+        if session is None:
+            request = self.build_request(Opcode.RESUMECONF, 0, '',
+                                         self.client_id, b'',
+                                         request_id=request_id)
+            return self.send_request(request)
+
+        self.set_name(session.client_name)
+        # Messages sent to the ID the client connected with are given up
+        # with it
+        self.drop_pending(self.pending.clear())
+        self.pending = session.pending
+        self.drop_pending(self.pending.expire())
+        self.logger.info('%s Resumed session: %s #%s', self.log_message_start,
+                         self.client_name, self.client_id)
+
+        request = self.build_request(Opcode.RESUMECONF, 1, self.client_name,
+                                     self.client_id, self.issue_ticket(),
+                                     request_id=request_id)
+        self.send_request(request)
+
+        for sequence, sender_id, message in self.pending:
+            self.send_request(self.build_request(
+                Opcode.RCVDMSG, sender_id, sequence, message))
 
+        self.has_mail = True
+        await self.deliver_mail()
+
+    async def deliver_mail(self) -> None:
+        """
+        Delivers a page of the user's mailbox, once its pending messages
+            are confirmed. The next page follows when this one is.
+        Each message stays in the mailbox until it's confirmed,
+            unconfirmed ones are delivered again by the next page.
+        """
+        # No more than the client's outgoing queue can take
+        limit = min(Mail.PAGE_SIZE, self.outgoing.room())
+        if (not self.has_mail or self.delivering_mail or self.pending
+                or limit <= 0):
+            return
+        name = self.client_name
+        # Skipped, the rows on their way to the user's other sessions
+        fetch_limit = limit + len(self.mail_held_elsewhere())
+        self.delivering_mail = True
+        try:
+            page = await ChatServer.mailbox.fetch(name, fetch_limit)
+        finally:
+            self.delivering_mail = False
+        # Logged out, or into another user, meanwhile
+        if self.client_name != name:
+            return
+
+        held = self.mail_held_elsewhere()
+        unheld = [row for row in page if row[0] not in held]
+        self.has_mail = len(page) == fetch_limit or len(unheld) > limit
+        page = unheld[:limit]
+        if not page:
+            return
+        for mail_id, sender_id, message in page:
+            sequence, dropped = self.pending.add(sender_id, message, mail_id)
+            self.drop_pending(dropped)
+            self.send_request(self.build_request(
+                Opcode.RCVDMSG, sender_id, sequence, message))
+        self.logger.debug('%s Delivered %s messages from the mailbox',
+                          self.log_message_start, len(page))
+
+    def mail_held_elsewhere(self) -> set[int]:
+        """
+        Returns the ids of the user's mail delivered to its other
+            sessions and not confirmed yet.
+        They're not delivered here too, unless that session gives them up.
+        """
+        held = set()
+        for session in ChatServer.names.get(self.client_name, ()):
+            if session is not self:
+                held |= session.pending.mail_ids()
+        return held
+
+    def release_mail(self) -> None:
+        """
+        Gives up the mail delivered to the client and not confirmed,
+            when its connection drops or it logs out.
+        It stays in the mailbox, the user's other sessions get it,
+            or this one once it's back.
+        """
+        if not self.pending.remove_mail() or self.client_name == 'GUEST':
+            return
+        self.has_mail = True
+        for session in ChatServer.names.get(self.client_name, ()):
+            if (session is not self
+                    and ChatServer.parked.get(session.client_id)
+                    is not session):
+                session.has_mail = True
+                session.wake_mail()
+
+    def issue_ticket(self) -> bytes:
+        """
+        Returns a new ticket for the session, older ones stop working.
+        """
+        self.ticket_nonce, ticket = ChatServer.tickets.issue(self.client_id)
+        return ticket
+
+    @handles(Opcode.REGSTR)
+    async def regstr(self, request_id: int, name: str, password: str) -> None:
+        """
+        Apply login attempt by user and handle accordingly.
+        """
         if name.isalpha():
-            status = ChatServer.register(name, password)
+            status = await ChatServer.register(name, password)
         else:
             status = False
 
-        status = '1' if status else '0'
-        request = self.build_request('REGSTRCONF', status)
+        request = self.build_request(Opcode.REGSTRCONF, int(status),
+                                     request_id=request_id)
         self.send_request(request)
 
-    def getid(self, data: str = None) -> None:
+    @handles(Opcode.GETID)
+    async def getid(self, request_id: int) -> None:
         """
         After requested to, send the client its ID
         """
-        request = self.build_request('GETIDCONF', self.client_id)
+        request = self.build_request(Opcode.GETIDCONF, self.client_id,
+                                     request_id=request_id)
         self.send_request(request)
 
-    def rcvdmsgconf(self, content: str) -> None:
+    @handles(Opcode.RCVDMSGCONF)
+    async def rcvdmsgconf(self, request_id: int, sequence: int) -> None:
         """
         Target confirms receiving message from sender.
         """
-        sender_id = int(content.split('#')[0])
-        message = content[5:]
-        try:
-            client_handler = ChatServer.clients[sender_id]
-            client_handler.rcvd_buffer[self.client_id].remove(message)
-            self.logger.debug(f'{self.log_message_start} Removed from buffer #{sender_id} - {message}')
-        except Exception:
-            self.logger.debug(f'{self.log_message_start} Message not in buffer #{sender_id} - {message}')
-
-    def buffer(self, data: str = None) -> None:
+        confirmed = self.pending.ack(sequence)
+        if confirmed is None:
+            self.logger.debug('%s Message not pending #%s',
+                              self.log_message_start, sequence)
+        else:
+            mail_id = confirmed[2]
+            if mail_id:
+                ChatServer.mailbox.remove(mail_id)
+            self.logger.debug('%s Confirmed message #%s',
+                              self.log_message_start, sequence)
+            await self.deliver_mail()
+
+    @handles(Opcode.BUFFER)
+    async def buffer(self, request_id: int) -> None:
         """
-        Send the receive buffer.
+        Sends the client's messages its targets didn't confirm yet.
         """
-        request = ''
-        
-        for target_id, messages in self.rcvd_buffer.items():
-            for message in messages:
-                msgsize = str(len(message) + 1).zfill(4)
-                request += f'{msgsize}#{target_id}#{message}\n'
-
-        if not request:
-            message = 'Buffer is empty'
-            msgsize = str(len(message) + 1).zfill(4)
-            request = f'{msgsize}#0000#{message}'
+        messages = []
+        pending = ChatServer.pending_by_sender.get(self.client_id, ())
+        for target_id, sequence in sorted(pending):
+            try:
+                entry = ChatServer.find_session(target_id).pending.get(
+                    sequence)
+            except KeyError:
+                continue
+            if entry is not None:
+                messages.append((target_id, entry[1]))
 
-        request = self.build_request('BUFFERCONF', request)
+        request = self.build_request(Opcode.BUFFERCONF, messages,
+                                     request_id=request_id)
         self.send_request(request)
 
-    def sndmsg(self, data: str) -> None:
+    @handles(Opcode.SNDMSG)
+    async def sndmsg(self, request_id: int, target_id: int,
+                     message: str) -> None:
         """
         Forwards a message from one client to another.
         """
-        data = data
-        target_id = int(data[:4])
-        message = data[5:]
-        
-        self.forward_rcvd(target_id, message)
+        self.forward_rcvd(target_id, message, request_id)
 
-    def forward_rcvd(self, target_id: int, message: str):
-        self.logger.debug(f'{self.log_message_start} Forwarding: #{target_id} - {message}')
+    def forward_rcvd(self, target_id: int, message: str,
+                     request_id: int = 0):
+        self.logger.debug('%s Forwarding: #%s - %s',
+                          self.log_message_start, target_id, message)
 
         try:
             if target_id == self.client_id:
                 raise KeyError
-            client_hanlder = ChatServer.clients[target_id]
-            request = client_hanlder.build_request('RCVDMSG', f'{self.client_id}#{message}')
-            
-            try:
-                self.rcvd_buffer[target_id].append(message)
-            except KeyError:
-                self.rcvd_buffer[target_id] = [message]
-            finally:
-                self.logger.debug(f'{self.log_message_start} Added to buffer: #{target_id} - {message}')
-
-            client_hanlder.send_request(request)
+            client_hanlder = ChatServer.find_session(target_id)
         except KeyError:
-            self.logger.debug(f'{self.log_message_start} ERROR: Forward to #{target_id} failed.')
-            request = self.build_request('SNDMSGCONF', f'0#{target_id}')
+            if ChatServer.route(target_id, self.client_id, message):
+                return
+            self.logger.debug('%s ERROR: Forward to #%s failed.',
+                              self.log_message_start, target_id)
+            request = self.build_request(Opcode.SNDMSGCONF, 0, target_id,
+                                         request_id=request_id)
+            return self.send_request(request)
+
+        client_hanlder.deliver(self.client_id, message)
+
+    @handles(Opcode.SNDNAME)
+    async def sndname(self, request_id: int, name: str,
+                      message: str) -> None:
+        """
+        Forwards a message to every session of a user.
+        A registered user that isn't logged in gets it from its mailbox.
+        """
+        self.logger.debug('%s Forwarding: %s - %s',
+                          self.log_message_start, name, message)
+
+        routed = ChatServer.route_name(name, self.client_id, message)
+        if name in ChatServer.names or routed:
+            sessions = ChatServer.names.get(name, set()) - {self}
+            for client_handler in sessions:
+                client_handler.deliver(self.client_id, message)
+            status = bool(sessions) or routed
+        elif name != 'GUEST' and await ChatServer.db.user_exists(name):
+            ChatServer.mailbox.put(name, self.client_id, message)
+            status = True
+        else:
+            status = False
+
+        if not status:
+            self.logger.debug('%s ERROR: Forward to %s failed.',
+                              self.log_message_start, name)
+            request = self.build_request(Opcode.SNDNAMECONF, 0, name,
+                                         request_id=request_id)
             self.send_request(request)
 
-    def database(self, data: str = None) -> None:
+    def deliver(self, sender_id: int, message: str) -> None:
+        """
+        Delivers a message to the client, pending until it's confirmed.
+        A logged in client that's behind on reading gets it from its
+            mailbox once it catches up, if the server spills.
+        """
+        parked = ChatServer.parked.get(self.client_id) is self
+        if (not parked and self.outgoing.full(len(message))
+                and ChatServer.slow_consumer is SlowConsumer.SPILL
+                and self.client_name != 'GUEST'):
+            ChatServer.mailbox.put(self.client_name, sender_id, message)
+            self.has_mail = True
+            self.outgoing.spilled += 1
+            ServerMetrics.outbound_spilled.inc()
+            return
+
+        sequence, dropped = self.pending.add(sender_id, message)
+        self.drop_pending(dropped)
+
+        # A client whose connection dropped gets it when it resumes
+        if not parked:
+            request = self.build_request(Opcode.RCVDMSG, sender_id, sequence,
+                                         message)
+            self.send_request(request)
+
+    def drop_pending(self, messages: list[tuple[int, str, int]]) -> None:
+        """
+        Gives up on delivering messages the client didn't confirm in time,
+            or that didn't fit its pending store.
+        A logged in user gets them from its mailbox the next time.
+        Messages from the mailbox are still in it, they aren't added again.
+        """
+        if not messages:
+            return
+        if any(mail_id for _, _, mail_id in messages):
+            self.has_mail = True
+        messages = [(sender_id, message)
+                    for sender_id, message, mail_id in messages
+                    if not mail_id]
+        if not messages:
+            return
+        if self.client_name == 'GUEST':
+            self.logger.warning('%s Dropped %s unconfirmed messages',
+                                self.log_message_start, len(messages))
+            return
+
+        for sender_id, message in messages:
+            ChatServer.mailbox.put(self.client_name, sender_id, message)
+        self.has_mail = True
+        self.logger.debug('%s Moved %s unconfirmed messages to the mailbox',
+                          self.log_message_start, len(messages))
+
+    @handles(Opcode.JOIN)
+    async def join(self, request_id: int, room: str) -> None:
+        """
+        Adds the client to a room, the room is created if it has no members.
+        """
+        joined = None
+        if room.isalnum() and len(room) <= Rooms.MAX_NAME_LENGTH:
+            joined = ChatServer.rooms.join(self, room)
+
+        members = 0 if joined is None else len(joined.members)
+        request = self.build_request(Opcode.JOINCONF, int(joined is not None),
+                                     room, members, request_id=request_id)
+        self.send_request(request)
+
+    @handles(Opcode.LEAVE)
+    async def leave(self, request_id: int, room: str) -> None:
+        status = ChatServer.rooms.leave(self, room)
+        request = self.build_request(Opcode.LEAVECONF, int(status), room,
+                                     request_id=request_id)
+        self.send_request(request)
+
+    @handles(Opcode.PUBLISH)
+    async def publish(self, request_id: int, room: str,
+                      message: str) -> None:
+        """
+        Sends a message to every other member of a room the client is in.
+        Members that are away don't get it later.
+        Only the members connected to this worker are counted.
+        """
+        recipients = 0
+        status = room in self.rooms
+        if status:
+            recipients = ChatServer.rooms.get(room).publish(
+                self, self.client_id, message)
+            if ChatServer.router is not None:
+                ChatServer.router.broadcast(Route.PUBLISH, room,
+                                            self.client_id, message)
+
+        request = self.build_request(Opcode.PUBLISHCONF, int(status), room,
+                                     recipients, request_id=request_id)
+        self.send_request(request)
+
+    @handles(Opcode.ROOMS)
+    async def list_rooms(self, request_id: int) -> None:
+        """
+        Sends the rooms with their members and message counts.
+        """
+        rooms = [(room.name, len(room.members), room.published,
+                  room.delivered, room.deliveries_per_second())
+                 for room in ChatServer.rooms.rooms.values()]
+        request = self.build_request(Opcode.ROOMSCONF, rooms,
+                                     request_id=request_id)
+        self.send_request(request)
+
+    @handles(Opcode.DATABASE)
+    async def database(self, request_id: int) -> None:
         """
         Sends to admin the database
         """
-        response = ''
         if self.client_name != 'ADMIN':
-            response = 'FAILURE'
+            request = self.build_request(Opcode.DATABASECONF, 0, [],
+                                         request_id=request_id)
         else:
-            credentials = ChatServer.get_credentials()
-            
-            for name, password in credentials.items():
-                passsize = str(len(password) + 1).zfill(4)
-                response += f'{passsize}#{name}#{password}\n'
-
-            if not response:
-                response = 'EMPTY'
+            credentials = await ChatServer.db.get_all_user_credentials()
+            request = self.build_request(Opcode.DATABASECONF, 1,
+                                         list(credentials.items()),
+                                         request_id=request_id)
+        self.send_request(request)
 
-        request = self.build_request('DATABASECONF', response)
+    @handles(Opcode.STATS)
+    async def stats(self, request_id: int) -> None:
+        """
+        Sends to admin the server's metrics.
+        """
+        if self.client_name != 'ADMIN':
+            request = self.build_request(Opcode.STATSCONF, 0, [],
+                                         request_id=request_id)
+        else:
+            request = self.build_request(
+                Opcode.STATSCONF, 1, ServerMetrics.registry.summary(),
+                request_id=request_id)
         self.send_request(request)
 
-    def deluser(self, name: str) -> None:
+    @handles(Opcode.DELUSER)
+    async def deluser(self, request_id: int, name: str) -> None:
         """
         Deletes a user from the database.
         """
-        status = ''
-
         if self.client_name != 'ADMIN' or name == 'GUEST':
-            status = '0'
+            status = False
         else:
-            status = '1' if ChatServer.deluser(name) else '0'
+            status = await ChatServer.deluser(name)
 
-        request = self.build_request('DELUSERCONF', f'{status}#{name}')
+        request = self.build_request(Opcode.DELUSERCONF, int(status), name,
+                                     request_id=request_id)
         self.send_request(request)
 
-    def run(self) -> None:
-        self.receive_loop()
+    async def run(self) -> None:
+        """
+        Reads and dispatches the client's requests until it disconnects.
+        """
+        while True:
+            await self.receive_loop()
+
+
+class PeerHandler(Dispatcher):
+    """
+    Handles what the other workers of a sharded server route to this one.
+    """
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    @handles(Route.PRESENCE)
+    def presence(self, presence: int, user_id: int, name: str) -> None:
+        ChatServer.roster.apply(Presence(presence), user_id, name)
+
+    @handles(Route.DELIVER)
+    def deliver(self, target_id: int, sender_id: int, message: str) -> None:
+        try:
+            ChatServer.find_session(target_id).deliver(sender_id, message)
+        except KeyError:
+            self.logger.debug('Routed message for #%s, no such client',
+                              target_id)
+
+    @handles(Route.DELIVER_NAME)
+    def deliver_name(self, name: str, sender_id: int, message: str) -> None:
+        for client_handler in ChatServer.names.get(name, ()):
+            client_handler.deliver(sender_id, message)
+
+    @handles(Route.PUBLISH)
+    def publish(self, room: str, sender_id: int, message: str) -> None:
+        room = ChatServer.rooms.get(room)
+        if room is not None:
+            room.publish(None, sender_id, message)
+
+    @handles(Route.LOGOUT)
+    def logout(self, name: str) -> None:
+        ChatServer.logout_user(name)
 
 
 class ChatServer:
-    db = UserDatabase(Paths.DATABASE)
-    clients_ids: set[int] = set()
+    # Built by open, in the process that runs the server
+    db: AsyncUserDatabase = None
+    mailbox: Mailbox = None
+    hasher: PasswordHasher = None
+    identity: ServerIdentity = None
+    # Encrypts the writes of large batches, see ClientHandler.write_loop
+    sealer: ThreadPoolExecutor = None
+    ids = IDAllocator(ClientIDs.MIN_ID, ClientIDs.MAX_ID,
+                      ClientIDs.REUSE_DELAY)
     clients: dict[int, ClientHandler] = {}
-    lock = threading.Lock()
+    # Sessions of logged in clients whose connection dropped, by ID
+    parked: dict[int, ClientHandler] = {}
+    tickets = SessionTickets(Tickets.LIFETIME)
+    roster = Roster()
+    rooms = RoomDirectory(Rooms.MAX_PER_CLIENT)
+    slow_consumer = SlowConsumer(Outbound.SLOW_CONSUMER)
+    # Set when the server runs as one of several workers, see shard
+    router: Router = None
+    metrics_path: Path = Paths.METRICS
+    # Sessions of every logged in user, connected or parked, by name
+    names: dict[str, set[ClientHandler]] = {}
+    # The (target id, sequence) of every unconfirmed message by its
+    # sender, kept by the targets' pending stores
+    pending_by_sender: dict[int, set[tuple[int, int]]] = {}
 
     def __init__(self, port: int, logger: logging.Logger):
         """
         Initializes the Server's Chat
         self.logger - logger instance
-        self.sock - server's socket
+        self.port - port to listen on
         """
         self.logger = logger
-        self.logger.debug('Attempting to create socket.')
-        try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            logger.debug('Server socket successfully created.')
-            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.sock.bind((ServerConstants.HOST,
-                            port))
-        except Exception as err:
-            self.logger.critical(f'Server failed to start: {err}')
+        self.port = port
+        self.server: asyncio.Server = None
 
-    def listen(self) -> None:
+    async def listen(self) -> None:
         """
-        Makes the server socket listen.
-        Attempting to accept in a loop blocks the loop from continuing.
-        When a client connects a thread is started for the client.
-        The loop then continues to accept.
+        Makes the server listen.
+        Every connection is handled by its own task on a single event loop,
+            an idle client costs nothing until it sends data.
         """
-        self.sock.listen()
-        self.logger.debug('Server is now listening.')
+        self.logger.debug('Attempting to create socket.')
+        ChatServer.register_gauges()
+        # Unix sockets only, the chat goes on without them
+        if hasattr(asyncio, 'start_unix_server'):
+            try:
+                await ServerMetrics.serve(ChatServer.metrics_path)
+            except OSError as err:
+                self.logger.error('Metrics socket failed: %s', err)
 
-        while True:
-            self.logger.debug('Waiting for an incoming connection.')
-            client, address = self.sock.accept()
-            self.logger.info(f'New Connection: {client} {address}')
-            thread = threading.Thread(target=self.handle_client,
-                                      args=(client, address))
-            thread.start()
-            self.logger.info('Started thread for client.')
-    
-    def handle_client(self, client: socket.socket, address: tuple) -> None:
+        try:
+            if ChatServer.router is not None:
+                await ChatServer.router.start()
+            # Workers share the port, the kernel spreads connections
+            # between them
+            self.server = await asyncio.start_server(
+                self.handle_client, ServerConstants.HOST, self.port,
+                reuse_address=True,
+                reuse_port=ChatServer.router is not None)
+        except OSError as err:
+            self.logger.critical('Server failed to start: %s', err)
+            return
+
+        self.logger.debug('Server is now listening.')
+        # What clients pin, for them to check before connecting
+        self.logger.info('Server identity: %s',
+                         fingerprint(ChatServer.identity.public_key))
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_client(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
         """
-        Handles a client thread
+        Handles a client connection
         """
-        log_message_start = f'Client {client} {address}'
+        address = writer.get_extra_info('peername')
+        log_message_start = f'Client {address}'
+        self.logger.info('New Connection: %s', address)
+        ServerMetrics.connections.inc()
 
+        client_id = None
+        client_handler = None
         try:
             client_id = ChatServer.generate_id(log_message_start, self.logger)
             client_handler = ClientHandler(self.logger, client_id,
-                                           client, address)
+                                           reader, writer)
             ChatServer.clients[client_id] = client_handler
-            while True:
-                client_handler.run()
+            ChatServer.roster.join(client_id, client_handler.client_name)
+            await client_handler.start()
+            await client_handler.run()
         except NoAvailableIDError as err:
-            self.logger.error(f'{log_message_start} Exception: {err}')
-            client_id = None
+            self.logger.error('%s Exception: %s', log_message_start, err)
+        except asyncio.IncompleteReadError:
+            self.logger.debug('%s Disconnected.', log_message_start)
+        except (FrameTooLargeError, ProtocolError) as err:
+            self.logger.error('%s Exception: %s', log_message_start, err)
         except ValueError as err:
-            self.logger.error(f'{log_message_start} Exception (probably size): {err}')
+            self.logger.error('%s Exception (probably size): %s',
+                              log_message_start, err)
         except Exception as err:
-            self.logger.error(f'{log_message_start} Exception: {err}')
+            self.logger.error('%s Exception: %s', log_message_start, err)
         finally:
-            self.logger.debug(f'{log_message_start} Closing socket.')
-            self.logger.debug(f'{log_message_start} Removing {client_id}')
-            ChatServer.remove_client(client_id)
-            client.close()
+            self.logger.debug('%s Closing socket.', log_message_start)
+            self.logger.debug('%s Removing %s', log_message_start, client_id)
+            ChatServer.remove_client(client_id, client_handler)
+            if client_handler is not None:
+                await client_handler.stop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
 
     @classmethod
-    def login(cls, name: str, password: str) -> bool:
-        with cls.lock:
-            return cls.db.verify_login(name, password)
+    async def login(cls, name: str, password: str) -> bool:
+        """
+        Checks the password on the hasher's workers,
+            other logins and the database aren't held up meanwhile.
+        """
+        hashed_password = await cls.db.get_password(name)
+        if hashed_password is None:
+            return False
+        return await cls.hasher.check(password, hashed_password)
 
     @classmethod
-    def register(cls, name: str, password: str) -> bool:
-        with cls.lock:
-            return cls.db.register_user(name, password)
+    async def register(cls, name: str, password: str) -> bool:
+        """
+        Hashes the password on the hasher's workers, then adds the user.
+        A name registered by someone else meanwhile is caught on insert.
+        """
+        if name == 'GUEST' or await cls.db.user_exists(name):
+            return False
+        salt, hashed_password = await cls.hasher.hash(password)
+        return await cls.db.add_user(name, salt, hashed_password)
 
     @classmethod
-    def get_credentials(cls) -> dict[str, str]:
-        with cls.lock:
-            return cls.db.get_all_user_credentials()
-        
-    @classmethod
-    def deluser(cls, name: str) -> bool:
-        status = False
-        with cls.lock:
-            status = cls.db.delete_user(name)
-
-            if status:
-                for client in ChatServer.clients.values():
-                    if client.client_name == name:
-                        client.logout_client()
-        
+    async def deluser(cls, name: str) -> bool:
+        """
+        Deletes a user and logs out all of its connections.
+        """
+        status = await cls.db.delete_user(name)
+
+        if status:
+            cls.logout_user(name)
+            if cls.router is not None:
+                cls.router.broadcast(Route.LOGOUT, name)
+            cls.mailbox.clear(name)
+
         return status
 
     @classmethod
-    def remove_client(cls, client_id: int) -> None:
+    def logout_user(cls, name: str) -> None:
+        for client in list(cls.names.get(name, ())):
+            if cls.parked.get(client.client_id) is client:
+                cls.end_session(client.client_id, client)
+            else:
+                client.logout_client()
+
+    @classmethod
+    def open(cls) -> None:
+        """
+        Opens the databases and starts the server's threads.
+        Not done on import, a process that only launches workers
+            shouldn't hold any of it.
+        """
+        cls.db = AsyncUserDatabase(Paths.DATABASE, Database.WORKERS)
+        cls.mailbox = Mailbox(Paths.MAILBOX, Mail.MAX_BATCH)
+        cls.hasher = PasswordHasher(Passwords.WORKERS, Passwords.MAX_PENDING)
+        cls.identity = ServerIdentity.load(Paths.IDENTITY_KEY)
+        cls.sealer = ThreadPoolExecutor(Fanout.WORKERS, 'sealer')
+
+    @classmethod
+    def shard(cls, worker: int, workers: int, socket_dir: Path,
+              logger: logging.Logger) -> None:
+        """
+        Makes the server one of several workers sharing its port.
+        It hands out IDs from its own range, and routes messages for
+            clients of the other workers to them.
+        """
+        cls.router = Router(worker, workers, socket_dir, PeerHandler(logger),
+                            logger)
+        cls.ids = IDAllocator(*cls.router.id_range(worker),
+                              ClientIDs.REUSE_DELAY)
+        cls.metrics_path = Paths.METRICS.with_name(
+            f'{Paths.METRICS.stem}-worker{worker}{Paths.METRICS.suffix}')
+        cls.roster.forward = (
+            lambda presence, user_id, name: cls.router.broadcast(
+                Route.PRESENCE, presence, user_id, name))
+
+    @classmethod
+    def route(cls, target_id: int, sender_id: int, message: str) -> bool:
+        """
+        Routes a message to a client of another worker.
+        Returns False if no other worker has the client online.
+        """
+        if cls.router is None or target_id not in cls.roster.users:
+            return False
+        peer = cls.router.owner(target_id)
+        if peer == cls.router.worker:
+            return False
+        cls.router.send(peer, Route.DELIVER, target_id, sender_id, message)
+        return True
+
+    @classmethod
+    def route_name(cls, name: str, sender_id: int, message: str) -> bool:
+        """
+        Routes a message to the other workers the user is logged in on.
+        Returns False if there are none.
+        """
+        if cls.router is None or name == 'GUEST':
+            return False
+        peers = {cls.router.owner(user_id)
+                 for user_id in cls.roster.names.get(name, ())}
+        peers.discard(cls.router.worker)
+        for peer in peers:
+            cls.router.send(peer, Route.DELIVER_NAME, name, sender_id,
+                            message)
+        return bool(peers)
+
+    @classmethod
+    def index_session(cls, client_handler: ClientHandler, old_name: str,
+                      new_name: str) -> None:
+        """
+        Moves a session to its new name in the index of logged in users.
+        """
+        if old_name != 'GUEST':
+            sessions = cls.names.get(old_name)
+            if sessions is not None:
+                sessions.discard(client_handler)
+                if not sessions:
+                    del cls.names[old_name]
+        if new_name != 'GUEST':
+            cls.names.setdefault(new_name, set()).add(client_handler)
+
+    @classmethod
+    def register_gauges(cls) -> None:
+        """
+        Adds the metrics read from the server's state when exported.
+        """
+        registry = ServerMetrics.registry
+        registry.gauge('proconq_chat_clients', 'Connected clients.',
+                       lambda: len(cls.clients))
+        registry.gauge('proconq_chat_parked_sessions',
+                       'Sessions waiting to be resumed.',
+                       lambda: len(cls.parked))
+        registry.gauge('proconq_chat_rooms', 'Rooms with members.',
+                       lambda: len(cls.rooms.rooms))
+        registry.gauge('proconq_chat_outbound_queued',
+                       'Requests queued to clients and not written yet.',
+                       lambda: cls.outbound_stats()['queued'])
+        registry.gauge('proconq_chat_outbound_queued_bytes',
+                       'Bytes queued to clients and not written yet.',
+                       lambda: cls.outbound_stats()['queued_bytes'])
+        registry.gauge('proconq_chat_outbound_deepest',
+                       'Requests queued to the client furthest behind.',
+                       lambda: cls.outbound_stats()['deepest'])
+
+    @classmethod
+    def outbound_stats(cls) -> dict[str, int]:
+        """
+        Returns the totals of the connected clients' outgoing queues.
+        """
+        queues = [client.outgoing for client in cls.clients.values()]
+        return {
+            'queued': sum(map(len, queues)),
+            'queued_bytes': sum(queue.size for queue in queues),
+            'deepest': max(map(len, queues), default=0),
+            'peak': max((queue.peak for queue in queues), default=0),
+            'dropped': sum(queue.dropped for queue in queues),
+            'spilled': sum(queue.spilled for queue in queues),
+        }
+
+    @classmethod
+    def find_session(cls, client_id: int) -> ClientHandler:
+        """
+        Raises KeyError if there's no client or parked session by the ID.
+        """
+        try:
+            return cls.clients[client_id]
+        except KeyError:
+            return cls.parked[client_id]
+
+    @classmethod
+    def resume(cls, client_handler: ClientHandler,
+               ticket: bytes) -> ClientHandler | None:
+        """
+        Moves the session of the ticket to the client presenting it.
+        Returns the old session, None if the ticket isn't valid.
+
+        A session whose connection is still open is taken over,
+            its client wouldn't reconnect unless the connection was dead.
+        """
+        try:
+            client_id, nonce = cls.tickets.verify(ticket)
+            session = cls.find_session(client_id)
+        except (KeyError, ValueError):
+            return None
+        if session is client_handler or session.ticket_nonce != nonce:
+            return None
+
+        cls.index_session(session, session.client_name, 'GUEST')
+        if cls.parked.pop(client_id, None) is session:
+            session.park_timer.cancel()
+            cls.roster.join(client_id, session.client_name)
+        else:
+            # Stays on the roster, the client is back under the same name
+            del cls.clients[client_id]
+            cls.roster.unsubscribe(session)
+            cls.rooms.leave_all(session)
+            session.ticket_nonce = None
+            session.writer.transport.abort()
+
+        # The ID the client connected with is given up for the session's
+        cls.clients.pop(client_handler.client_id, None)
+        cls.roster.leave(client_handler.client_id)
+        cls.ids.release(client_handler.client_id)
+        client_handler.client_id = client_id
+        cls.clients[client_id] = client_handler
+        return session
+
+    @classmethod
+    def remove_client(cls, client_id: int,
+                      client_handler: ClientHandler = None) -> None:
         """
         Removes a client by ID from the list of clients.
+        A logged in client is parked instead, it keeps its ID and messages
+            until it resumes or its resume window ends.
         """
-        with cls.lock:
-            if client_id in cls.clients:
-                try:
-                    del cls.clients[client_id]
-                except KeyError:
-                    pass
-                cls.clients_ids.remove(client_id)
+        if client_handler is not None:
+            client_id = client_handler.client_id
+            # Its session was taken over by a newer connection
+            if cls.clients.get(client_id) is not client_handler:
+                return
+        elif client_id is None:
+            return
+
+        cls.clients.pop(client_id, None)
+        cls.roster.leave(client_id)
+        if client_handler is None:
+            cls.ids.release(client_id)
+            return
+
+        cls.roster.unsubscribe(client_handler)
+        # Rooms aren't kept for a parked session, the client joins again
+        cls.rooms.leave_all(client_handler)
+        if client_handler.ticket_nonce is None:
+            cls.index_session(client_handler, client_handler.client_name,
+                              'GUEST')
+            cls.ids.release(client_id)
+            return
+
+        # Its mail goes to the user's other sessions meanwhile, a resumed
+        # session gets what's left from the mailbox
+        client_handler.release_mail()
+        cls.parked[client_id] = client_handler
+        client_handler.park_timer = asyncio.get_running_loop().call_later(
+            Tickets.RESUME_WINDOW, cls.end_session, client_id, client_handler)
+
+    @classmethod
+    def end_session(cls, client_id: int,
+                    client_handler: ClientHandler) -> None:
+        """
+        Drops a parked session, its ID can be given out again.
+        Its unconfirmed messages go to the user's mailbox.
+        """
+        if cls.parked.get(client_id) is not client_handler:
+            return
+        del cls.parked[client_id]
+        client_handler.park_timer.cancel()
+        cls.ids.release(client_id)
+        client_handler.drop_pending(client_handler.pending.clear())
+        cls.index_session(client_handler, client_handler.client_name, 'GUEST')
 
     @classmethod
     def generate_id(cls, log_message_start: str,
                     logger: logging.Logger) -> int:
         """
-        Generates a random client ID.
+        Generates a client ID.
+        Raises NoAvailableIDError if every ID is taken.
         """
-        with cls.lock:
-            # Create a list of unused IDs by taking the difference between the
-            # range of 1000 to 9999 and the existing clients_ids set
-            unused_ids = list(set(range(1000, 10000)) - cls.clients_ids)
-
-            # If there are no unused IDs available, raise a NoAvailableIDError
-            if not unused_ids:
-                raise NoAvailableIDError("No available IDs.")
+        new_id = cls.ids.allocate()
 
-            new_id = random.choice(unused_ids)
-            cls.clients_ids.add(new_id)
+        logger.debug('%s Generated ID %s', log_message_start, new_id)
 
-            logger.debug(f'{log_message_start} Generated ID {new_id}')
-
-            return new_id
+        return new_id
 
 
 def launch_server(port: int):
     logger = setup_logging(__name__)
+    ChatServer.open()
     chat_server = ChatServer(port, logger)
     logger.debug('Activating Server listen mode.')
-    chat_server.listen()
+    asyncio.run(chat_server.listen())
+
+
+def launch_worker(port: int, worker: int, workers: int,
+                  socket_dir: str) -> None:
+    logger = setup_logging(f'{__name__}.worker{worker}')
+    handle_debug_signal()
+    ChatServer.open()
+    ChatServer.shard(worker, workers, Path(socket_dir), logger)
+    chat_server = ChatServer(port, logger)
+    logger.debug('Activating worker %s listen mode.', worker)
+    asyncio.run(chat_server.listen())
+
+
+def launch_workers(port: int, workers: int) -> None:
+    """
+    Runs the server in a process per worker, all listening on the port.
+    Each worker runs on a core of its own, with its own share of
+        the clients. They reach each other over Unix sockets.
+    Each worker logs to a directory of its own, no two processes rotate
+        the same file or delete what another still writes.
+    A worker exiting takes the rest down, its clients can't be reached.
+    """
+    logger = setup_logging(__name__)
+    # Generated before the workers start, they'd race to create it
+    ServerIdentity.load(Paths.IDENTITY_KEY)
+    # Spawned rather than forked, the server's threads don't survive a fork
+    context = multiprocessing.get_context('spawn')
+    socket_dir = tempfile.mkdtemp(prefix='proconq_chat-')
+    processes = [
+        context.Process(target=launch_worker,
+                        args=(port, worker, workers, socket_dir),
+                        name=f'worker{worker}')
+        for worker in range(workers)]
+
+    logger.debug('Starting %s workers.', workers)
+    environment = dict(os.environ)
+    try:
+        try:
+            for worker, process in enumerate(processes):
+                # A spawned process takes the environment it's started
+                # with, and sets its logging up before launch_worker runs
+                os.environ['PROCONQ_CHAT_LOG_DIR'] = str(
+                    Paths.LOGGING / f'worker{worker}')
+                os.environ['PROCONQ_CHAT_LOG_QUOTA'] = str(
+                    Logging.QUOTA_BYTES // (workers + 1))
+                process.start()
+        finally:
+            os.environ.clear()
+            os.environ.update(environment)
+        multiprocessing.connection.wait(
+            [process.sentinel for process in processes])
+    finally:
+        for process in processes:
+            if process.pid is None:
+                continue
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        shutil.rmtree(socket_dir, ignore_errors=True)
 
 
 if __name__ == '__main__':
-    launch_server()
+    launch_server(ServerConstants.PORT)
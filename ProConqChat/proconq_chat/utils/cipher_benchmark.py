@@ -0,0 +1,98 @@
+"""
+Compares the session cipher with the AES-CBC cipher it replaced,
+    on the path every message takes: encrypt and frame, then decrypt.
+
+Usage: python -m proconq_chat.utils.cipher_benchmark
+"""
+import sys
+import time
+
+from Crypto.Random import get_random_bytes
+
+from proconq_chat.utils.cryptography import AESCipher
+from proconq_chat.utils.framing import (
+    encode_frame,
+    frame_buffer
+)
+from proconq_common.session_crypto import SessionCipher
+
+
+class CipherBenchmark:
+    # Message sizes to measure, in bytes
+    sizes: tuple[int, ...] = (32, 256, 4096, 65536)
+    # Messages to time per size
+    messages: int = 20_000
+
+    @staticmethod
+    def per_message(start: float, count: int) -> float:
+        """
+        Returns the microseconds each message took since start.
+        """
+        return (time.perf_counter() - start) / count * 1_000_000
+
+    @staticmethod
+    def measure_cbc(data: bytes, count: int) -> tuple[float, float]:
+        """
+        Returns the microseconds to encrypt and to decrypt a message.
+        """
+        cipher = AESCipher()
+
+        start = time.perf_counter()
+        for _ in range(count):
+            frame = encode_frame(cipher.encrypt(data))
+        encrypt = CipherBenchmark.per_message(start, count)
+
+        payload = frame[4:]
+        start = time.perf_counter()
+        for _ in range(count):
+            cipher.decrypt(payload)
+        decrypt = CipherBenchmark.per_message(start, count)
+
+        return encrypt, decrypt
+
+    @staticmethod
+    def measure_session(data: bytes, count: int) -> tuple[float, float]:
+        """
+        Returns the microseconds to encrypt and to decrypt a message.
+        """
+        session_key = SessionCipher.new_key()
+        sender = SessionCipher(session_key, is_server=True)
+        receiver = SessionCipher(session_key, is_server=False)
+
+        # Messages have to be decrypted in the order they were sent
+        payloads: list[memoryview] = []
+        start = time.perf_counter()
+        for _ in range(count):
+            frame, frame_payload = frame_buffer(sender.sealed_size(len(data)))
+            sender.seal_into(data, frame_payload)
+            payloads.append(frame_payload)
+        encrypt = CipherBenchmark.per_message(start, count)
+
+        start = time.perf_counter()
+        for payload in payloads:
+            receiver.decrypt(payload)
+        decrypt = CipherBenchmark.per_message(start, count)
+
+        return encrypt, decrypt
+
+
+def main() -> int:
+    print(f'{"size":>8} {"cbc enc":>10} {"cbc dec":>10} '
+          f'{"session enc":>12} {"session dec":>12}   (us per message)')
+
+    for size in CipherBenchmark.sizes:
+        data = get_random_bytes(size)
+        # Fewer of the large messages, the point is the per-message cost
+        count = max(CipherBenchmark.messages * 256 // max(size, 256), 200)
+
+        cbc_encrypt, cbc_decrypt = CipherBenchmark.measure_cbc(data, count)
+        session_encrypt, session_decrypt = \
+            CipherBenchmark.measure_session(data, count)
+
+        print(f'{size:>8} {cbc_encrypt:>10.2f} {cbc_decrypt:>10.2f} '
+              f'{session_encrypt:>12.2f} {session_decrypt:>12.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
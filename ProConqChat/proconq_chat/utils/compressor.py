@@ -0,0 +1,112 @@
+import zlib
+from enum import IntEnum
+
+try:
+    # Part of the standard library since Python 3.14
+    from compression import zstd
+    # Raised on corrupt data
+    DATA_ERRORS = (zlib.error, zstd.ZstdError)
+except ImportError:
+    zstd = None
+    DATA_ERRORS = (zlib.error,)
+
+from proconq_chat.utils.constants import (
+    Compressing,
+    Framing
+)
+
+
+class Compression(IntEnum):
+    """
+    The algorithms a payload can be compressed with.
+    Values are part of the wire format, never renumber them.
+    """
+    NONE = 0
+    ZLIB = 1
+    ZSTD = 2
+
+
+def available() -> list[Compression]:
+    """
+    Returns the algorithms this side can use, the preferred first.
+    """
+    if zstd is None:
+        return [Compression.ZLIB]
+    return [Compression.ZSTD, Compression.ZLIB]
+
+
+def compress(algorithm: Compression, data: bytes) -> bytes:
+    if algorithm == Compression.ZSTD:
+        return zstd.compress(data, level=Compressing.ZSTD_LEVEL)
+    return zlib.compress(data, Compressing.ZLIB_LEVEL)
+
+
+def decompress(algorithm: int, data: bytes, size: int) -> bytes:
+    """
+    Returns the data decompressed, stops at a byte past the size it
+        claims, so a small payload can't take the receiver's memory.
+    Raises ValueError if it's corrupt, an algorithm this side can't use,
+        or not the size it claims.
+    """
+    if algorithm not in available():
+        raise ValueError(f'Unsupported compression {algorithm}')
+    if size > Framing.MAX_FRAME_SIZE:
+        raise ValueError(f'Decompressed size {size} exceeds the maximum')
+
+    try:
+        if algorithm == Compression.ZSTD:
+            decompressor = zstd.ZstdDecompressor()
+        else:
+            decompressor = zlib.decompressobj()
+        output = decompressor.decompress(data, size + 1)
+    except DATA_ERRORS as err:
+        raise ValueError(f'Corrupt compressed data: {err}')
+    if len(output) != size or not decompressor.eof:
+        raise ValueError('Decompressed size mismatch')
+    return output
+
+
+class Compressor:
+    """
+    Compresses the payloads one side of a connection sends, with the
+        algorithm agreed on in the handshake.
+    Payloads under the threshold aren't worth the time, they're sent as is.
+
+    Counts the bytes of every payload before and after, their ratio is
+        what compression saves the connection.
+    """
+    def __init__(self, algorithm: Compression = Compression.NONE,
+                 min_size: int = Compressing.MIN_SIZE):
+        self.algorithm = algorithm
+        self.min_size = min_size
+
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        # Payloads sent compressed
+        self.compressed = 0
+
+    def compress(self, payload: bytes) -> bytes | None:
+        """
+        Returns the payload compressed, None if it isn't compressed.
+        Payloads too large to be framed aren't either,
+            the receiver wouldn't take them decompressed.
+        """
+        if (self.algorithm == Compression.NONE
+                or not self.min_size <= len(payload)
+                <= Framing.MAX_FRAME_SIZE):
+            return None
+        return compress(self.algorithm, payload)
+
+    def count(self, raw_size: int, sent_size: int) -> None:
+        self.raw_bytes += raw_size
+        self.sent_bytes += sent_size
+        if sent_size != raw_size:
+            self.compressed += 1
+
+    def ratio(self) -> float:
+        """
+        Returns the bytes of the payloads over the bytes sent for them.
+        """
+        if not self.sent_bytes:
+            return 1.0
+        return self.raw_bytes / self.sent_bytes
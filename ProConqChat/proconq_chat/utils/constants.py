@@ -1,12 +1,185 @@
+import os
 from pathlib import Path
 
 
 class ServerConstants:
     HOST = '0.0.0.0'
     PORT = 50000
+    # Seconds to flush a closing connection's queued requests
+    CLOSE_TIMEOUT = 5
+
+
+class Framing:
+    # Frames larger than this are rejected by the receiver
+    MAX_FRAME_SIZE: int = 1024 * 1024
+    # How much to read from the socket at once
+    READ_CHUNK_SIZE: int = 64 * 1024
+
+
+class Protocol:
+    # The versions this server speaks, the client picks one in the handshake.
+    # Version 2 added request IDs to the message header,
+    # version 3 replaced AES-CBC with the session cipher,
+    # version 4 replaced the RSA handshake with X25519,
+    # version 5 added session tickets,
+    # version 6 confirms received messages by sequence number,
+    # version 7 added presence subscriptions,
+    # version 8 added messages addressed by username,
+    # version 9 added rooms,
+    # version 10 added server metrics,
+    # version 11 added payload compression.
+    VERSION: int = 11
+    # MessageCodec keeps the schemas of every version from this one on
+    MIN_VERSION: int = 10
+
+
+class Pipelining:
+    # Seconds the writer waits for more requests to batch with the first
+    FLUSH_WINDOW: float = 0.001
+    # Limits of the messages packed into a single frame
+    MAX_BATCH_MESSAGES: int = 64
+    MAX_BATCH_BYTES: int = 64 * 1024
+    # Requests of a single client handled at the same time
+    MAX_PIPELINED_REQUESTS: int = 32
+
+
+class Outbound:
+    # Limits of the requests queued to a client and not written yet,
+    # a client that stops reading fills them
+    MAX_MESSAGES: int = 4096
+    MAX_SIZE: int = 4 * 1024 * 1024
+    # What happens to requests for a client whose queue is full:
+    # 'drop' them, 'disconnect' the client, or 'spill' its messages
+    # to its mailbox and drop the rest
+    SLOW_CONSUMER: str = os.environ.get('PROCONQ_CHAT_SLOW_CONSUMER',
+                                        'spill').lower()
+
+
+class ClientIDs:
+    # IDs are 32 bit on the wire
+    MIN_ID: int = 1
+    MAX_ID: int = 0xFFFFFFFF
+    # Seconds before a released ID is given to another client,
+    # so messages meant for its last owner aren't delivered to the new one
+    REUSE_DELAY: int = 15 * 60
+
+
+class Pending:
+    # Limits of the messages delivered to a client and not confirmed yet,
+    # the size in characters. The oldest are dropped to make room
+    MAX_MESSAGES: int = 1024
+    MAX_SIZE: int = 1024 * 1024
+    # Seconds a message waits for its confirmation
+    LIFETIME: int = 60 * 60
+
+
+class Mail:
+    # Messages of a user's mailbox delivered at once,
+    # the next page follows once they're confirmed
+    PAGE_SIZE: int = 100
+    # Most mailbox writes committed together
+    MAX_BATCH: int = 1024
+
+
+class Polling:
+    # Seconds between the USERS requests of a client, faster polling
+    # is answered at this pace. Subscribing gets every change instead
+    USERS_INTERVAL: float = 1.0
+
+
+class Rooms:
+    # Room names are letters and digits, up to this long
+    MAX_NAME_LENGTH: int = 32
+    # Rooms a single client may be in at once
+    MAX_PER_CLIENT: int = 64
+
+
+class Fanout:
+    # Threads compressing and encrypting the writes of large batches,
+    # zlib and the AES and HMAC backends release the GIL so they run
+    # alongside the event loop
+    WORKERS: int = os.cpu_count() or 1
+    # Batches smaller than this are sealed on the event loop,
+    # handing them to a thread costs more than it saves
+    OFFLOAD_BYTES: int = 16 * 1024
+
+
+class Compressing:
+    # Payloads smaller than this are sent uncompressed,
+    # a chat line doesn't shrink by enough to pay for the time
+    MIN_SIZE: int = 1024
+    # Levels trading speed for size, the libraries' defaults
+    ZLIB_LEVEL: int = 6
+    ZSTD_LEVEL: int = 3
+
+
+class Sharding:
+    # Limits of the messages queued to another worker of a sharded server
+    LINK_MAX_MESSAGES: int = 64 * 1024
+    LINK_MAX_SIZE: int = 64 * 1024 * 1024
+    # Seconds a worker keeps trying to reach the others while they start
+    CONNECT_TIMEOUT: float = 10
+    CONNECT_INTERVAL: float = 0.05
+    # A broken link is reconnected, waiting twice as long after every
+    # failed attempt up to this many seconds
+    MAX_CONNECT_INTERVAL: float = 5
+
+
+class Metrics:
+    # Bucket bounds of the latency histograms, in seconds
+    LATENCY_BUCKETS: tuple = (0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                              0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                              1, 2.5, 5)
+    # Bucket bounds of the queue depth histograms, in requests
+    DEPTH_BUCKETS: tuple = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096)
+    # Bucket bounds of the compression ratio histograms
+    RATIO_BUCKETS: tuple = (1, 1.25, 1.5, 2, 3, 4, 6, 8, 12, 16)
+    # Seconds a scrape of the metrics socket has to send its request
+    SCRAPE_TIMEOUT: float = 1
+
+
+class Tickets:
+    # Seconds a session ticket is valid for after it's issued
+    LIFETIME: int = 12 * 60 * 60
+    # Seconds a logged in client's session is kept after its connection
+    # drops, for it to resume
+    RESUME_WINDOW: int = 10 * 60
+
+
+class Database:
+    # Threads running user database queries, each with its own connection
+    WORKERS: int = 4
+
+
+class Passwords:
+    # bcrypt releases the GIL, so a thread per core hashes in parallel
+    WORKERS: int = os.cpu_count() or 1
+    # Passwords waiting for a worker, more logins wait for room in the queue
+    MAX_PENDING: int = 64
 
 
 class Paths:
     PROJECT_DIR = Path(__file__).resolve().parent.parent
-    LOGGING: Path = PROJECT_DIR / 'logs'
+    # Workers of a sharded server each log to a directory of their own
+    LOGGING: Path = Path(os.environ.get('PROCONQ_CHAT_LOG_DIR',
+                                        PROJECT_DIR / 'logs'))
     DATABASE: Path = PROJECT_DIR / 'src' / 'database' / 'user_database.db'
+    MAILBOX: Path = PROJECT_DIR / 'src' / 'database' / 'mailbox.db'
+    IDENTITY_KEY: Path = PROJECT_DIR / 'keys' / 'server_identity.pem'
+    # Prometheus metrics, workers of a sharded server add their number
+    METRICS: Path = PROJECT_DIR / 'metrics.sock'
+
+
+class Logging:
+    LEVEL: str = os.environ.get('PROCONQ_CHAT_LOG_LEVEL', 'INFO').upper()
+    FORMAT: str = \
+        '%(levelname)s %(asctime)s %(name)s %(funcName)s # %(message)s'
+
+    # Files are rotated when reaching either limit, then compressed
+    MAX_FILE_BYTES: int = 10 * 1024 * 1024
+    MAX_FILE_AGE: int = 24 * 60 * 60
+    # The oldest logs are deleted once the directory exceeds this,
+    # workers of a sharded server split it between their directories
+    QUOTA_BYTES: int = int(os.environ.get('PROCONQ_CHAT_LOG_QUOTA',
+                                          1024 * 1024 * 1024))
+    MAX_OPEN_FILES: int = 64
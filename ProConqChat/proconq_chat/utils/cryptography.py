@@ -1,63 +1,162 @@
-from Crypto.Cipher import AES, PKCS1_OAEP
-from Crypto.PublicKey import RSA
-from Crypto.Util.Padding import pad, unpad
-from Crypto.Random import get_random_bytes
-
-
-class AESCipher:
-    def __init__(self):
-        # Generate a random 32-byte key
-        self.key = get_random_bytes(32)
-        # Generate a random 16-byte IV
-        self.iv = get_random_bytes(16)
-        # Create a cipher object with the key and IV
-        self.cipher = AES.new(key=self.key, mode=AES.MODE_CBC, iv=self.iv)
-
-    def set_key(self, aes_key, aes_iv):
-        # Set the new AES key
-        self.key = aes_key
-        # Set the new IV
-        self.iv = aes_iv
-        # Create a new cipher object with the updated key and IV
-        self.cipher = AES.new(key=self.key, mode=AES.MODE_CBC, iv=self.iv)
-
-    def encrypt(self, data: bytes) -> bytes:
-        # Set the key and IV to ensure consistency
-        self.set_key(self.key, self.iv)
-        # Pad the data to be a multiple of the block size
-        data = pad(data, AES.block_size)
-        # Encrypt the padded data using the AES cipher
-        encrypted_data = self.cipher.encrypt(data)
-        return encrypted_data
-
-    def decrypt(self, data: bytes) -> bytes:
-        # Set the key and IV to ensure consistency
-        self.set_key(self.key, self.iv)
-        # Decrypt the data using the AES cipher
-        decrypted_data = self.cipher.decrypt(data)
-        # Remove padding from the decrypted data
-        unpadded_data = unpad(decrypted_data, AES.block_size)
-        return unpadded_data
-
-
-class RSACipher:
-    def __init__(self):
-        # Generate a new RSA key pair with a key size of 2048 bits
-        self.key = RSA.generate(2048)
-        # Get the public key from the RSA key pair
-        self.public_key = self.key.public_key().export_key()
-
-    def encrypt(self, data: bytes) -> bytes:
-        # Import the public key and create a cipher object
-        cipher_rsa = PKCS1_OAEP.new(RSA.import_key(self.public_key))
-        # Encrypt the data using the RSA public key
-        encrypted_data = cipher_rsa.encrypt(data)
-        return encrypted_data
-
-    def decrypt(self, data: bytes) -> bytes:
-        # Create a cipher object with the RSA private key
-        cipher_rsa = PKCS1_OAEP.new(self.key)
-        # Decrypt the data using the RSA private key
-        decrypted_data = cipher_rsa.decrypt(data)
-        return decrypted_data
+import os
+import hmac
+import struct
+import time
+from pathlib import Path
+
+from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.PublicKey import ECC, RSA
+from Crypto.Signature import eddsa
+from Crypto.Util.Padding import pad, unpad
+from Crypto.Random import get_random_bytes
+
+
+class AESCipher:
+    """
+    The cipher of protocol versions 1 and 2.
+    Only used as the baseline of the cipher benchmark.
+    """
+    def __init__(self):
+        # Generate a random 32-byte key
+        self.key = get_random_bytes(32)
+        # Generate a random 16-byte IV
+        self.iv = get_random_bytes(16)
+        # Create a cipher object with the key and IV
+        self.cipher = AES.new(key=self.key, mode=AES.MODE_CBC, iv=self.iv)
+
+    def set_key(self, aes_key, aes_iv):
+        # Set the new AES key
+        self.key = aes_key
+        # Set the new IV
+        self.iv = aes_iv
+        # Create a new cipher object with the updated key and IV
+        self.cipher = AES.new(key=self.key, mode=AES.MODE_CBC, iv=self.iv)
+
+    def encrypt(self, data: bytes) -> bytes:
+        # Set the key and IV to ensure consistency
+        self.set_key(self.key, self.iv)
+        # Pad the data to be a multiple of the block size
+        data = pad(data, AES.block_size)
+        # Encrypt the padded data using the AES cipher
+        encrypted_data = self.cipher.encrypt(data)
+        return encrypted_data
+
+    def decrypt(self, data: bytes) -> bytes:
+        # Set the key and IV to ensure consistency
+        self.set_key(self.key, self.iv)
+        # Decrypt the data using the AES cipher
+        decrypted_data = self.cipher.decrypt(data)
+        # Remove padding from the decrypted data
+        unpadded_data = unpad(decrypted_data, AES.block_size)
+        return unpadded_data
+
+
+class ServerIdentity:
+    """
+    The server's long-lived Ed25519 key.
+    Signs the key exchange of every connection, so a client can tell
+        it's talking to the same server it talked to before.
+    """
+    def __init__(self, key: ECC.EccKey):
+        self.key = key
+        self.public_key = key.public_key().export_key(format='raw')
+        self.signer = eddsa.new(key, 'rfc8032')
+
+    @staticmethod
+    def load(path: Path) -> 'ServerIdentity':
+        """
+        Loads the key, generates and saves it on the first run.
+        """
+        try:
+            return ServerIdentity(ECC.import_key(path.read_text()))
+        except FileNotFoundError:
+            pass
+
+        identity = ServerIdentity.generate()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Only readable by the user running the server
+        key_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(key_fd, 'w') as key_file:
+            key_file.write(identity.key.export_key(format='PEM'))
+        return identity
+
+    @staticmethod
+    def generate() -> 'ServerIdentity':
+        return ServerIdentity(ECC.generate(curve='ed25519'))
+
+    def sign(self, data: bytes) -> bytes:
+        return self.signer.sign(data)
+
+
+class SessionTickets:
+    """
+    Issues and checks the tickets logged in clients resume their sessions
+        with after reconnecting.
+
+    A ticket is the client's ID, a random nonce and its expiry time,
+        followed by an HMAC-SHA256 tag under the server's ticket key.
+    The key is only kept in memory, a restarted server forgets its
+        sessions anyway.
+    """
+    KEY_SIZE = 32
+    NONCE_SIZE = 16
+    TAG_SIZE = 16
+    body = struct.Struct(f'!{NONCE_SIZE}sIQ')
+
+    def __init__(self, lifetime: int):
+        self.key = get_random_bytes(self.KEY_SIZE)
+        self.lifetime = lifetime
+
+    def issue(self, client_id: int) -> tuple[bytes, bytes]:
+        """
+        Returns the ticket's nonce and the ticket.
+        """
+        nonce = get_random_bytes(self.NONCE_SIZE)
+        body = self.body.pack(nonce, client_id,
+                              int(time.time()) + self.lifetime)
+        tag = hmac.digest(self.key, body, 'sha256')[:self.TAG_SIZE]
+        return nonce, body + tag
+
+    def verify(self, ticket: bytes) -> tuple[int, bytes]:
+        """
+        Returns the client ID and nonce of the ticket.
+        Raises ValueError if the ticket is forged or expired.
+        """
+        if len(ticket) != self.body.size + self.TAG_SIZE:
+            raise ValueError('Bad ticket size')
+        body, tag = ticket[:self.body.size], ticket[self.body.size:]
+        if not hmac.compare_digest(
+                hmac.digest(self.key, body, 'sha256')[:self.TAG_SIZE], tag):
+            raise ValueError('Ticket check failed')
+
+        nonce, client_id, expires = self.body.unpack(body)
+        if expires < time.time():
+            raise ValueError('Ticket expired')
+        return client_id, nonce
+
+
+class RSACipher:
+    """
+    The key exchange of protocol versions 1 to 3.
+    Only used as the baseline of the handshake benchmark.
+    """
+    def __init__(self):
+        # Generate a new RSA key pair with a key size of 2048 bits
+        self.key = RSA.generate(2048)
+        # Get the public key from the RSA key pair
+        self.public_key = self.key.public_key().export_key()
+
+    def encrypt(self, data: bytes) -> bytes:
+        # Import the public key and create a cipher object
+        cipher_rsa = PKCS1_OAEP.new(RSA.import_key(self.public_key))
+        # Encrypt the data using the RSA public key
+        encrypted_data = cipher_rsa.encrypt(data)
+        return encrypted_data
+
+    def decrypt(self, data: bytes) -> bytes:
+        # Create a cipher object with the RSA private key
+        cipher_rsa = PKCS1_OAEP.new(self.key)
+        # Decrypt the data using the RSA private key
+        decrypted_data = cipher_rsa.decrypt(data)
+        return decrypted_data
     
\ No newline at end of file
@@ -1,2 +1,10 @@
 class NoAvailableIDError(Exception):
     pass
+
+
+class FrameTooLargeError(Exception):
+    pass
+
+
+class ProtocolError(Exception):
+    pass
@@ -0,0 +1,102 @@
+import struct
+import asyncio
+from collections import deque
+
+from proconq_chat.utils.constants import Framing
+from proconq_chat.utils.exceptions import FrameTooLargeError
+
+
+class FrameDecoder:
+    """
+    Splits a stream of received bytes into frames.
+
+    A frame is a 4 byte big-endian length followed by that many bytes.
+    Bytes may arrive in any split, several frames in one read
+        or one frame over many reads.
+    """
+    header = struct.Struct('!I')
+
+    def __init__(self, max_frame_size: int = Framing.MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """
+        Adds received bytes, returns the frames they completed.
+        Raises FrameTooLargeError if a frame exceeds the maximum size.
+        """
+        self.buffer += data
+        frames: list[bytes] = []
+
+        offset = 0
+        buffer_size = len(self.buffer)
+        with memoryview(self.buffer) as view:
+            while buffer_size - offset >= self.header.size:
+                (size,) = self.header.unpack_from(view, offset)
+                if size > self.max_frame_size:
+                    raise FrameTooLargeError(
+                        f'Frame of {size} bytes, '
+                        f'maximum is {self.max_frame_size}')
+
+                end = offset + self.header.size + size
+                if end > buffer_size:
+                    break
+                frames.append(bytes(view[offset + self.header.size:end]))
+                offset = end
+
+        # Drop the consumed bytes once, not per frame
+        if offset:
+            del self.buffer[:offset]
+        return frames
+
+
+def encode_frame(payload: bytes,
+                 max_frame_size: int = Framing.MAX_FRAME_SIZE) -> bytes:
+    """
+    Attaches the length header to a payload.
+    """
+    if len(payload) > max_frame_size:
+        raise FrameTooLargeError(
+            f'Frame of {len(payload)} bytes, maximum is {max_frame_size}')
+    return FrameDecoder.header.pack(len(payload)) + payload
+
+
+def frame_buffer(payload_size: int,
+                 max_frame_size: int = Framing.MAX_FRAME_SIZE
+                 ) -> tuple[bytearray, memoryview]:
+    """
+    Allocates a frame for a payload of a known size.
+    Returns the frame, its header already written, and a view of
+        the payload's place in it, to write the payload straight into.
+    """
+    if payload_size > max_frame_size:
+        raise FrameTooLargeError(
+            f'Frame of {payload_size} bytes, maximum is {max_frame_size}')
+
+    frame = bytearray(FrameDecoder.header.size + payload_size)
+    FrameDecoder.header.pack_into(frame, 0, payload_size)
+    return frame, memoryview(frame)[FrameDecoder.header.size:]
+
+
+class AsyncFrameReader:
+    """
+    Reads frames from an asyncio stream, in large chunks.
+    """
+    def __init__(self, reader: asyncio.StreamReader,
+                 max_frame_size: int = Framing.MAX_FRAME_SIZE):
+        self.reader = reader
+        self.decoder = FrameDecoder(max_frame_size)
+        self.frames: deque[bytes] = deque()
+
+    async def read_frame(self) -> bytes:
+        """
+        Returns the next frame.
+        Raises asyncio.IncompleteReadError when the peer disconnects.
+        """
+        while not self.frames:
+            data = await self.reader.read(Framing.READ_CHUNK_SIZE)
+            if not data:
+                raise asyncio.IncompleteReadError(bytes(self.decoder.buffer),
+                                                  None)
+            self.frames.extend(self.decoder.feed(data))
+        return self.frames.popleft()
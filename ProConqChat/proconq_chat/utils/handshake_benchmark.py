@@ -0,0 +1,105 @@
+"""
+Measures the CPU cost of a connection handshake, for the X25519 key
+    exchange and for the RSA one it replaced.
+
+Both sides of the handshake run in this process, one after the other,
+    so handshakes/sec is what a single core could sustain.
+
+Usage: python -m proconq_chat.utils.handshake_benchmark
+"""
+import sys
+import time
+
+from Crypto.Signature import eddsa
+
+from proconq_chat.utils.constants import Protocol
+from proconq_chat.utils.cryptography import (
+    RSACipher,
+    ServerIdentity
+)
+from proconq_common.session_crypto import (
+    KeyExchange,
+    SessionCipher
+)
+
+
+class HandshakeBenchmark:
+    # RSA key generation is slow, it gets fewer rounds
+    x25519_rounds: int = 500
+    rsa_rounds: int = 10
+
+    @staticmethod
+    def x25519_handshake(identity: ServerIdentity) -> tuple[float, float]:
+        """
+        Returns the seconds the server and the client spent on one handshake.
+        """
+        start = time.process_time()
+        server_exchange = KeyExchange()
+        signed = (bytes((Protocol.MIN_VERSION, Protocol.VERSION))
+                  + server_exchange.public_key)
+        signature = identity.sign(signed)
+        server = time.process_time() - start
+
+        # The client checks the signature the way ccui does
+        start = time.process_time()
+        eddsa.new(eddsa.import_public_key(identity.public_key),
+                  'rfc8032').verify(signed, signature)
+        client_exchange = KeyExchange()
+        client_key = client_exchange.derive(server_exchange.public_key,
+                                            is_server=False)
+        SessionCipher(client_key, is_server=False)
+        client = time.process_time() - start
+
+        start = time.process_time()
+        server_key = server_exchange.derive(client_exchange.public_key,
+                                            is_server=True)
+        SessionCipher(server_key, is_server=True)
+        server += time.process_time() - start
+
+        assert server_key == client_key
+        return server, client
+
+    @staticmethod
+    def rsa_handshake() -> tuple[float, float]:
+        """
+        Returns the seconds the server and the client spent on one handshake.
+        """
+        start = time.process_time()
+        server_cipher = RSACipher()
+        server = time.process_time() - start
+
+        start = time.process_time()
+        session_key = SessionCipher.new_key()
+        encrypted_key = server_cipher.encrypt(session_key)
+        client = time.process_time() - start
+
+        start = time.process_time()
+        server_cipher.decrypt(encrypted_key)
+        server += time.process_time() - start
+
+        return server, client
+
+    @staticmethod
+    def report(name: str, results: list[tuple[float, float]]) -> None:
+        server = sum(result[0] for result in results) / len(results)
+        client = sum(result[1] for result in results) / len(results)
+        print(f'{name:<8} server {server * 1000:8.3f}ms '
+              f'client {client * 1000:8.3f}ms '
+              f'server handshakes/sec {1 / server:10.1f}')
+
+
+def main() -> int:
+    identity = ServerIdentity.generate()
+
+    results = [HandshakeBenchmark.x25519_handshake(identity)
+               for _ in range(HandshakeBenchmark.x25519_rounds)]
+    HandshakeBenchmark.report('x25519', results)
+
+    results = [HandshakeBenchmark.rsa_handshake()
+               for _ in range(HandshakeBenchmark.rsa_rounds)]
+    HandshakeBenchmark.report('rsa', results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
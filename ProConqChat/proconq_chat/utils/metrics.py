@@ -0,0 +1,153 @@
+import bisect
+import math
+import threading
+from typing import Callable
+
+
+class Counter:
+    """
+    A count that only goes up, safe to increment from any thread.
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+    def samples(self) -> list[tuple[str, float]]:
+        return [(self.name, self.value)]
+
+
+class Gauge:
+    """
+    A value read from the server when the metrics are exported,
+        it costs nothing in between.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str,
+                 function: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+
+    def samples(self) -> list[tuple[str, float]]:
+        return [(self.name, self.function())]
+
+
+class Histogram:
+    """
+    Counts of observed values by the bucket they fall in,
+        safe to observe from any thread.
+    buckets are the buckets' upper bounds, in increasing order.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # The last count is of the values above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Returns the upper bound of the bucket the quantile falls in,
+            inf if it's above every bound.
+        """
+        with self.lock:
+            counts, count = list(self.counts), self.count
+        rank = max(math.ceil(fraction * count), 1)
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def samples(self) -> list[tuple[str, float]]:
+        """
+        Returns the cumulative bucket counts, like Prometheus expects.
+        """
+        with self.lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            samples.append((f'{self.name}_bucket{{le="{bound}"}}',
+                            cumulative))
+        samples += [(f'{self.name}_bucket{{le="+Inf"}}', count),
+                    (f'{self.name}_sum', total),
+                    (f'{self.name}_count', count)]
+        return samples
+
+
+class MetricsRegistry:
+    """
+    The metrics of a process, exported together.
+    Registering a name again replaces the metric.
+    """
+    def __init__(self):
+        self.metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.add(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str,
+              function: Callable[[], float]) -> Gauge:
+        return self.add(Gauge(name, help_text, function))
+
+    def histogram(self, name: str, help_text: str,
+                  buckets: tuple) -> Histogram:
+        return self.add(Histogram(name, help_text, buckets))
+
+    def add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def summary(self) -> list[tuple[str, str]]:
+        """
+        Returns (name, value) pairs, histograms as their count, sum,
+            p50 and p99.
+        """
+        pairs = []
+        for metric in self.metrics.values():
+            if isinstance(metric, Histogram):
+                pairs += [(f'{metric.name}_count', str(metric.count)),
+                          (f'{metric.name}_sum', f'{metric.sum:.6g}'),
+                          (f'{metric.name}_p50', str(metric.quantile(0.5))),
+                          (f'{metric.name}_p99', str(metric.quantile(0.99)))]
+            else:
+                pairs += [(name, f'{value:.6g}')
+                          for name, value in metric.samples()]
+        return pairs
+
+    def prometheus(self) -> str:
+        """
+        Returns the metrics in the Prometheus text format.
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines += [f'# HELP {metric.name} {metric.help_text}',
+                      f'# TYPE {metric.name} {metric.kind}']
+            lines += [f'{name} {value:.17g}'
+                      for name, value in metric.samples()]
+        return '\n'.join(lines) + '\n'
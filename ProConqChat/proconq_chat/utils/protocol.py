@@ -0,0 +1,479 @@
+import struct
+from enum import IntEnum
+from typing import Any, Callable, Iterator
+
+from proconq_chat.utils.compressor import (
+    Compressor,
+    decompress
+)
+from proconq_chat.utils.constants import (
+    Pipelining,
+    Protocol
+)
+from proconq_chat.utils.exceptions import ProtocolError
+
+
+class Opcode(IntEnum):
+    """
+    The first byte of every message.
+    Values are part of the wire format, never renumber them.
+    """
+    PUBKEY = 1
+    AESKEY = 2
+    AESCONF = 3
+    USERS = 4
+    USERSCONF = 5
+    LOGIN = 6
+    LOGINCONF = 7
+    REGSTR = 8
+    REGSTRCONF = 9
+    GETID = 10
+    GETIDCONF = 11
+    SNDMSG = 12
+    SNDMSGCONF = 13
+    RCVDMSG = 14
+    RCVDMSGCONF = 15
+    BUFFER = 16
+    BUFFERCONF = 17
+    DATABASE = 18
+    DATABASECONF = 19
+    DELUSER = 20
+    DELUSERCONF = 21
+    LOGGEDOUT = 22
+    BATCH = 23
+    RESUME = 24
+    RESUMECONF = 25
+    SUBSCRIBE = 26
+    SUBSCRIBECONF = 27
+    PRESENCE = 28
+    SNDNAME = 29
+    SNDNAMECONF = 30
+    JOIN = 31
+    JOINCONF = 32
+    LEAVE = 33
+    LEAVECONF = 34
+    PUBLISH = 35
+    PUBLISHCONF = 36
+    ROOMMSG = 37
+    ROOMS = 38
+    ROOMSCONF = 39
+    STATS = 40
+    STATSCONF = 41
+    COMPRESSED = 42
+
+
+class Presence(IntEnum):
+    """
+    The kinds of changes of the online users a PRESENCE message tells of.
+    Values are part of the wire format, never renumber them.
+    """
+    JOIN = 1
+    LEAVE = 2
+    RENAME = 3
+
+
+class Field:
+    """
+    The types of message fields.
+    A tuple of field types is a repeated group,
+        sent as a count followed by the items.
+    """
+    U8 = 'u8'
+    U32 = 'u32'
+    BYTES = 'bytes'
+    STR = 'str'
+
+
+class MessageCodec:
+    """
+    Encodes and decodes messages: an opcode and a request ID,
+        followed by the opcode's fields.
+
+    Integers are big-endian, bytes and strings are prefixed by their length.
+    Decoded bytes fields are views of the received buffer, not copies.
+
+    Messages are encoded and decoded with the schemas of the version
+        agreed on in the handshake. Older versions still spoken only
+        lack fields added at the end of a message: they're left out when
+        sending to an older peer, and the handler's defaults stand in
+        for them when receiving from one.
+
+    A response carries the ID of its request, so responses can be matched
+        in any order. Messages the server sends unprompted carry ID 0.
+    """
+    header = struct.Struct('!BI')
+    u8 = struct.Struct('!B')
+    u32 = struct.Struct('!I')
+
+    schemas: dict[Opcode, tuple] = {
+        # min version, max version, identity key, exchange key, signature
+        # The same in every version, it's read before one is agreed on
+        Opcode.PUBKEY: (Field.U8, Field.U8, Field.BYTES, Field.BYTES,
+                        Field.BYTES),
+        # chosen version, exchange key, compressions the client can use,
+        #     the preferred first
+        # Read with the schema of the version it names
+        Opcode.AESKEY: (Field.U8, Field.BYTES, (Field.U8,)),
+        # version, chosen compression
+        Opcode.AESCONF: (Field.U8, Field.U8),
+        Opcode.USERS: (),
+        # (name, id) of every online client
+        Opcode.USERSCONF: ((Field.STR, Field.U32),),
+        Opcode.LOGIN: (Field.STR, Field.STR),
+        # status, session ticket
+        Opcode.LOGINCONF: (Field.U8, Field.BYTES),
+        Opcode.REGSTR: (Field.STR, Field.STR),
+        Opcode.REGSTRCONF: (Field.U8,),
+        Opcode.GETID: (),
+        Opcode.GETIDCONF: (Field.U32,),
+        # target id, message
+        Opcode.SNDMSG: (Field.U32, Field.STR),
+        Opcode.SNDMSGCONF: (Field.U8, Field.U32),
+        # sender id, sequence, message
+        Opcode.RCVDMSG: (Field.U32, Field.U32, Field.STR),
+        # sequence
+        Opcode.RCVDMSGCONF: (Field.U32,),
+        Opcode.BUFFER: (),
+        # (target id, message) of every unconfirmed message
+        Opcode.BUFFERCONF: ((Field.U32, Field.STR),),
+        Opcode.DATABASE: (),
+        # status, (name, password hash) of every user
+        Opcode.DATABASECONF: (Field.U8, (Field.STR, Field.STR)),
+        Opcode.DELUSER: (Field.STR,),
+        Opcode.DELUSERCONF: (Field.U8, Field.STR),
+        Opcode.LOGGEDOUT: (),
+        # Several messages sent in one frame
+        Opcode.BATCH: ((Field.BYTES,),),
+        # session ticket
+        Opcode.RESUME: (Field.BYTES,),
+        # status, name, id, new session ticket
+        Opcode.RESUMECONF: (Field.U8, Field.STR, Field.U32, Field.BYTES),
+        Opcode.SUBSCRIBE: (),
+        # (name, id) of every online client, changes follow
+        Opcode.SUBSCRIBECONF: ((Field.STR, Field.U32),),
+        # presence, id, name
+        Opcode.PRESENCE: (Field.U8, Field.U32, Field.STR),
+        # target name, message
+        Opcode.SNDNAME: (Field.STR, Field.STR),
+        Opcode.SNDNAMECONF: (Field.U8, Field.STR),
+        # room
+        Opcode.JOIN: (Field.STR,),
+        # status, room, members
+        Opcode.JOINCONF: (Field.U8, Field.STR, Field.U32),
+        Opcode.LEAVE: (Field.STR,),
+        Opcode.LEAVECONF: (Field.U8, Field.STR),
+        # room, message
+        Opcode.PUBLISH: (Field.STR, Field.STR),
+        # status, room, recipients
+        Opcode.PUBLISHCONF: (Field.U8, Field.STR, Field.U32),
+        # room, sender id, message
+        Opcode.ROOMMSG: (Field.STR, Field.U32, Field.STR),
+        Opcode.ROOMS: (),
+        # (name, members, published, delivered, delivered in the last
+        #     second) of every room
+        Opcode.ROOMSCONF: ((Field.STR, Field.U32, Field.U32, Field.U32,
+                            Field.U32),),
+        Opcode.STATS: (),
+        # status, (name, value) of every metric
+        Opcode.STATSCONF: (Field.U8, (Field.STR, Field.STR)),
+        # A payload compressed, a message or a batch:
+        #     compression, decompressed size, data
+        Opcode.COMPRESSED: (Field.U8, Field.U32, Field.BYTES),
+    }
+
+    # The schemas of the older versions still spoken, where they differ
+    legacy_schemas: dict[int, dict[Opcode, tuple]] = {
+        # Before payload compression
+        10: {
+            Opcode.AESKEY: (Field.U8, Field.BYTES),
+            Opcode.AESCONF: (Field.U8,),
+        },
+    }
+
+    # The version that added each opcode an older version still spoken
+    #     lacks
+    introduced: dict[Opcode, int] = {
+        Opcode.COMPRESSED: 11,
+    }
+
+    # The response each request is answered with.
+    # SNDMSG, SNDNAME and RCVDMSGCONF are missing, they're answered only
+    #     on failure or not at all.
+    responses: dict[Opcode, Opcode] = {
+        Opcode.AESKEY: Opcode.AESCONF,
+        Opcode.USERS: Opcode.USERSCONF,
+        Opcode.LOGIN: Opcode.LOGINCONF,
+        Opcode.REGSTR: Opcode.REGSTRCONF,
+        Opcode.GETID: Opcode.GETIDCONF,
+        Opcode.BUFFER: Opcode.BUFFERCONF,
+        Opcode.DATABASE: Opcode.DATABASECONF,
+        Opcode.DELUSER: Opcode.DELUSERCONF,
+        Opcode.RESUME: Opcode.RESUMECONF,
+        Opcode.SUBSCRIBE: Opcode.SUBSCRIBECONF,
+        Opcode.JOIN: Opcode.JOINCONF,
+        Opcode.LEAVE: Opcode.LEAVECONF,
+        Opcode.PUBLISH: Opcode.PUBLISHCONF,
+        Opcode.ROOMS: Opcode.ROOMSCONF,
+        Opcode.STATS: Opcode.STATSCONF,
+    }
+
+    @staticmethod
+    def schema(opcode: Opcode, version: int) -> tuple:
+        """
+        Returns the opcode's schema in a protocol version.
+        Raises ProtocolError if the version doesn't have the opcode.
+        """
+        if version < MessageCodec.introduced.get(opcode, 0):
+            raise ProtocolError(f'{opcode.name} is not part of '
+                                f'protocol version {version}')
+        return MessageCodec.legacy_schemas.get(version, {}).get(
+            opcode, MessageCodec.schemas[opcode])
+
+    @staticmethod
+    def encode(opcode: Opcode, *fields: Any, request_id: int = 0,
+               version: int = Protocol.VERSION) -> bytes:
+        """
+        Raises ProtocolError if the fields don't match the opcode's schema.
+        """
+        schema = MessageCodec.schema(opcode, version)
+        if version != Protocol.VERSION:
+            # The fields added since the peer's version
+            fields = fields[:len(schema)]
+        parts = [MessageCodec.header.pack(opcode, request_id)]
+        try:
+            MessageCodec.encode_fields(parts, schema, fields)
+        except (struct.error, TypeError, AttributeError) as err:
+            raise ProtocolError(f'Bad fields for {opcode.name}: {err}')
+        return b''.join(parts)
+
+    @staticmethod
+    def with_request_id(message: bytes, request_id: int) -> bytes:
+        """
+        Returns an encoded message with its request ID replaced,
+            so a message encoded once can answer many requests.
+        """
+        return (MessageCodec.header.pack(message[0], request_id)
+                + message[MessageCodec.header.size:])
+
+    @staticmethod
+    def encode_fields(parts: list[bytes], schema: tuple,
+                      fields: tuple) -> None:
+        if len(fields) != len(schema):
+            raise TypeError(f'expected {len(schema)} fields, '
+                            f'got {len(fields)}')
+
+        for field_type, value in zip(schema, fields):
+            if field_type == Field.U8:
+                parts.append(MessageCodec.u8.pack(value))
+            elif field_type == Field.U32:
+                parts.append(MessageCodec.u32.pack(value))
+            elif field_type == Field.STR:
+                value = value.encode()
+                parts += (MessageCodec.u32.pack(len(value)), value)
+            elif field_type == Field.BYTES:
+                parts += (MessageCodec.u32.pack(len(value)), value)
+            else:
+                parts.append(MessageCodec.u32.pack(len(value)))
+                for item in value:
+                    MessageCodec.encode_fields(parts, field_type, item)
+
+    @staticmethod
+    def encode_batch(messages: list[bytes]) -> bytes:
+        """
+        Wraps encoded messages in one BATCH message.
+        A lone message is returned as is.
+        """
+        if len(messages) == 1:
+            return messages[0]
+        return MessageCodec.encode(Opcode.BATCH,
+                                   [(message,) for message in messages])
+
+    @staticmethod
+    def groups(messages: list[bytes],
+               max_messages: int = Pipelining.MAX_BATCH_MESSAGES,
+               max_bytes: int = Pipelining.MAX_BATCH_BYTES
+               ) -> Iterator[list[bytes]]:
+        """
+        Splits encoded messages into as few batches as the limits allow.
+        A message larger than max_bytes is a batch of its own.
+        """
+        batch: list[bytes] = []
+        batch_size = 0
+        for message in messages:
+            if batch and (len(batch) == max_messages
+                          or batch_size + len(message) > max_bytes):
+                yield batch
+                batch = []
+                batch_size = 0
+            batch.append(message)
+            batch_size += len(message)
+
+        if batch:
+            yield batch
+
+    @staticmethod
+    def batches(messages: list[bytes],
+                max_messages: int = Pipelining.MAX_BATCH_MESSAGES,
+                max_bytes: int = Pipelining.MAX_BATCH_BYTES
+                ) -> Iterator[bytes]:
+        """
+        Packs encoded messages into as few payloads as the limits allow.
+        """
+        for batch in MessageCodec.groups(messages, max_messages, max_bytes):
+            yield MessageCodec.encode_batch(batch)
+
+    @staticmethod
+    def compress(payload: bytes, compressor: Compressor) -> bytes:
+        """
+        Wraps a payload in a COMPRESSED message, if that makes it smaller.
+        Names the compression, so the peer can read it before it knows
+            which one was agreed on.
+        """
+        raw_size = len(payload)
+        compressed = compressor.compress(payload)
+        if compressed is not None:
+            message = MessageCodec.encode(Opcode.COMPRESSED,
+                                          compressor.algorithm, raw_size,
+                                          compressed)
+            # Data that doesn't compress is sent as it is
+            if len(message) < raw_size:
+                payload = message
+        compressor.count(raw_size, len(payload))
+        return payload
+
+    @staticmethod
+    def decode(payload: bytes,
+               version: int = Protocol.VERSION) -> tuple[Opcode, int, list]:
+        """
+        Returns the opcode, request ID and fields of a message.
+        Raises ProtocolError if the message is malformed.
+        """
+        view = memoryview(payload)
+        try:
+            raw_opcode, request_id = MessageCodec.header.unpack_from(view)
+            opcode = Opcode(raw_opcode)
+        except (struct.error, ValueError):
+            raise ProtocolError('Unknown opcode')
+
+        # No version is agreed on before AESKEY, it names its own
+        if opcode == Opcode.AESKEY and len(view) > MessageCodec.header.size:
+            version = view[MessageCodec.header.size]
+        schema = MessageCodec.schema(opcode, version)
+        try:
+            fields, offset = MessageCodec.decode_fields(
+                view, MessageCodec.header.size, schema)
+        except (struct.error, UnicodeDecodeError) as err:
+            raise ProtocolError(f'Malformed {opcode.name}: {err}')
+
+        if offset != len(view):
+            raise ProtocolError(f'Malformed {opcode.name}: trailing bytes')
+        return opcode, request_id, fields
+
+    @staticmethod
+    def decode_batch(payload: bytes, version: int = Protocol.VERSION
+                     ) -> list[tuple[Opcode, int, list]]:
+        """
+        Returns the messages of a payload, whether it's a batch or not,
+            compressed or not.
+        Raises ProtocolError if a message is malformed.
+        """
+        opcode, request_id, fields = MessageCodec.decode(payload, version)
+        if opcode == Opcode.COMPRESSED:
+            opcode, request_id, fields = MessageCodec.decode(
+                MessageCodec.decompress(*fields), version)
+            if opcode == Opcode.COMPRESSED:
+                raise ProtocolError('Nested COMPRESSED')
+        if opcode != Opcode.BATCH:
+            return [(opcode, request_id, fields)]
+
+        messages = []
+        for (message,) in fields[0]:
+            message = MessageCodec.decode(message, version)
+            if message[0] in (Opcode.BATCH, Opcode.COMPRESSED):
+                raise ProtocolError(f'Nested {message[0].name}')
+            messages.append(message)
+        return messages
+
+    @staticmethod
+    def decompress(algorithm: int, size: int, data: memoryview) -> bytes:
+        """
+        Raises ProtocolError if the payload can't be decompressed.
+        """
+        try:
+            return decompress(algorithm, data, size)
+        except ValueError as err:
+            raise ProtocolError(f'Malformed COMPRESSED: {err}')
+
+    @staticmethod
+    def decode_fields(view: memoryview, offset: int,
+                      schema: tuple) -> tuple[list, int]:
+        """
+        Returns the fields and the offset after them.
+        """
+        fields = []
+        for field_type in schema:
+            if field_type == Field.U8:
+                (value,) = MessageCodec.u8.unpack_from(view, offset)
+                offset += MessageCodec.u8.size
+            elif field_type == Field.U32:
+                (value,) = MessageCodec.u32.unpack_from(view, offset)
+                offset += MessageCodec.u32.size
+            elif field_type in (Field.STR, Field.BYTES):
+                (size,) = MessageCodec.u32.unpack_from(view, offset)
+                offset += MessageCodec.u32.size
+                if offset + size > len(view):
+                    raise struct.error('field exceeds the message')
+                value = view[offset:offset + size]
+                if field_type == Field.STR:
+                    value = str(value, 'utf-8')
+                offset += size
+            else:
+                (count,) = MessageCodec.u32.unpack_from(view, offset)
+                offset += MessageCodec.u32.size
+                # Every item takes at least a byte, a larger count is a lie
+                if count > len(view) - offset:
+                    raise struct.error('group exceeds the message')
+                value = []
+                for _ in range(count):
+                    item, offset = MessageCodec.decode_fields(
+                        view, offset, field_type)
+                    value.append(tuple(item))
+            fields.append(value)
+        return fields, offset
+
+
+def handles(opcode: Opcode) -> Callable:
+    """
+    Marks a method as the handler of an opcode.
+    """
+    def mark(method: Callable) -> Callable:
+        method.opcode = opcode
+        return method
+    return mark
+
+
+class Dispatcher:
+    """
+    Base of the protocol endpoints.
+
+    The handlers are collected once, when the class is created.
+    Only methods marked with @handles can be reached by the peer.
+    """
+    handlers: dict[Opcode, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.handlers = dict(cls.handlers)
+        for attribute in vars(cls).values():
+            opcode = getattr(attribute, 'opcode', None)
+            if opcode is not None:
+                cls.handlers[opcode] = attribute
+
+    def get_handler(self, opcode: Opcode) -> Callable:
+        """
+        Raises ProtocolError if this endpoint doesn't handle the opcode.
+        """
+        try:
+            return self.handlers[opcode]
+        except KeyError:
+            raise ProtocolError(f'Unexpected opcode {opcode.name}')
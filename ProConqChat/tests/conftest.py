@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The packages are imported the way python -m runs them, from this project
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# And the code they share, the way their __init__.py finds it
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'ProConqCommon'))
+# Logging starts on import, it shouldn't write to the project's logs
+os.environ.setdefault('PROCONQ_CHAT_LOG_DIR',
+                      tempfile.mkdtemp(prefix='proconq_chat-tests-'))
@@ -0,0 +1,66 @@
+import pytest
+
+from proconq_chat.src.server import ClientHandler
+from proconq_chat.utils.compressor import Compressor
+from proconq_chat.utils.constants import Framing
+from proconq_chat.utils.exceptions import ProtocolError
+from proconq_chat.utils.framing import FrameDecoder
+from proconq_chat.utils.protocol import (
+    MessageCodec,
+    Opcode
+)
+from proconq_common.session_crypto import SessionCipher
+
+
+def test_batches():
+    messages = [MessageCodec.encode(Opcode.GETIDCONF, number)
+                for number in range(10)]
+    payloads = list(MessageCodec.batches(messages, max_messages=4))
+    assert len(payloads) == 3
+
+    decoded = [fields[0]
+               for payload in payloads
+               for _, _, fields in MessageCodec.decode_batch(payload)]
+    assert decoded == list(range(10))
+
+    # A lone message isn't wrapped
+    assert list(MessageCodec.batches(messages[:1])) == messages[:1]
+
+
+def test_nested_batch():
+    batch = MessageCodec.encode_batch([MessageCodec.encode(Opcode.GETID)] * 2)
+    with pytest.raises(ProtocolError):
+        MessageCodec.decode_batch(MessageCodec.encode_batch([batch, batch]))
+
+
+def test_groups():
+    messages = [b'a' * 10] * 5 + [b'b' * 100] + [b'c' * 10] * 2
+    groups = list(MessageCodec.groups(messages, max_messages=3,
+                                      max_bytes=50))
+    assert groups == [messages[:3], messages[3:5], messages[5:6],
+                      messages[6:]]
+
+
+def test_seal_splits_large_batch():
+    handler = ClientHandler.__new__(ClientHandler)
+    handler.compressor = Compressor()
+    handler.session_cipher = SessionCipher(bytes(32), is_server=True)
+    client = SessionCipher(bytes(32), is_server=False)
+
+    part = Framing.MAX_FRAME_SIZE // 3
+    messages = [MessageCodec.encode(Opcode.RCVDMSG, 1, number, 'a' * part)
+                for number in range(4)]
+    too_large = MessageCodec.encode(Opcode.RCVDMSG, 1, 4,
+                                    'a' * Framing.MAX_FRAME_SIZE)
+    frames, rejected = handler.seal([messages + [too_large]])
+
+    # Split until the parts fit a frame, the lone message that
+    # doesn't is all that's left out
+    assert rejected == [too_large]
+    assert len(frames) == 3
+    payloads = [client.decrypt(bytes(frame[FrameDecoder.header.size:]))
+                for frame in frames]
+    sequences = [fields[1]
+                 for payload in payloads
+                 for _, _, fields in MessageCodec.decode_batch(payload)]
+    assert sequences == list(range(4))
@@ -0,0 +1,72 @@
+import pytest
+
+from proconq_common.session_crypto import SessionCipher
+
+
+@pytest.fixture
+def ciphers() -> tuple[SessionCipher, SessionCipher]:
+    session_key = SessionCipher.new_key()
+    return (SessionCipher(session_key, is_server=True),
+            SessionCipher(session_key, is_server=False))
+
+
+def test_both_directions(ciphers):
+    server, client = ciphers
+    for number in range(3):
+        message = f'message {number}'.encode()
+        assert client.decrypt(server.encrypt(message)) == message
+        assert server.decrypt(client.encrypt(message)) == message
+
+
+def test_directions_use_their_own_keys(ciphers):
+    server, client = ciphers
+    # A message reflected back to its sender doesn't pass
+    with pytest.raises(ValueError):
+        server.decrypt(server.encrypt(b'hello'))
+
+
+def test_tampered(ciphers):
+    server, client = ciphers
+    sealed = server.encrypt(b'hello')
+    for index in (0, len(sealed) - 1):
+        tampered = bytearray(sealed)
+        tampered[index] ^= 1
+        with pytest.raises(ValueError):
+            client.decrypt(tampered)
+    # Rejected messages don't advance the sequence
+    assert client.decrypt(sealed) == b'hello'
+
+
+def test_replayed_and_reordered(ciphers):
+    server, client = ciphers
+    first = server.encrypt(b'first')
+    second = server.encrypt(b'second')
+
+    with pytest.raises(ValueError):
+        client.decrypt(second)
+    assert client.decrypt(first) == b'first'
+    with pytest.raises(ValueError):
+        client.decrypt(first)
+    assert client.decrypt(second) == b'second'
+
+
+def test_shorter_than_tag(ciphers):
+    with pytest.raises(ValueError):
+        ciphers[1].decrypt(b'short')
+
+
+def test_bad_session_key():
+    with pytest.raises(ValueError):
+        SessionCipher(b'short', is_server=True)
+
+
+def test_sequence_is_the_nonce():
+    session_key = SessionCipher.new_key()
+    server = SessionCipher(session_key, is_server=True)
+    # The same message sealed twice doesn't repeat its ciphertext
+    assert server.encrypt(b'hello') != server.encrypt(b'hello')
+
+    sealed = server.encrypt(b'hello')
+    aead = SessionCipher.new_aead(session_key, b'server')
+    assert aead.decrypt(SessionCipher.nonce.pack(2), bytes(sealed),
+                        None) == b'hello'
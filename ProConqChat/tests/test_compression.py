@@ -0,0 +1,43 @@
+import pytest
+
+from proconq_chat.utils.compressor import (
+    Compression,
+    Compressor,
+    available
+)
+from proconq_chat.utils.exceptions import ProtocolError
+from proconq_chat.utils.protocol import (
+    MessageCodec,
+    Opcode
+)
+
+
+@pytest.mark.parametrize('algorithm', available())
+def test_compressed(algorithm):
+    compressor = Compressor(algorithm, min_size=0)
+    messages = [MessageCodec.encode(Opcode.RCVDMSG, 1, number, 'a' * 100)
+                for number in range(50)]
+    payload = MessageCodec.compress(MessageCodec.encode_batch(messages),
+                                    compressor)
+    assert payload[0] == Opcode.COMPRESSED
+    assert compressor.ratio() > 1
+
+    decoded = MessageCodec.decode_batch(payload)
+    assert [fields[1] for _, _, fields in decoded] == list(range(50))
+
+
+def test_incompressible_sent_as_is():
+    compressor = Compressor(Compression.ZLIB, min_size=0)
+    message = MessageCodec.encode(Opcode.RESUME, bytes(range(256)))
+    assert MessageCodec.compress(message, compressor) == message
+
+
+def test_lying_compressed_size():
+    compressor = Compressor(Compression.ZLIB, min_size=0)
+    payload = MessageCodec.compress(
+        MessageCodec.encode(Opcode.DELUSER, 'a' * 1000), compressor)
+    _, _, (algorithm, size, data) = MessageCodec.decode(payload)
+    for wrong_size in (size - 1, size + 1):
+        with pytest.raises(ProtocolError):
+            MessageCodec.decode_batch(MessageCodec.encode(
+                Opcode.COMPRESSED, algorithm, wrong_size, data))
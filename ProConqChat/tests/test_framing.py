@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from proconq_chat.utils.exceptions import FrameTooLargeError
+from proconq_chat.utils.framing import (
+    AsyncFrameReader,
+    FrameDecoder,
+    encode_frame,
+    frame_buffer
+)
+
+
+def test_frames_split_anywhere():
+    payloads = [b'', b'a', b'hello' * 100, bytes(range(256))]
+    stream = b''.join(map(encode_frame, payloads))
+
+    for chunk_size in (1, 3, 7, len(stream)):
+        decoder = FrameDecoder()
+        frames = []
+        for start in range(0, len(stream), chunk_size):
+            frames += decoder.feed(stream[start:start + chunk_size])
+        assert frames == payloads
+        assert not decoder.buffer
+
+
+def test_partial_frame_waits():
+    decoder = FrameDecoder()
+    frame = encode_frame(b'payload')
+    assert decoder.feed(frame[:-1]) == []
+    assert decoder.feed(frame[-1:]) == [b'payload']
+
+
+def test_frame_too_large():
+    with pytest.raises(FrameTooLargeError):
+        encode_frame(b'x' * 11, max_frame_size=10)
+    with pytest.raises(FrameTooLargeError):
+        frame_buffer(11, max_frame_size=10)
+    # Rejected from the header, before the payload arrives
+    with pytest.raises(FrameTooLargeError):
+        FrameDecoder(max_frame_size=10).feed(
+            FrameDecoder.header.pack(11))
+
+
+def test_frame_buffer():
+    frame, payload = frame_buffer(5)
+    payload[:] = b'hello'
+    assert bytes(frame) == encode_frame(b'hello')
+
+
+def test_async_reader():
+    async def read() -> tuple[list[bytes], bytes]:
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_frame(b'one') + encode_frame(b'two'))
+        reader.feed_data(encode_frame(b'three')[:4])
+        reader.feed_eof()
+
+        frame_reader = AsyncFrameReader(reader)
+        frames = [await frame_reader.read_frame() for _ in range(2)]
+        with pytest.raises(asyncio.IncompleteReadError) as err:
+            await frame_reader.read_frame()
+        return frames, err.value.partial
+
+    frames, partial = asyncio.run(read())
+    assert frames == [b'one', b'two']
+    assert partial == encode_frame(b'three')[:4]
@@ -0,0 +1,88 @@
+import pytest
+
+from ccui.utils.cryptography import (
+    KnownServers,
+    ServerIdentity as ClientIdentity
+)
+from proconq_chat.utils.constants import Protocol
+from proconq_chat.utils.cryptography import ServerIdentity
+from proconq_common.session_crypto import (
+    KeyExchange,
+    SessionCipher,
+    fingerprint
+)
+
+
+def test_handshake():
+    identity = ServerIdentity.generate()
+    server_exchange = KeyExchange()
+    signed = (bytes((Protocol.MIN_VERSION, Protocol.VERSION))
+              + server_exchange.public_key)
+    signature = identity.sign(signed)
+
+    # What the client does with the server's PUBKEY
+    ClientIdentity.verify(identity.public_key, signed, signature)
+    client_exchange = KeyExchange()
+    client_key = client_exchange.derive(server_exchange.public_key,
+                                        is_server=False)
+    server_key = server_exchange.derive(client_exchange.public_key,
+                                        is_server=True)
+    assert client_key == server_key
+
+    server = SessionCipher(server_key, is_server=True)
+    client = SessionCipher(client_key, is_server=False)
+    assert server.decrypt(client.encrypt(b'hello')) == b'hello'
+
+
+def test_forged_signature():
+    identity = ServerIdentity.generate()
+    signed = (bytes((Protocol.MIN_VERSION, Protocol.VERSION))
+              + KeyExchange().public_key)
+    signature = identity.sign(signed)
+
+    with pytest.raises(ValueError):
+        # A downgraded version range
+        downgraded = bytes((Protocol.VERSION, Protocol.VERSION)) + signed[2:]
+        ClientIdentity.verify(identity.public_key, downgraded, signature)
+    with pytest.raises(ValueError):
+        ClientIdentity.verify(ServerIdentity.generate().public_key, signed,
+                              signature)
+
+
+def test_bad_exchange_key():
+    with pytest.raises(ValueError):
+        KeyExchange().derive(b'\x00' * 5, is_server=True)
+
+
+def test_identity_saved(tmp_path):
+    path = tmp_path / 'keys' / 'identity.pem'
+    identity = ServerIdentity.load(path)
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert ServerIdentity.load(path).public_key == identity.public_key
+
+
+def test_known_servers(tmp_path):
+    path = tmp_path / 'known_servers'
+    identity = fingerprint(ServerIdentity.generate().public_key)
+    other = fingerprint(ServerIdentity.generate().public_key)
+
+    known_servers = KnownServers(path)
+    # Trusted on first use, then pinned
+    assert known_servers.check('localhost:9000', identity)
+    assert not known_servers.check('localhost:9000', identity)
+    assert known_servers.check('localhost:9001', other)
+
+    # Another client reads the pins from the file
+    with pytest.raises(ValueError):
+        KnownServers(path).check('localhost:9000', other)
+
+
+def test_configured_fingerprint(tmp_path):
+    path = tmp_path / 'known_servers'
+    identity = fingerprint(ServerIdentity.generate().public_key)
+    path.write_text(f'localhost:9000 {identity.upper()}\n')
+
+    assert not KnownServers(path).check('localhost:9000', identity)
+    with pytest.raises(ValueError):
+        KnownServers(path).check(
+            'localhost:9000', fingerprint(KeyExchange().public_key))
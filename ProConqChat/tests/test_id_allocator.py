@@ -0,0 +1,27 @@
+import time
+
+import pytest
+
+from proconq_chat.src.id_allocator import IDAllocator
+from proconq_chat.utils.exceptions import NoAvailableIDError
+
+
+def test_ids_unique_and_random():
+    allocator = IDAllocator(1, 0xFFFFFFFF, reuse_delay=60)
+    ids = [allocator.allocate() for _ in range(1000)]
+    assert len(set(ids)) == len(ids)
+    assert ids != sorted(ids)
+
+
+def test_ids_reused_after_delay():
+    allocator = IDAllocator(1, 2, reuse_delay=0.01)
+    first, second = allocator.allocate(), allocator.allocate()
+    assert {first, second} == {1, 2}
+    with pytest.raises(NoAvailableIDError):
+        allocator.allocate()
+
+    allocator.release(first)
+    with pytest.raises(NoAvailableIDError):
+        allocator.allocate()
+    time.sleep(0.02)
+    assert allocator.allocate() == first
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from proconq_chat.src.database.mailbox import Mailbox
+
+
+@pytest.fixture
+def mailbox(tmp_path) -> Mailbox:
+    mailbox = Mailbox(str(tmp_path / 'mailbox.db'), max_batch=16)
+    yield mailbox
+    mailbox.stop()
+
+
+def test_round_trip(mailbox):
+    async def run() -> tuple[list, list, list]:
+        for number in range(5):
+            mailbox.put('bob', number, f'message {number}')
+        mailbox.put('alice', 9, 'not for bob')
+
+        first_page = await mailbox.fetch('bob', 3)
+        # Fetched mail stays until it's removed
+        again = await mailbox.fetch('bob', 3)
+        for mail_id, _, _ in first_page:
+            mailbox.remove(mail_id)
+        return first_page, again, await mailbox.fetch('bob', 10)
+
+    first_page, again, rest = asyncio.run(run())
+    assert [message for _, _, message in first_page] == \
+        ['message 0', 'message 1', 'message 2']
+    assert again == first_page
+    assert [(sender, message) for _, sender, message in rest] == \
+        [(3, 'message 3'), (4, 'message 4')]
+
+
+def test_clear(mailbox):
+    async def run() -> tuple[list, list]:
+        mailbox.put('bob', 1, 'hi')
+        mailbox.put('alice', 1, 'hi')
+        mailbox.clear('bob')
+        return await mailbox.fetch('bob', 10), await mailbox.fetch('alice', 10)
+
+    bob, alice = asyncio.run(run())
+    assert bob == []
+    assert len(alice) == 1
+
+
+def test_kept_after_restart(tmp_path):
+    path = str(tmp_path / 'mailbox.db')
+    mailbox = Mailbox(path, max_batch=16)
+    mailbox.put('bob', 1, 'hi')
+    # Queued messages are committed before the thread stops
+    mailbox.stop()
+
+    mailbox = Mailbox(path, max_batch=16)
+    try:
+        mail = asyncio.run(mailbox.fetch('bob', 10))
+    finally:
+        mailbox.stop()
+    assert [(sender, message) for _, sender, message in mail] == [(1, 'hi')]
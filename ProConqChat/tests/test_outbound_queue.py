@@ -0,0 +1,34 @@
+import asyncio
+
+from proconq_chat.src.outbound_queue import OutboundQueue
+
+
+def test_outbound_bounded():
+    queue = OutboundQueue(max_messages=2, max_size=10)
+    assert queue.put(b'12345')
+    assert not queue.put(b'123456')
+    assert queue.put(b'1')
+    assert not queue.put(b'1')
+    assert queue.peak == 2
+
+    assert queue.take() == [b'12345', b'1']
+    assert len(queue) == 0 and queue.size == 0
+
+
+def test_outbound_wait():
+    async def run() -> list:
+        queue = OutboundQueue(max_messages=10, max_size=100)
+        waiter = asyncio.create_task(queue.wait())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        queue.put(b'a')
+        results = [await waiter, queue.take()]
+        queue.put(b'b')
+        queue.close()
+        assert not queue.put(b'c')
+        # Queued messages are still taken after closing
+        results += [await queue.wait(), queue.take(), await queue.wait()]
+        return results
+
+    assert asyncio.run(run()) == [True, [b'a'], True, [b'b'], False]
@@ -0,0 +1,72 @@
+import time
+
+from proconq_chat.src.pending_store import PendingStore
+
+
+def new_store(index: dict, target_id: int = 1, max_messages: int = 10,
+              max_size: int = 1000, lifetime: float = 60) -> PendingStore:
+    return PendingStore(max_messages, max_size, lifetime, target_id, index)
+
+
+def test_pending_ack():
+    index = {}
+    store = new_store(index)
+    sequence, evicted = store.add(5, 'hello', mail_id=3)
+    assert evicted == []
+    assert list(store) == [(sequence, 5, 'hello')]
+    assert index == {5: {(1, sequence)}}
+
+    assert store.ack(sequence) == (5, 'hello', 3)
+    assert store.ack(sequence) is None
+    assert len(store) == 0 and store.size == 0
+    assert index == {}
+
+
+def test_pending_evicts_oldest():
+    index = {}
+    store = new_store(index, max_messages=2, max_size=10)
+    store.add(5, 'a')
+    second, _ = store.add(6, 'b')
+    third, evicted = store.add(5, 'c')
+    assert evicted == [(5, 'a', 0)]
+    assert [sequence for sequence, _, _ in store] == [second, third]
+
+    # Evicted by size too
+    _, evicted = store.add(7, 'x' * 10)
+    assert evicted == [(6, 'b', 0), (5, 'c', 0)]
+    assert index == {7: {(1, third + 1)}}
+
+
+def test_pending_expires():
+    index = {}
+    store = new_store(index, lifetime=0.01)
+    store.add(5, 'old')
+    time.sleep(0.02)
+    assert store.expire() == [(5, 'old', 0)]
+    assert index == {}
+
+
+def test_pending_index_shared():
+    index = {}
+    alice, bob = new_store(index, target_id=1), new_store(index, target_id=2)
+    to_alice, _ = alice.add(9, 'hi alice')
+    to_bob, _ = bob.add(9, 'hi bob')
+    assert index == {9: {(1, to_alice), (2, to_bob)}}
+    assert bob.get(to_bob) == (9, 'hi bob')
+
+    assert alice.clear() == [(9, 'hi alice', 0)]
+    assert index == {9: {(2, to_bob)}}
+
+
+def test_pending_remove_mail():
+    index = {}
+    store = new_store(index)
+    store.add(5, 'from the mailbox', mail_id=3)
+    direct, _ = store.add(6, 'sent directly')
+    assert store.mail_ids() == {3}
+
+    # Mail stays in the mailbox, only the direct message is kept
+    assert store.remove_mail() == [(5, 'from the mailbox', 3)]
+    assert store.mail_ids() == set()
+    assert list(store) == [(direct, 6, 'sent directly')]
+    assert index == {6: {(1, direct)}}
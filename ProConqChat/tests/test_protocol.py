@@ -0,0 +1,110 @@
+import pytest
+
+from ccui.utils import protocol as client_protocol
+from proconq_chat.utils.constants import Protocol
+from proconq_chat.utils.exceptions import ProtocolError
+from proconq_chat.utils.protocol import (
+    MessageCodec,
+    Opcode
+)
+
+
+def test_round_trip():
+    message = MessageCodec.encode(Opcode.RCVDMSG, 7, 0xFFFFFFFF, 'héllo',
+                                  request_id=42)
+    opcode, request_id, fields = MessageCodec.decode(message)
+    assert (opcode, request_id, fields) == (Opcode.RCVDMSG, 42,
+                                            [7, 0xFFFFFFFF, 'héllo'])
+
+
+def test_groups_and_bytes():
+    users = [('alice', 1), ('bob', 2)]
+    opcode, _, fields = MessageCodec.decode(
+        MessageCodec.encode(Opcode.USERSCONF, users))
+    assert fields == [users]
+
+    _, _, fields = MessageCodec.decode(
+        MessageCodec.encode(Opcode.RESUME, b'\x00ticket'))
+    assert bytes(fields[0]) == b'\x00ticket'
+
+
+def test_bad_fields():
+    with pytest.raises(ProtocolError):
+        MessageCodec.encode(Opcode.SNDMSG, 1)
+    with pytest.raises(ProtocolError):
+        MessageCodec.encode(Opcode.SNDMSG, -1, 'negative id')
+    with pytest.raises(ProtocolError):
+        MessageCodec.encode(Opcode.GETIDCONF, 'not a number')
+
+
+@pytest.mark.parametrize('payload', [
+    b'',
+    # Unknown opcode
+    bytes((255, 0, 0, 0, 0)),
+    # Truncated header
+    bytes((Opcode.GETID, 0, 0)),
+    # A string longer than the message
+    MessageCodec.encode(Opcode.DELUSER, 'name')[:-1],
+    # Trailing bytes
+    MessageCodec.encode(Opcode.GETID) + b'\x00',
+    # A group count larger than the message could hold
+    MessageCodec.header.pack(Opcode.USERSCONF, 0)
+    + MessageCodec.u32.pack(0xFFFFFFFF),
+    # Invalid UTF-8
+    MessageCodec.header.pack(Opcode.DELUSER, 0)
+    + MessageCodec.u32.pack(1) + b'\xff',
+])
+def test_malformed(payload):
+    with pytest.raises(ProtocolError):
+        MessageCodec.decode_batch(payload)
+
+
+def test_with_request_id():
+    message = MessageCodec.encode(Opcode.GETIDCONF, 9, request_id=1)
+    _, request_id, fields = MessageCodec.decode(
+        MessageCodec.with_request_id(message, 2))
+    assert (request_id, fields) == (2, [9])
+
+
+def test_client_and_server_agree():
+    assert client_protocol.MessageCodec.schemas == MessageCodec.schemas
+
+    message = MessageCodec.encode(Opcode.PRESENCE, 1, 2, 'alice',
+                                  request_id=3)
+    assert client_protocol.MessageCodec.decode(message) == \
+        MessageCodec.decode(message)
+
+    message = client_protocol.MessageCodec.encode(
+        client_protocol.Opcode.SNDNAME, 'bob', 'hi', request_id=4)
+    assert MessageCodec.decode(message) == (Opcode.SNDNAME, 4, ['bob', 'hi'])
+
+
+def test_older_version_leaves_out_newer_fields():
+    old = Protocol.MIN_VERSION
+    message = MessageCodec.encode(Opcode.AESCONF, old, 1, version=old)
+    assert MessageCodec.decode(message, old) == (Opcode.AESCONF, 0, [old])
+    # Read with the current schema, the field isn't there
+    with pytest.raises(ProtocolError):
+        MessageCodec.decode(message)
+
+
+def test_aeskey_read_by_the_version_it_names():
+    old = Protocol.MIN_VERSION
+    message = MessageCodec.encode(Opcode.AESKEY, old, b'key', [(1,)],
+                                  version=old)
+    opcode, _, fields = MessageCodec.decode(message)
+    assert (opcode, fields[0], bytes(fields[1])) == (Opcode.AESKEY, old,
+                                                     b'key')
+    assert len(fields) == 2
+
+    message = MessageCodec.encode(Opcode.AESKEY, Protocol.VERSION, b'key',
+                                  [(1,)])
+    assert MessageCodec.decode(message, old)[2][2] == [(1,)]
+
+
+def test_opcode_newer_than_version():
+    with pytest.raises(ProtocolError):
+        MessageCodec.encode(Opcode.COMPRESSED, 1, 1, b'x', version=10)
+    message = MessageCodec.encode(Opcode.COMPRESSED, 1, 1, b'x')
+    with pytest.raises(ProtocolError):
+        MessageCodec.decode_batch(message, 10)
@@ -0,0 +1,20 @@
+import pytest
+
+from proconq_chat.src.router import Route, Router
+from proconq_chat.utils.exceptions import ProtocolError
+
+
+def test_route_round_trip():
+    message = Router.encode(Route.DELIVER_NAME, 'bob', 7, 'hi')
+    assert Router.decode(message) == (Route.DELIVER_NAME, ['bob', 7, 'hi'])
+
+
+def test_route_malformed():
+    with pytest.raises(ProtocolError):
+        Router.encode(Route.LOGOUT, 1)
+    with pytest.raises(ProtocolError):
+        Router.decode(bytes((255,)))
+    with pytest.raises(ProtocolError):
+        Router.decode(Router.encode(Route.LOGOUT, 'bob') + b'\x00')
+    with pytest.raises(ProtocolError):
+        Router.decode(Router.encode(Route.LOGOUT, 'bob')[:-1])
@@ -0,0 +1,26 @@
+import pytest
+
+from proconq_chat.utils.cryptography import SessionTickets
+
+
+def test_tickets():
+    tickets = SessionTickets(lifetime=60)
+    nonce, ticket = tickets.issue(7)
+    assert tickets.verify(ticket) == (7, nonce)
+
+    forged = bytearray(ticket)
+    forged[SessionTickets.NONCE_SIZE] ^= 1
+    with pytest.raises(ValueError):
+        tickets.verify(bytes(forged))
+    with pytest.raises(ValueError):
+        tickets.verify(ticket[:-1])
+    # Another server's tickets aren't accepted
+    with pytest.raises(ValueError):
+        SessionTickets(lifetime=60).verify(ticket)
+
+
+def test_expired_ticket():
+    tickets = SessionTickets(lifetime=-1)
+    _, ticket = tickets.issue(7)
+    with pytest.raises(ValueError):
+        tickets.verify(ticket)
@@ -0,0 +1,358 @@
+"""
+The logging of the ProConq packages.
+
+Each package has a LoggingPipeline of its own, configured by the Paths
+    and Logging constants of the package, and a setup_logging module
+    that exposes it.
+"""
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+
+class LogArchiver:
+    """
+    Compresses rotated log files and keeps the logs directory
+        under its disk quota, on a background thread.
+    """
+    def __init__(self, directory: Path, quota: int):
+        self.directory = directory
+        self.quota = quota
+        self.jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, rotated_path: Path | None,
+               open_paths: set[Path]) -> None:
+        """
+        Queues a rotated file for compression, followed by a quota check.
+        open_paths are files still being written, they're never deleted.
+        """
+        self.jobs.put((rotated_path, open_paths))
+
+    def stop(self) -> None:
+        self.jobs.put(None)
+        self.thread.join()
+
+    def run(self) -> None:
+        while (job := self.jobs.get()) is not None:
+            rotated_path, open_paths = job
+            try:
+                if rotated_path is not None:
+                    self.compress(rotated_path)
+                self.enforce_quota(open_paths)
+            except OSError:
+                pass
+
+    def compress(self, rotated_path: Path) -> None:
+        archive_path = rotated_path.with_name(rotated_path.name + '.gz')
+        with open(rotated_path, 'rb') as source, \
+                gzip.open(archive_path, 'wb') as archive:
+            shutil.copyfileobj(source, archive)
+        rotated_path.unlink()
+
+    def enforce_quota(self, open_paths: set[Path]) -> None:
+        """
+        Deletes the oldest archives, then the oldest closed logs,
+            until the directory fits in the quota.
+        """
+        files: list[tuple[bool, float, int, Path]] = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            path = Path(entry.path)
+            stat = entry.stat()
+            total += stat.st_size
+            if path not in open_paths:
+                is_log = not entry.name.endswith('.gz')
+                files.append((is_log, stat.st_mtime, stat.st_size, path))
+
+        files.sort()
+        for is_log, mtime, size, path in files:
+            if total <= self.quota:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class RotatingLogFileHandler(logging.FileHandler):
+    """
+    A log file that is rotated when it reaches a size or an age.
+    Rotated files get a timestamp suffix and are handed to the archiver.
+    """
+    def __init__(self, file_path: Path, archiver: LogArchiver,
+                 open_paths: Callable[[], set[Path]], max_bytes: int,
+                 max_age: float):
+        super().__init__(file_path, delay=True)
+        self.file_path = file_path
+        self.archiver = archiver
+        self.open_paths = open_paths
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.rollover_at = time.time() + max_age
+
+    def should_rollover(self, message_size: int) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+        if self.stream is None:
+            try:
+                size = self.file_path.stat().st_size
+            except FileNotFoundError:
+                return False
+        else:
+            size = self.stream.tell()
+        return size + message_size > self.max_bytes
+
+    def do_rollover(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.rollover_at = time.time() + self.max_age
+
+        now = time.time()
+        timestamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+        microseconds = int(now * 1_000_000) % 1_000_000
+        rotated_path = self.file_path.with_name(
+            f'{self.file_path.name}.{timestamp}-{microseconds:06d}')
+        try:
+            os.rename(self.file_path, rotated_path)
+        except FileNotFoundError:
+            return
+        self.archiver.submit(rotated_path, self.open_paths())
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            message = self.format(record)
+            if self.should_rollover(len(message) + 1):
+                self.do_rollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(message + self.terminator)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class LoggerFileRouter(logging.Handler):
+    """
+    Writes every record to the log file of the logger that created it.
+    Records of a session (a tracee, a connection) get a file of their own.
+
+    Runs on the listener thread, so files are opened there lazily.
+    Only the most recently used files are kept open.
+    """
+    def __init__(self, formatter: logging.Formatter, archiver: LogArchiver,
+                 directory: Path, settings: type):
+        super().__init__()
+        self.setFormatter(formatter)
+        self.archiver = archiver
+        self.directory = directory
+        self.settings = settings
+        self.file_handlers: OrderedDict[str, RotatingLogFileHandler] = \
+            OrderedDict()
+
+    def open_paths(self) -> set[Path]:
+        return {handler.file_path
+                for handler in self.file_handlers.values()}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        session = getattr(record, 'session', None)
+        if session is None:
+            file_name = record.name
+        else:
+            file_name = f'{record.name}.{session}'
+
+        file_handler = self.file_handlers.get(file_name)
+        if file_handler is None:
+            file_path = self.directory / f'{file_name}.log'
+            file_handler = RotatingLogFileHandler(
+                file_path, self.archiver, self.open_paths,
+                self.settings.MAX_FILE_BYTES, self.settings.MAX_FILE_AGE)
+            file_handler.setFormatter(self.formatter)
+            self.file_handlers[file_name] = file_handler
+
+            if len(self.file_handlers) > self.settings.MAX_OPEN_FILES:
+                _, oldest = self.file_handlers.popitem(last=False)
+                oldest.close()
+        else:
+            self.file_handlers.move_to_end(file_name)
+
+        file_handler.emit(record)
+
+    def close(self) -> None:
+        for file_handler in self.file_handlers.values():
+            file_handler.close()
+        super().close()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records without formatting them on the logging thread.
+    """
+    # Arguments of these types can't change before the listener formats them
+    immutable_types = (str, bytes, int, float, bool, type(None))
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records never leave the process, so there is no need to pickle.
+        # Only records with mutable arguments are formatted right away.
+        if record.args and not (
+                isinstance(record.args, tuple)
+                and all(isinstance(arg, self.immutable_types)
+                        for arg in record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def parse_level(level: int | str) -> int:
+    """
+    Returns the number of a level, given by name or number.
+    An unknown name falls back to INFO with a warning, a typo in the
+        configured level mustn't stop the package from starting.
+    """
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(level.upper())
+    if isinstance(number, int):
+        return number
+    logging.getLogger(__name__).warning('Unknown log level %r, using INFO',
+                                        level)
+    return logging.INFO
+
+
+class LoggingPipeline:
+    """
+    The handlers shared by all the loggers of a package.
+
+    Loggers only put records on a queue.
+    Formatting and file and stream I/O happen on the listener thread.
+
+    paths and settings are the package's Paths and Logging constants,
+        read when the pipeline starts.
+    console also writes the records to stderr, for packages that
+        don't use the console for anything else.
+    """
+    def __init__(self, paths: type, settings: type, console: bool):
+        self.paths = paths
+        self.settings = settings
+        self.console = console
+        self.lock = threading.Lock()
+        self.queue_handler: DeferredQueueHandler = None
+        self.listener: logging.handlers.QueueListener = None
+        self.archiver: LogArchiver = None
+        self.loggers: set[str] = set()
+        self.level: int = parse_level(settings.LEVEL)
+
+    def start(self) -> None:
+        """
+        Creates the handlers and starts the listener, only once.
+        """
+        with self.lock:
+            if self.listener is not None:
+                return
+
+            directory = self.paths.LOGGING
+            directory.mkdir(parents=True, exist_ok=True)
+
+            self.archiver = LogArchiver(directory, self.settings.QUOTA_BYTES)
+            # Logs left over by previous runs count towards the quota
+            self.archiver.submit(None, set())
+
+            formatter = logging.Formatter(self.settings.FORMAT)
+            handlers: list[logging.Handler] = [
+                LoggerFileRouter(formatter, self.archiver, directory,
+                                 self.settings)]
+            if self.console:
+                stream_handler = logging.StreamHandler()
+                stream_handler.setFormatter(formatter)
+                handlers.append(stream_handler)
+
+            log_queue = queue.SimpleQueue()
+            self.queue_handler = DeferredQueueHandler(log_queue)
+            self.listener = logging.handlers.QueueListener(log_queue,
+                                                           *handlers)
+            self.listener.start()
+
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """
+        Flushes the queued records and stops the listener.
+        """
+        with self.lock:
+            if self.listener is None:
+                return
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+            self.archiver.stop()
+
+    def add_logger(self, logger: logging.Logger) -> None:
+        with self.lock:
+            if logger.name in self.loggers:
+                return
+            self.loggers.add(logger.name)
+            logger.addHandler(self.queue_handler)
+            logger.propagate = False
+            logger.setLevel(self.level)
+
+    def setup_logging(self, logger_name: str,
+                      session: str = None) -> logging.Logger:
+        """
+        Returns a logger that logs through the pipeline.
+        Calling it again for the same name returns the same logger,
+            without adding handlers.
+
+        If a session is given, the records are written to a separate
+            file, logs/<logger_name>.<session>.log
+        """
+        self.start()
+
+        logger = logging.getLogger(logger_name)
+        self.add_logger(logger)
+
+        if session is not None:
+            return session_logger(logger, session)
+        return logger
+
+    def set_level(self, level: int | str) -> None:
+        """
+        Changes the level of every logger of the package at runtime.
+        """
+        level = parse_level(level)
+
+        with self.lock:
+            self.level = level
+            for logger_name in self.loggers:
+                logging.getLogger(logger_name).setLevel(level)
+
+    def toggle_debug(self) -> None:
+        """
+        Switches between DEBUG and the configured level.
+        """
+        if self.level == logging.DEBUG:
+            configured = self.settings.LEVEL
+            self.set_level(configured if configured != 'DEBUG' else 'INFO')
+        else:
+            self.set_level(logging.DEBUG)
+
+
+def session_logger(logger: logging.Logger | logging.LoggerAdapter,
+                   session: str) -> logging.LoggerAdapter:
+    """
+    Wraps a logger so its records go to the file of a session.
+    """
+    if isinstance(logger, logging.LoggerAdapter):
+        logger = logger.logger
+    return logging.LoggerAdapter(logger, {'session': session})
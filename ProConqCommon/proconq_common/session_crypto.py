@@ -0,0 +1,130 @@
+"""
+The session encryption of the chat, shared by its server and client.
+"""
+import hashlib
+import hmac
+import os
+import struct
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric.x25519 import (
+    X25519PrivateKey,
+    X25519PublicKey
+)
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+
+class SessionCipher:
+    """
+    Encrypts and authenticates the messages of one connection.
+
+    Every message is sealed with AES-GCM, its tag follows it.
+    The nonce is the message's sequence number, so a key never seals
+        two messages with the same nonce, and tampered, replayed or
+        reordered messages are rejected.
+    Each direction has a key of its own, derived from the session key.
+    The AES-GCM contexts are built once, when the session starts.
+    """
+    KEY_SIZE = 32
+    TAG_SIZE = 16
+    # 96 bits, the sequence number in the last 64
+    nonce = struct.Struct('!4xQ')
+
+    def __init__(self, session_key: bytes, is_server: bool):
+        if len(session_key) != self.KEY_SIZE:
+            raise ValueError(f'Session key must be {self.KEY_SIZE} bytes')
+
+        # Each side sends with the key the other receives with
+        send_label, receive_label = b'server', b'client'
+        if not is_server:
+            send_label, receive_label = receive_label, send_label
+
+        self.send_aead = self.new_aead(session_key, send_label)
+        self.receive_aead = self.new_aead(session_key, receive_label)
+
+        # Numbers of the messages sent and received so far
+        self.send_sequence = 0
+        self.receive_sequence = 0
+
+    @staticmethod
+    def new_key() -> bytes:
+        return os.urandom(SessionCipher.KEY_SIZE)
+
+    @staticmethod
+    def new_aead(session_key: bytes, label: bytes) -> AESGCM:
+        key = hmac.digest(session_key, label + b' encryption', 'sha256')
+        return AESGCM(key)
+
+    def sealed_size(self, size: int) -> int:
+        """
+        Returns the size of a message of the given size once encrypted.
+        """
+        return size + self.TAG_SIZE
+
+    def seal_into(self, data: bytes, output: memoryview) -> None:
+        """
+        Encrypts data straight into output, followed by its tag.
+        output must be exactly sealed_size(len(data)) bytes.
+        """
+        self.send_aead.encrypt_into(self.nonce.pack(self.send_sequence),
+                                    data, None, output)
+        self.send_sequence += 1
+
+    def encrypt(self, data: bytes) -> bytearray:
+        output = bytearray(self.sealed_size(len(data)))
+        self.seal_into(data, memoryview(output))
+        return output
+
+    def decrypt(self, data: bytes) -> bytearray:
+        """
+        Raises ValueError if the message isn't the next one the peer sent.
+        """
+        size = len(data) - self.TAG_SIZE
+        if size < 0:
+            raise ValueError('Message is shorter than its tag')
+
+        output = bytearray(size)
+        try:
+            self.receive_aead.decrypt_into(
+                self.nonce.pack(self.receive_sequence), data, None, output)
+        except InvalidTag:
+            raise ValueError('MAC check failed') from None
+        self.receive_sequence += 1
+        return output
+
+
+class KeyExchange:
+    """
+    One side of an X25519 key agreement, used for a single connection.
+    Both sides derive the same session key from their own private key
+        and the other side's public key.
+    """
+    def __init__(self):
+        self.private_key = X25519PrivateKey.generate()
+        self.public_key = self.private_key.public_key().public_bytes_raw()
+
+    def derive(self, peer_public_key: bytes, is_server: bool) -> bytes:
+        """
+        Returns the session key.
+        Raises ValueError if the peer's public key is invalid.
+        """
+        peer_public_key = bytes(peer_public_key)
+        if is_server:
+            salt = self.public_key + peer_public_key
+        else:
+            salt = peer_public_key + self.public_key
+
+        secret = self.private_key.exchange(
+            X25519PublicKey.from_public_bytes(peer_public_key))
+        return HKDF(hashes.SHA256(), SessionCipher.KEY_SIZE, salt,
+                    b'proconq chat session').derive(secret)
+
+
+def fingerprint(identity_key: bytes) -> str:
+    """
+    Returns the SHA-256 of a server's public identity key, in hex.
+    What clients pin, and what a server's operator publishes.
+    """
+    return hashlib.sha256(identity_key).hexdigest()